@@ -0,0 +1,458 @@
+"""
+Benchmark suite for the simulation and analysis hot paths.
+
+Run from the root of the repository:
+
+    python -m benchmarks.run [--quick] [--output results.json]
+                             [--baseline baseline.json] [--threshold 0.25]
+                             [--save-baseline baseline.json]
+
+Every benchmark reports the best time over several repeats, the throughput
+(e.g. lattice sites per second) and the peak memory allocated by numpy and
+Python (tracemalloc, separate run). Before timing, the cross-checks make
+sure the different engines agree. With a baseline, the run fails (exit code
+1) if any benchmark got slower by more than the threshold.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.library.bootstraping import bootstrap_mean
+from percolation.model.hk import HoshenKopelman
+from percolation.model.fasthk import FastHoshenKopelman, label_batch
+from percolation.model.streamhk import StreamingHoshenKopelman
+from percolation.model.nz import NewmanZiff
+from percolation.model import backends
+from percolation.model.latticelabel import label_lattice_batch
+from percolation.model.bondhk import label_bonds, label_bonds_batch
+from percolation.library.lattice import get_lattice
+from percolation.library.bondgrid import BondGrid
+from percolation.library.unionfind import UnionFind
+from percolation.model.measurment import (get_susceptibility,
+                                          get_connectivity,
+                                          get_connectivity_fft)
+from percolation.model.fss import residual, Residual
+from lmfit import Parameters
+
+PC = 0.592746
+
+
+def get_grid(L, p, seed=0):
+    grid = Grid((L, L))
+    grid.randomize(p, ConfigGenerator(seed))
+
+    return grid
+
+
+def label(engine, grid):
+    """
+    Labels a grid with one of the engines.
+
+    :param engine: Either 'hk', 'fast' or 'stream'.
+    :param grid: ..library.grid.Grid
+
+    :return list: Sorted cluster sizes.
+    """
+
+    if engine == 'stream':
+        histogram, _ = StreamingHoshenKopelman(grid.shape).label_grid(grid)
+        sizes = np.repeat(np.arange(len(histogram)), histogram)
+    else:
+        hk = (HoshenKopelman if engine == 'hk' else FastHoshenKopelman)(grid)
+        hk.setup()
+        _, sizes = hk.run()
+
+    return sorted(int(s) for s in sizes)
+
+
+def label_bonds_reference(grid):
+    """
+    Labels bond percolation site by site along the bonds of the generic
+    square lattice (see ..library.lattice.Lattice.edges).
+
+    :param grid: ..library.bondgrid.BondGrid
+
+    :return ndarray, list: Labels and sizes (see ..model.bondhk.label_bonds).
+    """
+
+    lattice = get_lattice('square', grid.shape)
+    # ==> The edges of the square lattice are the vertical bonds of all
+    #     sites followed by the horizontal ones
+    edges = lattice.edges[np.concatenate((grid.vertical.ravel(),
+                                          grid.horizontal.ravel()))]
+    clusters = UnionFind(capacity=grid.size + 1)
+    clusters.add(np.ones(grid.size, dtype=np.int_))
+    clusters.union(edges[:, 0] + 1, edges[:, 1] + 1)
+    lookup, sizes = clusters.compactify()
+
+    return lookup[1:].reshape(grid.shape), sizes.tolist()
+
+
+def get_wrapping(engine, grid):
+    """
+    Labels a grid with one of the unwrapping engines.
+
+    :param engine: Either 'hk' or 'fast'.
+    :param grid: ..library.grid.Grid
+
+    :return list: Wrapping flags of each cluster.
+    """
+
+    hk = (HoshenKopelman if engine == 'hk' else FastHoshenKopelman)(
+        grid, unwrap=True)
+    hk.setup()
+    hk.run()
+
+    return [int(flags) for flags in hk.wrapping]
+
+
+def get_params():
+    params = Parameters()
+    params.add('pc', value=PC)
+    params.add('gamma', value=43 / 18)
+    params.add('nu', value=4 / 3)
+
+    return params
+
+
+def get_fss_data(num_L, num_p, seed=0):
+    rng = np.random.default_rng(seed)
+    Ls = [16 * 2**i for i in range(num_L)]
+    ps = np.linspace(0.55, 0.65, num_p)
+    S = rng.gamma(2, 5, (num_L, num_p))
+
+    return S, Ls, ps
+
+
+def cross_checks(quick):
+    """
+    Checks that the different engines agree.
+
+    :param quick: Whether to use smaller lattices.
+
+    :return list: Descriptions of all failed checks.
+    """
+
+    # ==> Every labelling backend against the reference implementation
+    failed = backends.check_conformance()
+    Ls = (16, 48) if quick else (32, 128)
+
+    for L in Ls:
+        for p in (0.3, PC, 0.8):
+            grid = get_grid(L, p, seed=L)
+            reference = label('hk', grid)
+            for engine in ('fast', 'stream'):
+                if label(engine, grid) != reference:
+                    failed.append(f'{engine} labelling L={L} p={p:.3f}')
+
+            configs = np.stack([get_grid(L, p, seed=s).config
+                                for s in range(3)])
+            batch = [sorted(sizes.tolist()) for sizes in label_batch(configs)]
+            if batch != [label('hk', get_grid(L, p, seed=s))
+                         for s in range(3)]:
+                failed.append(f'label_batch L={L} p={p:.3f}')
+
+            # Wrapping flags detected while labelling
+            reference = get_wrapping('hk', grid)
+            if get_wrapping('fast', grid) != reference or \
+                    label_batch(grid.config[None], wrapping=True)[1][0] \
+                    .tolist() != reference:
+                failed.append(f'wrapping L={L} p={p:.3f}')
+
+            # Newman-Ziff at p (canonical average) against many HK samples
+            # is statistical, so only the labelling engines are compared
+
+            hk = FastHoshenKopelman(grid)
+            hk.setup()
+            labels, sizes = hk.run()
+            largest = int(np.argmax(sizes)) + 1 if sizes else 0
+            if not np.allclose(get_connectivity(labels, largest),
+                               get_connectivity_fft(labels, largest),
+                               rtol=1e-12, atol=0):
+                failed.append(f'connectivity L={L} p={p:.3f}')
+
+    for shape in ((1, 1), (3, 5), (16, 16) if quick else (64, 64)):
+        for p in (0, 0.3, 0.5, 0.7, 1):
+            grids = [BondGrid(shape) for _ in range(3)]
+            for k, grid in enumerate(grids):
+                grid.randomize(p, ConfigGenerator(k))
+            expected = [label_bonds_reference(grid) for grid in grids]
+            for grid, (labels, sizes) in zip(grids, expected):
+                result = label_bonds(grid)
+                if not (np.array_equal(result[0], labels) and
+                        result[1] == sizes):
+                    failed.append(f'bond labelling {shape} p={p}')
+                    break
+            batch = label_bonds_batch(np.stack([g.bonds for g in grids]))
+            if [sizes.tolist() for sizes in batch] != \
+                    [sizes for _, sizes in expected]:
+                failed.append(f'bond label_batch {shape} p={p}')
+
+    # ==> residual is the original interp1d implementation, Residual has
+    #     to agree with it bit for bit
+    params = get_params()
+    for num_L, num_p in ((4, 30), (6, 40), (20, 100)):
+        S, Ls, ps = get_fss_data(num_L, num_p)
+        S[0, :5] = np.nan
+        prepared = Residual(S, Ls, ps)
+        for pc in (PC, 0.57, 0.61):
+            params['pc'].value = pc
+            if not np.array_equal(residual(params, S, Ls, ps),
+                                  prepared(params)):
+                failed.append(f'fss residual {num_L}x{num_p} pc={pc}')
+
+    return failed
+
+
+def get_cases(quick):
+    """
+    Returns all benchmarks.
+
+    :param quick: Whether to use smaller sizes.
+
+    :return list: Tuples (name, function, number of items, unit). The
+                  function runs the benchmark once, the setup happens before.
+    """
+
+    cases = []
+    ps = (0.3, PC, 0.8)
+
+    for L in ((64,) if quick else (64, 256)):
+        for p in ps:
+            grid = get_grid(L, p)
+            cases.append((f'hk.run L={L} p={p:.3f}',
+                          lambda grid=grid: label('hk', grid), L**2, 'sites'))
+            cases.append((f'hk.run (unwrap) L={L} p={p:.3f}',
+                          lambda grid=grid: get_wrapping('hk', grid), L**2,
+                          'sites'))
+
+    for L in ((256,) if quick else (256, 1024)):
+        for p in ps:
+            grid = get_grid(L, p)
+            cases.append((f'fasthk.run L={L} p={p:.3f}',
+                          lambda grid=grid: label('fast', grid), L**2,
+                          'sites'))
+            cases.append((f'streamhk L={L} p={p:.3f}',
+                          lambda grid=grid: label('stream', grid), L**2,
+                          'sites'))
+
+        grid = get_grid(L, PC)
+        cases.append((f'backends.label (ndimage) L={L} p={PC:.3f}',
+                      lambda grid=grid: backends.label(grid, 'ndimage'),
+                      L**2, 'sites'))
+
+        configs = np.stack([get_grid(L, PC, seed=s).config
+                            for s in range(8)])
+        for name in ('fast', 'ndimage'):
+            cases.append((f'backends.label_batch ({name}) L={L} '
+                          f'p={PC:.3f} x8',
+                          lambda configs=configs, name=name:
+                          backends.label_batch(configs, name),
+                          8 * L**2, 'sites'))
+        cases.append((f'label_batch (wrapping) L={L} p={PC:.3f} x8',
+                      lambda configs=configs:
+                      label_batch(configs, wrapping=True), 8 * L**2,
+                      'sites'))
+
+        nz = NewmanZiff(Grid((L, L)))
+
+        def sweep(nz=nz):
+            nz.setup()
+            nz.run(ConfigGenerator(0))
+        cases.append((f'nz.run L={L}', sweep, L**2, 'sites'))
+
+    for kind, shape in (('square', (256, 256)), ('triangular', (256, 256)),
+                        ('honeycomb', (256, 256)), ('cubic', (40, 40, 40))):
+        lattice = get_lattice(kind, shape)
+        configs = ConfigGenerator(0).sample(lattice.pc, shape, 4)
+        cases.append((f'label_lattice_batch {kind} {shape} x4',
+                      lambda configs=configs, lattice=lattice:
+                      label_lattice_batch(configs, lattice),
+                      4 * lattice.size, 'sites'))
+
+    for L in ((256,) if quick else (256, 1024)):
+        for p in (0.3, 0.5, 0.7):
+            grid = BondGrid((L, L))
+            grid.randomize(p, ConfigGenerator(0))
+            cases.append((f'label_bonds L={L} p={p:.3f}',
+                          lambda grid=grid: label_bonds(grid), L**2,
+                          'sites'))
+        bonds = ConfigGenerator(0).sample(0.5, (2, L, L), 8)
+        cases.append((f'label_bonds_batch L={L} p=0.500 x8',
+                      lambda bonds=bonds: label_bonds_batch(bonds),
+                      8 * L**2, 'sites'))
+
+    for L in (256, 1024, 4096):
+        grid, generator = Grid((L, L)), ConfigGenerator(0)
+        cases.append((f'grid.randomize L={L}',
+                      lambda grid=grid, generator=generator:
+                      grid.randomize(PC, generator), L**2, 'sites'))
+
+    for L in (256, 1024):
+        clusters = label_batch(np.stack([get_grid(L, PC, seed=s).config
+                                         for s in range(8)]))
+        cases.append((f'get_susceptibility L={L} x8',
+                      lambda clusters=clusters: get_susceptibility(clusters),
+                      8 * L**2, 'sites'))
+
+    for L, engine in ((16, 'loop'), (32, 'loop'), (64, 'fft'), (256, 'fft')):
+        if quick and L > 64:
+            continue
+        hk = FastHoshenKopelman(get_grid(L, PC))
+        hk.setup()
+        labels, sizes = hk.run()
+        largest = int(np.argmax(sizes)) + 1
+        func = get_connectivity if engine == 'loop' else get_connectivity_fft
+        cases.append((f'get_connectivity ({engine}) L={L}',
+                      lambda labels=labels, largest=largest, func=func:
+                      func(labels, largest), L**2, 'sites'))
+
+    # ==> The original interp1d residual is the baseline for Residual
+    params = get_params()
+    for num_L, num_p in ((4, 30), (8, 50), (20, 100)):
+        S, Ls, ps = get_fss_data(num_L, num_p)
+        prepared = Residual(S, Ls, ps)
+        cases.append((f'fss.residual (interp1d) {num_L}x{num_p}',
+                      lambda S=S, Ls=Ls, ps=ps: residual(params, S, Ls, ps),
+                      num_L * num_p, 'points'))
+        cases.append((f'fss.Residual {num_L}x{num_p}',
+                      lambda prepared=prepared: prepared(params),
+                      num_L * num_p, 'points'))
+
+    rng = np.random.default_rng(0)
+    for n in ((10**3, 10**4) if quick else (10**3, 10**4, 10**5)):
+        sample = rng.normal(size=n)
+        cases.append((f'bootstrap_mean n={n} num=1000',
+                      lambda sample=sample: bootstrap_mean(sample, 1000, 0),
+                      1000 * n, 'draws'))
+
+    return cases
+
+
+def measure(func, repeat, min_time=0.2):
+    """
+    Times a function and measures its peak memory.
+
+    :param func: Function to benchmark.
+    :param repeat: Number of timings, the best one is reported.
+    :param min_time: Each timing calls func as often as needed to take at
+                     least this long (in seconds).
+
+    :return float, int: Time per call in seconds and peak memory in bytes.
+    """
+
+    start = time.perf_counter()
+    func()
+    once = time.perf_counter() - start
+    number = max(1, int(min_time / max(once, 1e-9)))
+
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the results to a baseline.
+
+    :param results: Dictionary with the results of each benchmark.
+    :param baseline: Dictionary with the results of the baseline.
+    :param threshold: Largest accepted relative slow down.
+
+    :return list: Names of the benchmarks slower than the baseline by more
+                  than the threshold.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller sizes and fewer repeats')
+    parser.add_argument('--repeat', type=int, default=None)
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks containing this text')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help='compare to the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='accepted relative slow down (default 0.25)')
+    parser.add_argument('--save-baseline', type=Path, default=None,
+                        help='write the results as new baseline')
+    args = parser.parse_args(argv)
+    repeat = args.repeat or (3 if args.quick else 5)
+
+    failed = cross_checks(args.quick)
+    for check in failed:
+        print(f'CROSS-CHECK FAILED: {check}')
+
+    results = {}
+    for name, func, items, unit in get_cases(args.quick):
+        if args.filter not in name:
+            continue
+        seconds, peak = measure(func, repeat)
+        results[name] = {'seconds': seconds, 'throughput': items / seconds,
+                         'unit': f'{unit}/s', 'peak_memory': peak}
+        print(f'{name:<50} {seconds * 1e3:>10.3f} ms '
+              f'{items / seconds:>12.3e} {unit}/s '
+              f'{peak / 2**20:>9.2f} MiB', flush=True)
+
+    regressions = []
+    if args.baseline is not None and args.baseline.exists():
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name in regressions:
+            print(f'REGRESSION: {name} is '
+                  f'{results[name]["baseline_ratio"]:.2f}x slower than the '
+                  f'baseline')
+
+    output = {'meta': {'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'processor': platform.processor(),
+                       'quick': args.quick,
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'cross_checks_failed': failed,
+              'regressions': regressions,
+              'results': results}
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(output, file, indent=4)
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import os
+import json
+import tempfile
+
+import numpy as np
+
+from percolation.data_collection.scheduler import Unit
+
+
+class Checkpoint:
+
+    def __init__(self, path):
+        """
+        This class encapsulates the checkpointing of a data collection run.
+        The values of every finished unit of work are written to their own
+        shard (path/shards) and recorded as one line in an append-only
+        journal (path/journal.jsonl), which is compacted into the manifest
+        (path/manifest.json) when a run starts. Shards and manifest are
+        written to a temporary file first and then atomically renamed, and
+        a journal line is only written (and synced) once its shard is on
+        disk, so a crash at any time never leaves a corrupted checkpoint (at
+        most an incomplete last journal line, which is ignored). A restarted
+        run skips all recorded units.
+
+        :param path: Path to the directory of the run.
+        """
+
+        self.path = path
+        self.shards = path / 'shards'
+        self.file = path / 'manifest.json'
+        self.journal = path / 'journal.jsonl'
+
+        self.manifest = None
+        if self.file.exists():
+            with open(self.file, 'r') as file:
+                self.manifest = json.load(file)
+            self.read_journal()
+
+    def start(self, params, chunks):
+        """
+        Starts a new checkpoint or resumes the existing one. The number of
+        samples may change between restarts (e.g. to top up a finished run),
+        all other parameters have to match.
+
+        :param params: Dictionary with the parameters of the run (method,
+                       Ls, ps and the entropy of the seed as 'seed'). A seed
+                       of None is replaced by the one of the checkpoint (or
+                       fresh entropy for a new checkpoint).
+        :param chunks: Function returning the number of samples per unit for
+                       each L. Only called for a new checkpoint, a resumed
+                       run uses the stored ones to reproduce the same units.
+
+        :return dict, dict: The parameters and number of samples per unit for
+                            each L of the run.
+        """
+
+        if self.manifest is None:
+            if params['seed'] is None:
+                # ==> Fix fresh entropy now, a resumed run has to reuse it
+                params = dict(params,
+                              seed=np.random.SeedSequence().entropy)
+            self.manifest = {'params': params, 'chunks': chunks(),
+                             'done': []}
+            self.shards.mkdir(parents=True, exist_ok=True)
+            self.write_manifest()
+            # ==> Left over from a run that never wrote its manifest
+            if self.journal.exists():
+                self.journal.unlink()
+        else:
+            stored = self.manifest['params']
+            if params['seed'] is None:
+                params = dict(params, seed=stored['seed'])
+            if params != stored:
+                raise ValueError(f'Parameters of the run do not match the '
+                                 f'checkpoint in {self.path}: {stored}')
+            self.compact()
+
+        # ==> JSON keys are always strings
+        chunks = {int(L): num for L, num in self.manifest['chunks'].items()}
+
+        return self.manifest['params'], chunks
+
+    @staticmethod
+    def key(unit):
+        """
+        Returns the key identifying a unit of work.
+
+        :param unit: ..data_collection.scheduler.Unit
+
+        :return tuple: Indices of L and p as well as first and last sample.
+        """
+
+        return (unit.i, unit.j, unit.start, unit.stop)
+
+    def done(self):
+        """
+        Returns the keys of all finished units.
+
+        :return set: Set of keys (see key).
+        """
+
+        return {self.key(Unit(**entry['unit']))
+                for entry in self.manifest['done']}
+
+    def prune(self, keys):
+        """
+        Drops all finished units not in keys (e.g. the last, partial chunks
+        replaced by a run topped up with more samples) from the checkpoint
+        and deletes their shards.
+
+        :param keys: Keys of the units to keep (see key).
+
+        :return None:
+        """
+
+        keep, drop = [], []
+        for entry in self.manifest['done']:
+            unit = Unit(**entry['unit'])
+            (keep if self.key(unit) in keys else drop).append(entry)
+        if not drop:
+            return
+
+        self.manifest['done'] = keep
+        self.write_manifest()
+        # ==> Else the journal would add the dropped units again on restart
+        if self.journal.exists():
+            self.journal.unlink()
+        for entry in drop:
+            (self.shards / entry['file']).unlink(missing_ok=True)
+
+    def load(self, keys=None):
+        """
+        Loads the values of finished units.
+
+        :param keys: Keys of the units to load (see key). If None all
+                     finished units are loaded.
+
+        :return iterator: Tuples of unit and values.
+        """
+
+        for entry in self.manifest['done']:
+            unit = Unit(**entry['unit'])
+            if keys is None or self.key(unit) in keys:
+                yield unit, np.load(self.shards / entry['file'])
+
+    def add(self, unit, values):
+        """
+        Writes the values of a finished unit to its shard and records it in
+        the manifest.
+
+        :param unit: ..data_collection.scheduler.Unit
+        :param values: Array with the values of the unit.
+
+        :return None:
+        """
+
+        j = 'all' if unit.j is None else unit.j
+        name = f'L{unit.L}_p{j}_{unit.start}-{unit.stop}.npy'
+        self.write_atomic(self.shards / name,
+                          lambda file: np.save(file, values))
+
+        unit = dict(unit._asdict(), p=unit.p and float(unit.p))
+        entry = {'unit': unit, 'file': name}
+        # ==> One synced line per unit instead of rewriting the manifest
+        with open(self.journal, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.manifest['done'].append(entry)
+
+    def read_journal(self):
+        """
+        Adds the units recorded in the journal to the manifest (in memory).
+        Units already in the manifest (from an interrupted compaction) are
+        skipped, as is an incomplete last line of a crashed run.
+
+        :return None:
+        """
+
+        if not self.journal.exists():
+            return
+
+        done = {self.key(Unit(**entry['unit']))
+                for entry in self.manifest['done']}
+        with open(self.journal, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                key = self.key(Unit(**entry['unit']))
+                if key not in done:
+                    done.add(key)
+                    self.manifest['done'].append(entry)
+
+    def compact(self):
+        """
+        Writes all units recorded in the journal into the manifest and
+        removes the journal.
+
+        :return None:
+        """
+
+        if not self.journal.exists():
+            return
+
+        self.write_manifest()
+        self.journal.unlink()
+
+    def write_manifest(self):
+        self.write_atomic(self.file, lambda file: file.write(
+            json.dumps(self.manifest, indent=4).encode()))
+
+    @staticmethod
+    def write_atomic(path, write):
+        """
+        Writes a file via a temporary file in the same directory, which is
+        renamed to path once it is completely on disk.
+
+        :param path: Path of the file.
+        :param write: Function writing the content to a binary file object.
+
+        :return None:
+        """
+
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp',
+                                         delete=False) as file:
+            try:
+                write(file)
+                file.flush()
+                os.fsync(file.fileno())
+            except BaseException:
+                os.remove(file.name)
+                raise
+
+        os.replace(file.name, path)
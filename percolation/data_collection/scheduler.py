@@ -0,0 +1,178 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# A unit of work: the samples start to stop (exclusive) for the lattice size
+# L (index i) and the probability p (index j). For Newman-Ziff sweeps j and p
+# are None (all probabilities at once). seed is the seed of the task's fixed
+# sample blocks, start is always the first sample of a block (see
+# percolation.library.generator.BlockGenerator)
+Unit = namedtuple('Unit', ['i', 'j', 'L', 'p', 'start', 'stop', 'seed'])
+
+
+class Scheduler:
+
+    # Number of lattice sites per block of samples with its own stream
+    block_sites = 2**14
+
+    def __init__(self, processors, units_per_processor=4, dimension=2):
+        """
+        This class encapsulates the splitting of a data collection run into
+        units of work (lattice size, probability, chunk of samples) and their
+        distribution over a process pool. The cost of a unit is modelled as
+        num * (a * L^d + b) for lattices of dimension d, with a and b
+        calibrated at runtime. Units are sized such that each processor gets
+        several of them and are handed out largest first, which keeps every
+        processor busy until the end.
+
+        :param processors: Number of processes in the pool.
+        :param units_per_processor: Number of units each processor should get
+                                    on average. More units balance better but
+                                    add overhead.
+        :param dimension: Dimension of the lattices, i.e. a lattice of size L
+                          has L^dimension sites.
+        """
+
+        self.processors = processors
+        self.units_per_processor = units_per_processor
+        self.dimension = dimension
+        # Cost model: seconds per site and sample (a) plus seconds per sample
+        # (b)
+        self.a = 1e-7
+        self.b = 0
+
+    def calibrate(self, func, probes):
+        """
+        Times func on probe units and fits the cost model to the timings.
+
+        :param func: Function processing a single unit.
+        :param probes: List of units to time (preferably of different L).
+
+        :return None:
+        """
+
+        sites, samples, times = [], [], []
+        for unit in probes:
+            num = unit.stop - unit.start
+            start = time.perf_counter()
+            func(unit)
+            times.append((time.perf_counter() - start) / num)
+            sites.append(unit.L**self.dimension)
+
+        if len(set(sites)) > 1:
+            a, b = np.linalg.lstsq(np.stack((sites, np.ones(len(sites))), 1),
+                                   times, rcond=None)[0]
+        else:
+            a, b = times[0] / sites[0], 0
+
+        # Guard against noisy timings producing a non positive model
+        self.a = max(a, 1e-12)
+        self.b = max(b, 0)
+
+    def cost(self, L, num):
+        """
+        Returns the modelled cost of num samples of lattice size L.
+
+        :param L: Lattice size.
+        :param num: Number of samples.
+
+        :return float: Cost in seconds.
+        """
+
+        return num * (self.a * L**self.dimension + self.b)
+
+    def split(self, tasks, num, entropy, chunks=None):
+        """
+        Splits the tasks into units of work ordered by cost (largest first).
+
+        :param tasks: List of (i, j, L, p) tuples, each needing num samples.
+        :param num: Number of samples per task.
+        :param entropy: Entropy of the run. The samples of each task are
+                        drawn in fixed blocks (see block_size), each from a
+                        stream derived from it and the block's position (i,
+                        j, block). Units consist of whole blocks, so the
+                        samples neither depend on the chunk sizes nor on the
+                        order units are processed in.
+        :param chunks: Dictionary with the number of samples per unit for
+                       each L. If None they are chosen from the cost model.
+
+        :return list: List of Unit.
+        """
+
+        if chunks is None:
+            chunks = self.chunk_sizes(tasks, num)
+
+        units = []
+        for i, j, L, p in tasks:
+            block = self.block_size(L)
+            key = [k for k in (i, j) if k is not None]
+            seed = {'entropy': entropy, 'spawn_key': key, 'block': block}
+            # ==> A single unit smaller than a block (e.g. stored before a
+            #     top-up) is extended to whole blocks
+            chunk = chunks[L]
+            if chunk % block and chunk < num:
+                chunk = -(-chunk // block) * block
+            for start in range(0, num, chunk):
+                units.append(Unit(i, j, L, p, start,
+                                  min(start + chunk, num), seed))
+
+        units.sort(key=lambda u: self.cost(u.L, u.stop - u.start),
+                   reverse=True)
+
+        return units
+
+    def block_size(self, L):
+        """
+        Returns the number of samples per block (about block_sites sites).
+        Only depends on L, never on the cost model.
+
+        :param L: Lattice size.
+
+        :return int: Number of samples per block.
+        """
+
+        return max(1, self.block_sites // L**self.dimension)
+
+    def chunk_sizes(self, tasks, num):
+        """
+        Returns the number of samples per unit for each L such that every unit
+        costs about the same and each processor gets units_per_processor
+        units on average. Units are whole blocks (see block_size), unless a
+        single unit covers all samples.
+
+        :param tasks: List of (i, j, L, p) tuples, each needing num samples.
+        :param num: Number of samples per task.
+
+        :return dict: Number of samples per unit for each L.
+        """
+
+        total = sum(self.cost(L, num) for _, _, L, _ in tasks)
+        target = total / (self.processors * self.units_per_processor)
+
+        chunks = {}
+        for _, _, L, _ in tasks:
+            block = self.block_size(L)
+            blocks = max(1, int(target // self.cost(L, block)))
+            chunks[L] = min(blocks * block, num)
+
+        return chunks
+
+    def map(self, pool, func, units):
+        """
+        Processes the units in the pool, results are returned as soon as they
+        are done.
+
+        :param pool: multiprocessing.Pool
+        :param func: Function processing a single unit. Has to be picklable
+                     (e.g. a module level function).
+        :param units: List of units (largest first).
+
+        :return iterator: Results of func in order of completion.
+        """
+
+        # Hand out several units at once only if there are plenty of them,
+        # otherwise the last units of a batch would delay the end of the run
+        chunksize = max(1, len(units) // (16 * self.processors))
+
+        return pool.imap_unordered(func, units, chunksize)
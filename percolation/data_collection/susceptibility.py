@@ -1,16 +1,39 @@
+import json
+from copy import copy
 from pathlib import Path
+from functools import partial
 from configparser import ConfigParser
 from multiprocessing import Pool
 
 import numpy as np
 
 from percolation.library.grid import Grid
-from percolation.model.hk import HoshenKopelman
-from percolation.model.measurment import get_susceptibility
+from percolation.library.generator import ConfigGenerator, BlockGenerator
+from percolation.library.store import ResultStore
+from percolation.library.accumulator import Accumulator
+from percolation.library.lattice import kinds, exponents, get_lattice, \
+    get_shape
+from percolation.library.telemetry import Telemetry, recorder
+from percolation.model.backends import label_batch, fastest
+from percolation.model.fasthk import label_batch as fast_label_batch
+from percolation.model.latticelabel import label_lattice_batch
+from percolation.model.bondhk import label_bonds_batch
+from percolation.model.nz import NewmanZiff
+from percolation.model.clusterstats import ClusterStatistics
+from percolation.model.fss import refine_ps
+from percolation.data_collection.scheduler import Scheduler, Unit
+from percolation.data_collection.checkpoint import Checkpoint
+
+# Directions of the wrapping probabilities R_L(p), in the order of the values
+# of simulate and sweep (see ..model.nz.NewmanZiff.get_wrapping)
+wrapping_kinds = ('x', 'y', 'either', 'both')
 
 
 class SusceptDataCollector:
 
+    # Number of lattice sites labelled together in one batch
+    batch_sites = 2**22
+
     def __init__(self, path):
         self.args = {'path': Path(path)}
 
@@ -25,26 +48,546 @@ class SusceptDataCollector:
         start, stop, num = config.get('main', 'probabilities').split(',')
         ps = np.linspace(float(start), float(stop), int(num), endpoint=True)
         num = int(config.get('main', 'num_iterations'))
+        # Either 'hk' (one Hoshen-Kopelman labelling per p and sample) or 'nz'
+        # (one Newman-Ziff sweep per sample for all p at once)
+        method = config.get('main', 'method', fallback='hk')
+        # Seed (entropy) of the run. Set it to replay a previous run exactly
+        # (the samples only depend on the seed, never on the units of work;
+        # adaptive runs may still stop after a different number of them). A
+        # resumed run keeps the seed of its checkpoint
+        seed = config.get('main', 'seed', fallback=None)
+        seed = None if seed is None else int(seed)
+        # Adaptive sampling: if rtol is set, each (L, p) is only sampled until
+        # the standard error of its mean is below rtol times the mean (but at
+        # least min_iterations times). num_iterations is then the cap
+        rtol = config.get('main', 'rtol', fallback=None)
+        rtol = None if rtol is None else float(rtol)
+        min_num = int(config.get('main', 'min_iterations',
+                                 fallback=min(100, num)))
+
+        # Adaptive p grid: probabilities is then the coarse initial grid,
+        # refined in that many stages by up to refine_points new p each
+        refinements = int(config.get('main', 'refinements', fallback=0))
+        refine_points = int(config.get('main', 'refine_points',
+                                       fallback=len(ps)))
+        # Whether to show the progress and write timers and counters of the
+        # phases to telemetry.json
+        telemetry = config.getboolean('main', 'telemetry', fallback=False)
+        # Labelling backend of the 'hk' method (see ..model.backends), 'auto'
+        # picks the fastest one for each L
+        backend = config.get('main', 'backend', fallback='auto')
+        # Kind of lattice (see ..library.lattice), e.g. 'cubic' for 3D
+        # percolation. Only the square lattice supports the 'nz' method
+        lattice = config.get('main', 'lattice', fallback='square')
+        if lattice not in kinds:
+            raise ValueError(f'Unknown lattice {lattice}.')
+        if lattice != 'square' and method == 'nz':
+            raise ValueError(f'The nz method needs a square lattice, not '
+                             f'{lattice}.')
+        if lattice == 'honeycomb' and any(L % 2 for L in Ls):
+            raise ValueError('A honeycomb lattice needs even lattice sizes.')
+        # Either 'site' or 'bond' percolation. Bond percolation is only
+        # supported on the square lattice with the 'hk' method
+        percolation = config.get('main', 'percolation', fallback='site')
+        if percolation not in ('site', 'bond'):
+            raise ValueError(f'Unknown percolation {percolation}.')
+        if percolation == 'bond' and (lattice != 'square' or method == 'nz'):
+            raise ValueError('Bond percolation needs the square lattice and '
+                             'the hk method.')
+        # Whether to also collect the wrapping probabilities R_L(p) (in x, y,
+        # either or both directions), detected while labelling. Only for site
+        # percolation on the square lattice
+        wrapping = config.getboolean('main', 'wrapping', fallback=False)
+        if wrapping and (lattice != 'square' or percolation != 'site'):
+            raise ValueError('Wrapping probabilities need site percolation '
+                             'on the square lattice.')
 
-        self.args.update({'processors': processors,
-                          'Ls': Ls, 'ps': ps, 'num': num})
+        self.args.update({'processors': processors, 'Ls': Ls, 'ps': ps,
+                          'num': num, 'method': method, 'seed': seed,
+                          'rtol': rtol, 'min_num': min_num,
+                          'refinements': refinements,
+                          'refine_points': refine_points,
+                          'telemetry': telemetry, 'backend': backend,
+                          'lattice': lattice, 'percolation': percolation,
+                          'wrapping': wrapping})
 
     def run(self):
+        """
+        Runs the data collection. Results are written to the directory of the
+        run (see collect).
+
+        :return ..library.accumulator.Accumulator: Running estimates of the
+                susceptibility and P_inf for each L and p.
+        """
+
+        if self.args['refinements'] > 0:
+            return self.refine()
+        else:
+            return self.collect()
+
+    def refine(self):
+        """
+        Collects data on an adaptively refined p grid. Each stage is a run of
+        its own in the subdirectory stage_{k} (with its own checkpoint). After
+        each stage a provisional pc is fitted to the data so far and the next
+        stage samples new probabilities where the finite size scaling carries
+        the most information (see ..model.fss.refine_ps). Finally the results
+        of all stages are merged into the directory of the run.
+
+        :return ..library.accumulator.Accumulator: Running estimates of the
+                susceptibility and P_inf for each L and (merged) p.
+        """
+
+        path, seed = self.args['path'], self.args['seed']
+        ps, stages = self.args['ps'], []
+
+        for k in range(self.args['refinements'] + 1):
+            stage = copy(self)
+            # ==> Every stage needs its own streams
+            stage.args = dict(self.args, path=path / f'stage_{k}', ps=ps,
+                              refinements=0,
+                              seed=None if seed is None else [seed, k])
+            stage.args['path'].mkdir(exist_ok=True)
+            stages.append((stage.args['path'], ps, stage.run()))
+
+            merged, accumulator = self.merge_stages(stages)
+            if k == self.args['refinements']:
+                break
+
+            # ==> Susceptibility of (L, p) without any finite cluster is nan
+            S = np.where(accumulator.count[..., 0] > 0,
+                         accumulator.mean[..., 0], np.nan)
+            lattice = kinds[self.args['lattice']]
+            pc = lattice['pc_bond' if self.args['percolation'] == 'bond'
+                         else 'pc']
+            pc, ps = refine_ps(S, self.args['Ls'], merged,
+                               self.args['refine_points'], pc=pc,
+                               **exponents[lattice['dimension']])
+            ps = ps[~np.isin(ps, merged)]
+            if len(ps) == 0:
+                break
+
+        params = {'method': self.args['method'], 'Ls': self.args['Ls'],
+                  'ps': merged, 'seed': seed,
+                  'lattice': self.args['lattice'],
+                  'percolation': self.args['percolation'],
+                  'wrapping': self.args['wrapping'],
+                  'processors': self.args['processors'],
+                  'num': self.args['num']}
+        for name in self.get_quantities().values():
+            store = ResultStore(path / name, params)
+            for stage_path, stage_ps, _ in stages:
+                stage_store = ResultStore(stage_path / name)
+                # ==> One p at a time to never load a whole stage
+                for k, j in enumerate(np.searchsorted(merged, stage_ps)):
+                    store.data[:, j] = stage_store.data[:, k]
+            store.flush()
+        self.write_statistics(accumulator, merged)
+
+        return accumulator
+
+    @staticmethod
+    def merge_stages(stages):
+        """
+        Merges the probabilities and running estimates of all stages.
+
+        :param stages: List of (path, ps, accumulator) of each stage.
+
+        :return ndarray, ..library.accumulator.Accumulator: The probabilities
+                of all stages (ascending) and the merged estimates.
+        """
+
+        merged = np.sort(np.concatenate([ps for _, ps, _ in stages]))
+        shape = stages[0][2].count.shape
+        accumulator = Accumulator((shape[0], len(merged), shape[2]))
+
+        for _, ps, stage in stages:
+            j = np.searchsorted(merged, ps)
+            for name in ('drawn', 'count', 'mean', 'm2', 'm3', 'm4'):
+                getattr(accumulator, name)[:, j] = getattr(stage, name)
+
+        return merged, accumulator
+
+    def collect(self):
+        """
+        Collects the susceptibility and P_inf (and, if enabled, the wrapping
+        probabilities) for each L, p and sample. The values are written into
+        one store per quantity (see get_quantities), the running estimates
+        into statistics.json and, if enabled, the timers and counters of the
+        run into telemetry.json.
+
+        :return ..library.accumulator.Accumulator: Running estimates of the
+                susceptibility and P_inf for each L and p.
+        """
+
+        func, tasks = self.get_tasks()
+        dimension = kinds[self.args['lattice']]['dimension']
+        scheduler = Scheduler(self.args['processors'], dimension=dimension)
+
+        def chunks():
+            scheduler.calibrate(func, self.get_probes(tasks))
+            # ==> Adaptive runs need small units to stop early
+            num = self.args['num'] if self.args['rtol'] is None else \
+                min(self.args['min_num'], self.args['num'])
+            return scheduler.chunk_sizes(tasks, num)
+
+        # Resume from the checkpoint of a previous (interrupted) run if there
+        # is one, otherwise start a new one
+        checkpoint = Checkpoint(self.args['path'])
+        params = {'method': self.args['method'], 'Ls': self.args['Ls'],
+                  'ps': self.args['ps'].tolist(), 'seed': self.args['seed'],
+                  'lattice': self.args['lattice'],
+                  'percolation': self.args['percolation'],
+                  'wrapping': self.args['wrapping']}
+        params, chunks = checkpoint.start(params, chunks)
+
+        # Every unit of work gets its own independent stream derived from the
+        # seed of the run
+        entropy = ConfigGenerator(params['seed']).seed_sequence.entropy
+        units = scheduler.split(tasks, self.args['num'], entropy, chunks)
+        self.write_seeds(entropy, units)
+
+        # Value of each quantity for each L, p and sample, written straight
+        # to disk, as well as running estimates of their moments
+        params = dict(params, processors=self.args['processors'],
+                      num=self.args['num'])
+        stores = [ResultStore(self.args['path'] / name, params)
+                  for name in self.get_quantities().values()]
+        accumulator = Accumulator((len(self.args['Ls']),
+                                   len(self.args['ps']), len(stores)))
+
+        # ==> Only units matching the current split are reused, the others
+        #     (e.g. the last chunk of a run topped up with more samples) are
+        #     dropped together with their shards
+        checkpoint.prune({checkpoint.key(unit) for unit in units})
+        done = checkpoint.done()
+        for unit, values in checkpoint.load(done):
+            self.insert(stores, accumulator, unit, values)
+        pending = [unit for unit in units if checkpoint.key(unit) not in done]
+
+        telemetry = Telemetry(self.args['telemetry'])
+        telemetry.total = sum(get_sites(unit, dimension) for unit in pending)
+        worker = telemetry.instrument(func)
+
         with Pool(self.args['processors']) as pool:
-            pool.map(self.func, self.args['ps'])
+            while pending:
+                if self.args['rtol'] is None:
+                    batch, pending = pending, []
+                else:
+                    # ==> Units of converged tasks are dropped
+                    left = sum(get_sites(unit, dimension) for unit in pending)
+                    batch, pending = self.next_round(pending, accumulator,
+                                                     scheduler)
+                    kept = batch + pending
+                    telemetry.total -= left - sum(get_sites(unit, dimension)
+                                                  for unit in kept)
+
+                for result in scheduler.map(pool, worker, batch):
+                    unit, values = telemetry.receive(result)
+                    with telemetry.timer('write'):
+                        checkpoint.add(unit, values)
+                        self.insert(stores, accumulator, unit, values)
+                    telemetry.count('samples', unit.stop - unit.start)
+                    telemetry.count('sites', get_sites(unit, dimension))
+                    telemetry.progress()
+
+        with telemetry.timer('write'):
+            for store in stores:
+                store.flush()
+            self.write_statistics(accumulator, self.args['ps'])
+        telemetry.progress(force=True)
+        telemetry.write_summary(self.args['path'] / 'telemetry.json')
+
+        return accumulator
+
+    @staticmethod
+    def insert(stores, accumulator, unit, values):
+        """
+        Writes the values of a finished unit into the stores and adds them
+        to the accumulator.
+
+        :param stores: List of ..library.store.ResultStore, one for each
+                       quantity.
+        :param accumulator: ..library.accumulator.Accumulator
+        :param unit: ..data_collection.scheduler.Unit
+        :param values: Array with the values of the unit (see simulate and
+                       sweep).
+
+        :return None:
+        """
+
+        # ==> Newman-Ziff sweeps have values for all p at once
+        index = (unit.i,) if unit.j is None else (unit.i, unit.j)
+        accumulator.add(values, index)
+
+        for k, store in enumerate(stores):
+            store.data[index][..., unit.start:unit.stop] = \
+                np.moveaxis(values[..., k], 0, -1)
+
+    def next_round(self, pending, accumulator, scheduler):
+        """
+        Drops the pending units of all converged tasks and picks the units
+        of the next round of adaptive sampling: enough for each remaining
+        task to reach min_iterations and overall enough to keep every
+        processor busy.
+
+        :param pending: List of units not done yet (largest first).
+        :param accumulator: ..library.accumulator.Accumulator
+        :param scheduler: ..data_collection.scheduler.Scheduler
+
+        :return list, list: Units of this round and those left pending.
+        """
+
+        # Number of samples drawn and whether all quantities converged (or
+        # were never defined, e.g. the susceptibility without finite
+        # clusters) for each L and p
+        samples = accumulator.drawn[..., 0]
+        converged = np.all(accumulator.converged(self.args['rtol']) |
+                           (accumulator.count == 0), axis=-1)
+        converged &= samples >= min(self.args['min_num'], self.args['num'])
+
+        tasks = {}
+        for unit in pending:
+            index = (unit.i,) if unit.j is None else (unit.i, unit.j)
+            if not np.all(converged[index]):
+                tasks.setdefault((unit.i, unit.j), []).append(unit)
+
+        per_task = -(-scheduler.processors * scheduler.units_per_processor //
+                     max(len(tasks), 1))
+        batch, pending = [], []
+        for (i, j), units in tasks.items():
+            units.sort(key=lambda unit: unit.start)
+            index = (i,) if j is None else (i, j)
+            missing = self.args['min_num'] - np.min(samples[index])
+            num = max(per_task, -(-missing // (units[0].stop -
+                                                units[0].start)))
+            batch.extend(units[:num])
+            pending.extend(units[num:])
+
+        return batch, pending
+
+    def get_tasks(self):
+        """
+        Returns the function processing a unit of work and the list of tasks
+        (i, j, L, p) for the chosen method.
+
+        :return function, list: Picklable function and list of tasks.
+        """
+
+        Ls, ps = self.args['Ls'], self.args['ps']
+
+        if self.args['method'] == 'nz':
+            func = partial(sweep, ps=ps, wrapping=self.args['wrapping'])
+            tasks = [(i, None, L, None) for i, L in enumerate(Ls)]
+        else:
+            func = partial(simulate, batch_sites=self.batch_sites,
+                           backend=self.get_backends(),
+                           lattice=self.args['lattice'],
+                           percolation=self.args['percolation'],
+                           wrapping=self.args['wrapping'])
+            tasks = [(i, j, L, p) for i, L in enumerate(Ls)
+                     for j, p in enumerate(ps)]
+
+        return func, tasks
+
+    def get_quantities(self):
+        """
+        Returns the collected quantities, in the order of the values of
+        simulate and sweep.
+
+        :return dict: Name of the store file of each quantity.
+        """
+
+        quantities = {'susceptibility': 'results.bin', 'p_inf': 'p_inf.bin'}
+        if self.args['wrapping']:
+            quantities.update({f'r_{kind}': f'r_{kind}.bin'
+                               for kind in wrapping_kinds})
+
+        return quantities
+
+    def get_backends(self):
+        """
+        Returns the labelling backend for each L. Chosen once here so all
+        workers use the same ones.
+
+        :return dict: Name of the backend for each L (None for lattices
+                      other than square, which use the generic labeller,
+                      and for bond percolation).
+        """
+
+        if self.args['lattice'] != 'square' or \
+                self.args['percolation'] == 'bond':
+            return {L: None for L in self.args['Ls']}
+        if self.args['backend'] != 'auto':
+            return {L: self.args['backend'] for L in self.args['Ls']}
+
+        # ==> Probes of about 2^18 sites, as batched in simulate
+        return {L: fastest((L, L), min(max(1, 2**18 // L**2),
+                                       self.args['num']))
+                for L in self.args['Ls']}
+
+    def get_probes(self, tasks):
+        """
+        Returns small units of work (one per L) to calibrate the cost model.
+
+        :param tasks: List of tasks (i, j, L, p).
+
+        :return list: List of Unit.
+        """
+
+        probes = []
+        dimension = kinds[self.args['lattice']]['dimension']
+        for i, j, L, p in tasks:
+            # About 2^16 sites per probe in the middle of the ps
+            if j is None or j == len(self.args['ps']) // 2:
+                num = min(max(1, 2**16 // L**dimension), self.args['num'])
+                # ==> Fresh entropy, probes are only timed
+                seed = {'entropy': None, 'spawn_key': [], 'block': num}
+                probes.append(Unit(i, j, L, p, 0, num, seed))
+
+        return probes
+
+    def write_seeds(self, entropy, units):
+        seeds = {'seed': entropy,
+                 'units': [dict(unit._asdict(), p=unit.p and float(unit.p))
+                           for unit in units]}
+        with open(self.args['path'] / 'seeds.json', 'w') as file:
+            json.dump(seeds, file, indent=4)
+
+    def write_statistics(self, accumulator, ps):
+        statistics = {'Ls': self.args['Ls'], 'ps': ps.tolist(),
+                      'quantities': list(self.get_quantities()),
+                      **accumulator.to_dict()}
+        with open(self.args['path'] / 'statistics.json', 'w') as file:
+            json.dump(statistics, file)
+
+
+def simulate(unit, batch_sites, backend, lattice='square',
+             percolation='site', wrapping=False):
+    """
+    Processes a unit of work: labels the samples of the unit one batch at a
+    time and measures their susceptibility and P_inf.
+
+    :param unit: ..data_collection.scheduler.Unit
+    :param batch_sites: Number of lattice sites labelled together.
+    :param backend: Dictionary with the name of the labelling backend for
+                    each L (see ..model.backends). Only used for the square
+                    lattice.
+    :param lattice: Kind of lattice (see ..library.lattice.Lattice).
+    :param percolation: Either 'site' or 'bond' (square lattice only, see
+                        ..library.bondgrid.BondGrid).
+    :param wrapping: Whether to also detect if any cluster wraps around the
+                     lattice (site percolation on the square lattice only,
+                     labelled via ..model.fasthk.label_batch).
+
+    :return Unit, ndarray: The unit and the susceptibility (column 0) and
+                           P_inf (column 1) for each sample (rows). If
+                           wrapping, columns 2 to 5 are 1 if a cluster wraps
+                           in the direction x, y, either or both (see
+                           wrapping_kinds) and 0 otherwise.
+    """
+
+    generator = BlockGenerator(unit.seed, unit.start)
+    num = unit.stop - unit.start
+    values = np.zeros((num, 2 + 4 * wrapping), dtype=np.float64)
+
+    # Label as many samples at once as fit into the batch size
+    shape = get_shape(lattice, unit.L)
+    batch = min(max(1, batch_sites // int(np.prod(shape))), num)
+    # ==> Bond configurations have a horizontal and a vertical edge array
+    bonds = (2,) if percolation == 'bond' else ()
+    configs = np.empty((batch,) + bonds + shape, dtype=np.bool_)
+
+    for start in range(0, num, batch):
+        stop = min(start + batch, num)
+        with recorder.timer('randomize'):
+            generator.fill(configs[:stop - start], unit.p)
+        if wrapping:
+            sizes, flags = fast_label_batch(configs[:stop - start],
+                                            wrapping=True)
+        elif percolation == 'bond':
+            sizes = label_bonds_batch(configs[:stop - start])
+        elif lattice == 'square':
+            sizes = label_batch(configs[:stop - start], backend[unit.L])
+        else:
+            sizes = label_lattice_batch(configs[:stop - start],
+                                        get_lattice(lattice, shape))
+        with recorder.timer('measure'):
+            stats = ClusterStatistics(sizes, shape)
+            values[start:stop, 0] = stats.get_susceptibility()
+            values[start:stop, 1] = stats.get_p_inf()
+            if wrapping:
+                # ==> Flags of all clusters combined, as in NewmanZiff
+                code = np.array([np.bitwise_or.reduce(f, initial=0)
+                                 for f in flags], dtype=np.uint8)
+                values[start:stop, 2:] = get_wrapping(code)
+
+    return unit, values
+
+
+def sweep(unit, ps, wrapping=False):
+    """
+    Processes a unit of work via Newman-Ziff: one sweep per sample gives the
+    susceptibility and P_inf for all probabilities at once.
+
+    :param unit: ..data_collection.scheduler.Unit
+    :param ps: List of probabilities.
+    :param wrapping: Whether to also compute the wrapping probabilities.
+
+    :return Unit, ndarray: The unit and the susceptibility ([..., 0]) and
+                           P_inf ([..., 1]) for each sample (first axis) and
+                           p (second axis). If wrapping, [..., 2:6] are the
+                           probabilities that a cluster wraps in the
+                           direction x, y, either or both (see
+                           wrapping_kinds).
+    """
+
+    generator = BlockGenerator(unit.seed, unit.start)
+    values = np.zeros((unit.stop - unit.start, len(ps), 2 + 4 * wrapping),
+                      dtype=np.float64)
+    nz = NewmanZiff(Grid((unit.L, unit.L)))
+
+    for k in range(len(values)):
+        # ==> The random order of the sites is drawn inside the sweep
+        with recorder.timer('label'):
+            nz.setup()
+            nz.run(generator.advance(1)[0])
+        with recorder.timer('measure'):
+            values[k, :, 0] = nz.get_susceptibility(ps)
+            values[k, :, 1] = nz.get_p_inf(ps)
+            if wrapping:
+                values[k, :, 2:] = np.transpose([nz.get_wrapping(ps, kind)
+                                                 for kind in wrapping_kinds])
+
+    return unit, values
+
+
+def get_wrapping(code):
+    """
+    Decodes combined wrapping flags (bit 1 for x, bit 2 for y, see
+    ..library.unionfind.UnionFind.get_wrapping).
+
+    :param code: Array with the wrapping flags of each sample.
+
+    :return ndarray: Array (samples x 4) which is 1 if the sample wraps in
+                     the direction x, y, either or both and 0 otherwise.
+    """
+
+    x = (code & 1) != 0
+    y = (code & 2) != 0
+
+    return np.stack((x, y, x | y, x & y), axis=-1).astype(np.float64)
+
 
-    def func(self, p):
-        S = np.zeros((len(self.args['Ls']), self.args['num']), dtype=np.float_)
+def get_sites(unit, dimension=2):
+    """
+    Returns the number of lattice sites processed by a unit of work (one
+    lattice per sample, also for Newman-Ziff sweeps).
 
-        for i, L in enumerate(self.args['Ls']):
-            grid = Grid((L, L))
-            hk = HoshenKopelman(grid)
+    :param unit: ..data_collection.scheduler.Unit
+    :param dimension: Dimension of the lattice.
 
-            for j in range(self.args['num']):
-                grid.randomize(p)
-                hk.setup()
-                _, sizes = hk.run()
-                S[i, j] = get_susceptibility(sizes)
+    :return int: Number of sites.
+    """
 
-        file_path = self.args['path'] / f'p_{p:.3f}.csv'
-        np.savetxt(file_path, S.T, delimiter=',')
+    return (unit.stop - unit.start) * unit.L**dimension
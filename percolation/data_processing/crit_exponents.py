@@ -1,9 +1,14 @@
 from pathlib import Path
+from functools import partial
+from statistics import NormalDist
 from configparser import ConfigParser
+from multiprocessing import Pool
 
 import numpy as np
 
 from percolation.model.fss import fss
+from percolation.library.store import ResultStore
+from percolation.library.lattice import kinds, exponents
 
 
 class CritExponentEstimator:
@@ -28,22 +33,163 @@ class CritExponentEstimator:
                           'Ls': Ls, 'ps': ps, 'num': num})
 
     def read_output(self):
-        self.S = np.zeros((len(self.args['ps']), self.args['num'],
-                           len(self.args['Ls'])), dtype=np.float_)
+        file_path = self.args['path'] / 'results.bin'
 
-        for i, p in enumerate(self.args['ps']):
-            file_path = self.args['path'] / f'p_{p:.3f}.csv'
-            self.S[i, :, :] = np.loadtxt(file_path, delimiter=',')
+        if file_path.exists():
+            store = ResultStore(file_path)
+        else:
+            # ==> Results of an older run as CSV files, convert them once
+            params = {key: value for key, value in self.args.items()
+                      if key != 'path'}
+            store = ResultStore.from_csv(self.args['path'], file_path,
+                                         params)
 
-        self.S = np.swapaxes(self.S, 0, 1)
-        self.S = np.swapaxes(self.S, 1, 2)
+        # Fits start at (and, unless varied, keep) the known threshold and
+        # exponents of the lattice
+        lattice = kinds[store.params.get('lattice', 'square')]
+        bond = store.params.get('percolation', 'site') == 'bond'
+        init = dict(exponents[lattice['dimension']],
+                    pc=lattice['pc_bond' if bond else 'pc'])
 
-    def estimate(self):
-        pc = []
+        self.args.update({'Ls': store.Ls, 'ps': store.ps, 'num': store.num,
+                          'init': init})
+        self.store = store
+        # View with shape (sample, L, p), values are only read from disk when
+        # a sample is used
+        self.S = np.moveaxis(store.data, 2, 0)
 
-        for data in self.S:
-            out = fss(data, self.args['Ls'], self.args['ps'],
-                      vary_exponents=False)
-            pc.append(out.params['pc'].value)
+    def estimate(self, block=1000):
+        """
+        Fits pc to each sample on its own. Samples without any valid (not
+        nan) value, e.g. ones never drawn by an adaptive run, are skipped,
+        their fit would just return the initial pc.
 
-        return np.array(pc)
+        :param block: Number of samples read from the store at once to find
+                      the drawn ones.
+
+        :return ndarray: Estimated pc of each drawn sample.
+        """
+
+        drawn = []
+        for start in range(0, self.args['num'], block):
+            data = np.asarray(self.S[start:start + block])
+            drawn.extend(start + np.flatnonzero(
+                ~np.isnan(data).all(axis=(1, 2))))
+
+        func = partial(fit, Ls=self.args['Ls'], ps=self.args['ps'],
+                       vary_exponents=False, init=self.args['init'])
+
+        with Pool(self.args['processors']) as pool:
+            params = pool.map(func, (self.S[k] for k in drawn))
+
+        return np.array([pc for pc, _, _ in params])
+
+    def estimate_resampled(self, method='bootstrap', num=200, block=None,
+                           vary_exponents=True, level=0.95, seed=None):
+        """
+        Estimates pc, gamma and nu with confidence intervals by resampling
+        blocks of samples. The fit to the mean over all samples (pooled
+        estimate) is the estimate, the fits to the resampled means (run in
+        parallel and warm started from the pooled estimate) give its
+        uncertainty.
+
+        :param method: Either 'bootstrap' (num replicates drawing blocks
+                       with replacement) or 'jackknife' (leaving out one
+                       block at a time).
+        :param num: Number of bootstrap replicates.
+        :param block: Number of samples per block. If None the samples are
+                      split into 50 blocks (or single samples if there are
+                      fewer).
+        :param vary_exponents: Whether to fit gamma and nu as well or fix
+                               them at the "true" values.
+        :param level: Confidence level of the intervals.
+        :param seed: Seed of the bootstrap.
+
+        :return dict: For 'pc', 'gamma' and 'nu' a tuple with the pooled
+                      estimate, lower and upper bound of the confidence
+                      interval and the standard error.
+        """
+
+        if block is None:
+            block = max(1, self.args['num'] // 50)
+        sums, counts = self.get_blocks(block)
+
+        # ==> Blocks without any valid sample (e.g. not sampled by an
+        #     adaptive run) carry no weight
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pooled = sums.sum(axis=0) / counts.sum(axis=0)
+        init = fit(pooled, self.args['Ls'], self.args['ps'],
+                   vary_exponents, self.args['init'])
+
+        if method == 'bootstrap':
+            rng = np.random.default_rng(seed)
+            weights = rng.multinomial(len(sums), np.full(len(sums),
+                                                         1 / len(sums)),
+                                      size=num)
+        elif method == 'jackknife':
+            weights = 1 - np.eye(len(sums))
+        else:
+            raise ValueError(f'Unknown resampling method {method}.')
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            replicates = np.tensordot(weights, sums, 1) / \
+                np.tensordot(weights, counts, 1)
+
+        func = partial(fit, Ls=self.args['Ls'], ps=self.args['ps'],
+                       vary_exponents=vary_exponents,
+                       init=dict(zip(('pc', 'gamma', 'nu'), init)))
+        with Pool(self.args['processors']) as pool:
+            params = np.array(pool.map(func, replicates))
+
+        if method == 'bootstrap':
+            alpha = (1 - level) / 2
+            lower, upper = np.quantile(params, (alpha, 1 - alpha), axis=0)
+            error = np.std(params, axis=0, ddof=1)
+        else:
+            n = len(params)
+            error = np.sqrt((n - 1) / n * np.sum(
+                (params - params.mean(axis=0))**2, axis=0))
+            z = NormalDist().inv_cdf(0.5 + level / 2)
+            lower, upper = init - z * error, init + z * error
+
+        return {name: (init[k], lower[k], upper[k], error[k])
+                for k, name in enumerate(('pc', 'gamma', 'nu'))}
+
+    def get_blocks(self, block):
+        """
+        Returns the sum and the number of valid (not nan) samples of each
+        block of samples. Reads one block at a time from the store.
+
+        :param block: Number of samples per block.
+
+        :return ndarray, ndarray: Sums and counts with shape (blocks, L, p).
+        """
+
+        sums, counts = [], []
+        for start in range(0, self.args['num'], block):
+            data = np.asarray(self.S[start:start + block])
+            valid = ~np.isnan(data)
+            sums.append(np.where(valid, data, 0).sum(axis=0))
+            counts.append(valid.sum(axis=0))
+
+        return np.array(sums), np.array(counts)
+
+
+def fit(S, Ls, ps, vary_exponents=False, init=None):
+    """
+    Fits the finite size scaling to one susceptibility matrix (see
+    ..model.fss.fss). Module level to be usable in a process pool.
+
+    :param S: A matrix with len(Ls) rows and len(ps) columns.
+    :param Ls: List of the system sizes.
+    :param ps: List of the probabilities.
+    :param vary_exponents: Whether to fit the critical exponents too.
+    :param init: Dictionary with initial values (see ..model.fss.fss).
+
+    :return ndarray: Estimated pc, gamma and nu.
+    """
+
+    out = fss(S, Ls, ps, vary_exponents=vary_exponents, init=init)
+
+    return np.array([out.params[name].value
+                     for name in ('pc', 'gamma', 'nu')])
@@ -0,0 +1,159 @@
+import numpy as np
+
+
+class Accumulator:
+
+    def __init__(self, shape=()):
+        """
+        This class encapsulates online (streaming) estimates of the mean and
+        the central moments up to fourth order of many quantities at once.
+        Samples are added batch by batch and combined with the pairwise
+        update formulas of Welford/Chan/Pebay, which are numerically stable
+        and never need the samples again. Nan values are ignored by the
+        estimates but still counted as drawn samples.
+
+        :param shape: Shape of the quantities, e.g. (number of Ls, number of
+                      ps).
+        """
+
+        # Number of samples drawn (drawn) and of valid, i.e. non nan, ones
+        # (count) for each quantity
+        self.drawn = np.zeros(shape, dtype=np.int_)
+        self.count = np.zeros(shape, dtype=np.int_)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        # Sums of the 2nd, 3rd and 4th power of the deviations from the mean
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.m3 = np.zeros(shape, dtype=np.float64)
+        self.m4 = np.zeros(shape, dtype=np.float64)
+
+    def add(self, values, index=()):
+        """
+        Adds a batch of samples.
+
+        :param values: Array with the samples along the first axis followed
+                       by the shape of the quantities (or of the part
+                       selected by index).
+        :param index: Index (e.g. a tuple of ints or slices) of the
+                      quantities the samples belong to.
+
+        :return None:
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        n_b = valid.sum(axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(valid, values, 0).sum(axis=0) / n_b
+            delta = np.where(valid, values - mean_b, 0)
+        mean_b = np.nan_to_num(mean_b)
+        m2_b, m3_b, m4_b = [np.sum(delta**k, axis=0) for k in (2, 3, 4)]
+
+        n_a = self.count[index]
+        mean_a, m2_a, m3_a = self.mean[index], self.m2[index], self.m3[index]
+        n = n_a + n_b
+        # ==> Avoids division by zero, all terms vanish for an empty batch
+        n_safe = np.maximum(n, 1)
+
+        delta = mean_b - mean_a
+        self.m4[index] = (
+            self.m4[index] + m4_b
+            + delta**4 * n_a * n_b * (n_a**2 - n_a * n_b + n_b**2)
+            / n_safe**3
+            + 6 * delta**2 * (n_a**2 * m2_b + n_b**2 * m2_a) / n_safe**2
+            + 4 * delta * (n_a * m3_b - n_b * m3_a) / n_safe)
+        self.m3[index] = (
+            m3_a + m3_b + delta**3 * n_a * n_b * (n_a - n_b) / n_safe**2
+            + 3 * delta * (n_a * m2_b - n_b * m2_a) / n_safe)
+        self.m2[index] = m2_a + m2_b + delta**2 * n_a * n_b / n_safe
+        self.mean[index] = mean_a + delta * n_b / n_safe
+        self.count[index] = n
+        self.drawn[index] += len(values)
+
+    def get_variance(self):
+        """
+        Returns the (unbiased) sample variance.
+
+        :return ndarray: Variance of each quantity, nan for less than two
+                         samples.
+        """
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1),
+                            np.nan)
+
+    def get_std_error(self):
+        """
+        Returns the standard error of the mean.
+
+        :return ndarray: Standard error of each quantity, nan for less than
+                         two samples.
+        """
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.get_variance() / self.count)
+
+    def get_skewness(self):
+        """
+        Returns the (population) skewness.
+
+        :return ndarray: Skewness of each quantity.
+        """
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.count) * self.m3 / self.m2**1.5
+
+    def get_kurtosis(self):
+        """
+        Returns the (population) excess kurtosis.
+
+        :return ndarray: Excess kurtosis of each quantity.
+        """
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.count * self.m4 / self.m2**2 - 3
+
+    def converged(self, rtol, min_count=2, min_fraction=0.5):
+        """
+        Returns whether the standard error of the mean is below a relative
+        tolerance.
+
+        :param rtol: Relative tolerance, i.e. the largest accepted ratio of
+                     standard error to the absolute mean.
+        :param min_count: Minimum number of valid samples before the error
+                          estimate is trusted.
+        :param min_fraction: Minimum fraction of valid samples among the
+                             drawn ones before the error estimate is
+                             trusted.
+
+        :return ndarray: Boolean for each quantity.
+        """
+
+        error = self.get_std_error()
+        trusted = (self.count >= min_count) & \
+            (self.count >= min_fraction * self.drawn)
+        # ==> A quantity that is exactly 0 in every sample (e.g. P_inf far
+        #     below p_c) has no error at all
+        return trusted & (error <= rtol * np.abs(self.mean))
+
+    def to_dict(self):
+        """
+        Returns the estimates as a dictionary of nested lists (e.g. to be
+        written as JSON).
+
+        :return dict: Number of drawn and valid samples, mean, variance,
+                      standard error, skewness and kurtosis. Undefined
+                      values (e.g. the mean without samples) are None.
+        """
+
+        mean = np.where(self.count > 0, self.mean, np.nan)
+        estimates = {'drawn': self.drawn, 'count': self.count, 'mean': mean,
+                     'variance': self.get_variance(),
+                     'std_error': self.get_std_error(),
+                     'skewness': self.get_skewness(),
+                     'kurtosis': self.get_kurtosis()}
+
+        # ==> JSON has no nan, use None instead
+        return {key: np.where(np.isnan(value), None, value).tolist()
+                if value.dtype.kind == 'f' else value.tolist()
+                for key, value in estimates.items()}
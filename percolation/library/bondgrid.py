@@ -0,0 +1,85 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from .generator import default_generator
+
+
+class BondGrid:
+
+    def __init__(self, shape):
+        """
+        This class encapsulates the bonds of a regular 2D-square grid
+        (lattice) with periodic boundary conditions in each direction, for
+        bond percolation. Every site is present, the state of the bonds is
+        stored in two boolean edge arrays with the shape of the grid:
+        horizontal[x, y] is the bond between the sites (x, y) and (x, y + 1)
+        and vertical[x, y] the bond between (x, y) and (x + 1, y) (both
+        periodic).
+
+        :param shape: Shape of the grid as a list of two ints. First int is the
+                      number of rows, second number of columns.
+        """
+
+        # The state of each bond, horizontal ones first. Both edge arrays are
+        # views such that a single call randomizes all bonds
+        self.bonds = np.zeros((2,) + tuple(shape), dtype=np.bool_)
+        self.horizontal = self.bonds[0]
+        self.vertical = self.bonds[1]
+
+    @property
+    def size(self):
+        """
+        Returns the number of points on the lattice.
+
+        :return int: Size of the lattice.
+        """
+
+        return self.horizontal.size
+
+    @property
+    def shape(self):
+        """
+        Returns the shape of the lattice.
+
+        :return int, int: Shape of the square lattice (row, column).
+        """
+
+        return self.horizontal.shape
+
+    @property
+    def N(self):
+        """
+        Returns the number of rows in the lattice.
+
+        :return int: Number of rows.
+        """
+
+        return self.shape[0]
+
+    @property
+    def M(self):
+        """
+        Returns the number of columns in the lattice.
+
+        :return int: Number of columns.
+        """
+
+        return self.shape[1]
+
+    def randomize(self, p=0.5, generator=None):
+        """
+        Randomizes the bonds (in place) with a probability p for each bond to
+        be open.
+
+        :param p: Probability for each bond to be open (0 <= p <= 1).
+        :param generator: ..library.generator.ConfigGenerator to draw from. If
+                          None the default generator of the process is used.
+
+        :return None:
+        """
+
+        if generator is None:
+            generator = default_generator()
+
+        generator.fill(self.bonds, p)
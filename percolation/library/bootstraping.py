@@ -1,10 +1,129 @@
+import warnings
+from functools import partial
+
 import numpy as np
 
 
-def bootstrap_mean(sample, num=1000):
-    bootstrap_samples = np.random.choice(sample, replace=True,
-                                         size=(num, len(sample)))
-    means = np.sort(np.mean(bootstrap_samples, axis=1))
-    lower = means[int(num*0.025)]
-    higher = means[int(num*0.975)]
-    return np.mean(means), lower,higher,np.std(means)
+def bootstrap_mean(sample, num=1000, seed=None):
+    # ==> A replicate drawing a nan sample is nan (as with plain resampling)
+    replicates = np.sort(bootstrap(sample, partial(mean, skipna=False), num,
+                                   seed))
+    lower = replicates[int(num*0.025)]
+    higher = replicates[int(num*0.975)]
+    return np.mean(replicates), lower, higher, np.std(replicates)
+
+
+def bootstrap(samples, statistic=None, num=1000, seed=None,
+              max_memory=2**27):
+    """
+    Bootstraps a statistic of many series of samples at once. Every
+    replicate resamples each series with replacement, represented by the
+    number of times each sample is drawn (multinomial counts) instead of a
+    copy of the samples. The replicates are generated in chunks such that
+    the counts of a chunk take about max_memory bytes at most. This is a
+    soft limit: the statistic may combine series, so a replicate is never
+    split and at least one is generated at a time (with a warning if that
+    already takes more).
+
+    :param samples: Array with the samples along the last axis. All other
+                    axes are independent series (e.g. (L, p, sample)), each
+                    resampled on its own.
+    :param statistic: Function statistic(samples, weights) returning the
+                      statistic for a chunk of replicates. weights has the
+                      shape (chunk, *samples.shape), each series summing to
+                      one. The result needs the chunk as first axis and may
+                      combine series, e.g. a ratio of two susceptibilities:
+                          lambda x, w: mean(x[1], w[:, 1]) / mean(x[0],
+                                                                  w[:, 0])
+                      If None the mean is bootstrapped (see mean and
+                      binder_cumulant).
+    :param num: Number of replicates.
+    :param seed: Seed (None, int or numpy.random.SeedSequence). Each series
+                 draws from its own stream spawned from it, so the result
+                 neither depends on max_memory nor on the other series.
+    :param max_memory: Memory in bytes the counts of a chunk may use (soft
+                       limit, see above).
+
+    :return ndarray: Statistic of each replicate (first axis).
+    """
+
+    if statistic is None:
+        statistic = mean
+
+    samples = np.asarray(samples, dtype=np.float64)
+    *shape, n = samples.shape
+    series = int(np.prod(shape))
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    rngs = [np.random.Generator(np.random.PCG64(child))
+            for child in seed.spawn(series)]
+
+    # ==> Indices, counts and weights take 8 bytes per sample and replicate
+    #     each
+    chunk = int(np.clip(max_memory // (24 * max(series * n, 1)), 1, num))
+    if 24 * series * n > max_memory:
+        warnings.warn(f'A single bootstrap replicate takes '
+                      f'{24 * series * n} bytes, more than max_memory '
+                      f'({max_memory} bytes).', RuntimeWarning)
+    replicates = []
+
+    for start in range(0, num, chunk):
+        size = min(chunk, num - start)
+        weights = np.empty((size, series, n), dtype=np.float64)
+        offset = np.arange(size)[:, None] * n
+
+        for k, rng in enumerate(rngs):
+            draws = rng.integers(0, n, size=(size, n))
+            draws += offset
+            weights[:, k] = np.bincount(draws.ravel(),
+                                        minlength=size * n).reshape(size, n)
+
+        weights /= n
+        replicates.append(statistic(samples,
+                                    weights.reshape(size, *shape, n)))
+
+    return np.concatenate(replicates)
+
+
+def mean(samples, weights, skipna=True):
+    """
+    Returns the weighted mean of each series.
+
+    :param samples: Array with the samples along the last axis.
+    :param weights: Array with the weights of the samples (broadcastable to
+                    samples, e.g. with an additional leading axis for many
+                    replicates).
+    :param skipna: Whether to ignore nan samples. If False the mean is nan
+                   if any nan sample has a non zero weight.
+
+    :return ndarray: Weighted mean, nan for series without valid samples.
+    """
+
+    valid = ~np.isnan(samples)
+    values = np.where(valid, samples, 0)
+
+    # ==> einsum avoids a temporary of the size of the weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.einsum('...n,...n->...', weights, values) / \
+            np.einsum('...n,...n->...', weights, valid.astype(np.float64))
+
+    if not skipna:
+        drawn = np.einsum('...n,...n->...', weights,
+                          (~valid).astype(np.float64))
+        result = np.where(drawn > 0, np.nan, result)
+
+    return result
+
+
+def binder_cumulant(samples, weights):
+    """
+    Returns the Binder cumulant 1 - <x^4> / (3 <x^2>^2) of each series.
+
+    :param samples: Array with the samples along the last axis.
+    :param weights: Array with the weights of the samples (see mean).
+
+    :return ndarray: Weighted Binder cumulant.
+    """
+
+    return 1 - mean(samples**4, weights) / (3 * mean(samples**2, weights)**2)
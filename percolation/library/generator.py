@@ -0,0 +1,195 @@
+import os
+
+# Third Party Imports
+import numpy as np
+
+
+class ConfigGenerator:
+
+    def __init__(self, seed=None, dtype=np.float32):
+        """
+        This class encapsulates the generation of random site configurations
+        based on numpy.random.Generator. Sites are occupied by thresholding
+        uniform draws written into a reused buffer. Independent streams (e.g.
+        one per worker or task) are spawned via numpy.random.SeedSequence and
+        each generator knows its seed for an exact replay.
+
+        :param seed: Seed of the generator. Either None (fresh entropy), an
+                     int, a numpy.random.SeedSequence or a dict as returned by
+                     the seed property.
+        :param dtype: Floating point type of the uniform draws. float32 is
+                      about twice as fast as float64 and precise enough for
+                      the occupation probabilities.
+        """
+
+        if isinstance(seed, dict):
+            seed = np.random.SeedSequence(seed['entropy'],
+                                          spawn_key=tuple(seed['spawn_key']))
+        elif not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+
+        self.seed_sequence = seed
+        self.rng = np.random.Generator(np.random.PCG64(seed))
+        self.dtype = dtype
+        # Buffer for the uniform draws, grown when needed
+        self.buffer = np.empty(0, dtype=dtype)
+
+    @property
+    def seed(self):
+        """
+        Returns the seed of this generator. Passing it to the constructor
+        replays the exact same stream.
+
+        :return dict: Entropy and spawn key of the seed sequence.
+        """
+
+        return {'entropy': self.seed_sequence.entropy,
+                'spawn_key': list(self.seed_sequence.spawn_key)}
+
+    def spawn(self, num):
+        """
+        Creates independent child generators, e.g. one for each worker or
+        task.
+
+        :param num: Number of child generators.
+
+        :return list: List of ConfigGenerator.
+        """
+
+        return [ConfigGenerator(seed, self.dtype)
+                for seed in self.seed_sequence.spawn(num)]
+
+    def fill(self, out, p):
+        """
+        Randomizes a preallocated boolean array in place with a probability p
+        for each site to be occupied.
+
+        :param out: Contiguous boolean array of any shape (e.g. a stack of
+                    many samples).
+        :param p: Probability for each site to be occupied (0 <= p <= 1).
+
+        :return ndarray: The array out.
+        """
+
+        if self.buffer.size < out.size:
+            self.buffer = np.empty(out.size, dtype=self.dtype)
+
+        uniform = self.buffer[:out.size].reshape(out.shape)
+        self.rng.random(dtype=self.dtype, out=uniform)
+        np.less(uniform, p, out=out)
+
+        return out
+
+    def sample(self, p, shape, num=None):
+        """
+        Returns new random configurations with a probability p for each site
+        to be occupied.
+
+        :param p: Probability for each site to be occupied (0 <= p <= 1).
+        :param shape: Shape of a single configuration.
+        :param num: Number of configurations. If None a single configuration
+                    is returned, otherwise a stack with num along the first
+                    axis.
+
+        :return ndarray: Boolean array with the configuration(s).
+        """
+
+        shape = tuple(shape) if num is None else (num,) + tuple(shape)
+
+        return self.fill(np.empty(shape, dtype=np.bool_), p)
+
+
+class BlockGenerator:
+
+    def __init__(self, seed, start=0, dtype=np.float32):
+        """
+        This class encapsulates the samples of a task drawn in fixed blocks:
+        the samples k * block to (k + 1) * block - 1 are drawn from their
+        own stream with the spawn key of the task followed by k. Every
+        sample therefore only depends on the seed and its position, no
+        matter how the samples are grouped into units of work.
+
+        :param seed: Dict with the entropy and spawn key of the task (see
+                     ConfigGenerator.seed) and the number of samples per
+                     block as 'block'.
+        :param start: Index of the first sample to draw. Has to be the first
+                      sample of a block.
+        :param dtype: Floating point type of the uniform draws (see
+                      ConfigGenerator).
+        """
+
+        if start % seed['block']:
+            raise ValueError(f'Sample {start} does not start a block of '
+                             f'{seed["block"]} samples.')
+
+        self.entropy = seed['entropy']
+        self.spawn_key = list(seed['spawn_key'])
+        self.block = seed['block']
+        self.dtype = dtype
+        # Index of the next block and samples left in the current one
+        self.next = start // self.block
+        self.left = 0
+        self.generator = None
+
+    def advance(self, num):
+        """
+        Returns the generator of the current block for the next samples and
+        skips them. Starts the next block if the current one is used up.
+
+        :param num: Number of samples at most.
+
+        :return ConfigGenerator, int: The generator and the number of
+                                      samples (at most num) left to draw
+                                      from it.
+        """
+
+        if self.left == 0:
+            self.generator = ConfigGenerator(
+                {'entropy': self.entropy,
+                 'spawn_key': self.spawn_key + [self.next]}, self.dtype)
+            self.next += 1
+            self.left = self.block
+
+        num = min(num, self.left)
+        self.left -= num
+
+        return self.generator, num
+
+    def fill(self, out, p):
+        """
+        Randomizes a stack of samples in place (see ConfigGenerator.fill).
+
+        :param out: Contiguous boolean array with the samples along the first
+                    axis.
+        :param p: Probability for each site to be occupied (0 <= p <= 1).
+
+        :return ndarray: The array out.
+        """
+
+        k = 0
+        while k < len(out):
+            generator, num = self.advance(len(out) - k)
+            generator.fill(out[k:k + num], p)
+            k += num
+
+        return out
+
+
+# Generator of the current process, see default_generator
+_default = {'pid': None, 'generator': None}
+
+
+def default_generator():
+    """
+    Returns the default generator of the current process. A new one (with
+    fresh entropy) is created in each process, so forked workers never share
+    the state of their parent.
+
+    :return ConfigGenerator: The default generator.
+    """
+
+    if _default['pid'] != os.getpid():
+        _default['pid'] = os.getpid()
+        _default['generator'] = ConfigGenerator()
+
+    return _default['generator']
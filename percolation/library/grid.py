@@ -1,8 +1,10 @@
 # Third Party Imports
 import numpy as np
-from numpy.random import choice
 import matplotlib.pyplot as plt
 
+# Own Imports
+from .generator import default_generator
+
 
 class Grid:
 
@@ -69,6 +71,18 @@ class Grid:
 
         return self.config[coor]
 
+    def rows(self, start, stop):
+        """
+        Returns the state of all sites in a block of rows.
+
+        :param start: Index of the first row.
+        :param stop: Index after the last row.
+
+        :return ndarray: 2D boolean array with the state of the sites.
+        """
+
+        return self.config[start:stop]
+
     def is_top(self, x, y):
         """
         Returns  whether the site at (x,y) is in the top row.
@@ -173,20 +187,22 @@ class Grid:
 
         return x, y
 
-    def randomize(self, p=0.5):
+    def randomize(self, p=0.5, generator=None):
         """
-        Randomizes the configuration with a probability p for each site to be
-        occupied.
+        Randomizes the configuration (in place) with a probability p for each
+        site to be occupied.
 
         :param p: Probability for each site to be occupied (0 <= p <= 1).
+        :param generator: ..library.generator.ConfigGenerator to draw from. If
+                          None the default generator of the process is used.
 
         :return None:
         """
 
-        choices = (True, False)
-        prob = (p, 1 - p)
-        self.config = choice(choices, size=self.shape, replace=True,
-                             p=prob)
+        if generator is None:
+            generator = default_generator()
+
+        generator.fill(self.config, p)
 
     def plot(self, ax=None, labels=None):
         if ax is None:
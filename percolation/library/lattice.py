@@ -0,0 +1,152 @@
+from functools import lru_cache
+
+# Third Party Imports
+import numpy as np
+
+# Properties of each kind of lattice: dimension, site (pc) and bond
+# (pc_bond) percolation threshold and the offsets to the "forward" neighbours
+# (each bond once). An offset with a parity only applies to sites whose
+# coordinates sum up to a number of this parity, which turns the square
+# lattice into a brick wall (honeycomb)
+kinds = {
+    'square': {'dimension': 2, 'pc': 0.592746, 'pc_bond': 0.5,
+               'offsets': [((1, 0), None), ((0, 1), None)]},
+    'triangular': {'dimension': 2, 'pc': 0.5, 'pc_bond': 0.3472964,
+                   'offsets': [((1, 0), None), ((0, 1), None),
+                               ((1, -1), None)]},
+    'honeycomb': {'dimension': 2, 'pc': 0.697043, 'pc_bond': 0.6527036,
+                  'offsets': [((0, 1), None), ((1, 0), 0)]},
+    'cubic': {'dimension': 3, 'pc': 0.3116077, 'pc_bond': 0.2488126,
+              'offsets': [((1, 0, 0), None), ((0, 1, 0), None),
+                          ((0, 0, 1), None)]},
+}
+
+# Critical exponents of percolation for each dimension
+exponents = {2: {'nu': 4 / 3, 'gamma': 43 / 18},
+             3: {'nu': 0.8765, 'gamma': 1.7933}}
+
+
+class Lattice:
+
+    def __init__(self, kind, shape):
+        """
+        This class encapsulates the neighbour table of a periodic lattice.
+        Sites are numbered row major (as numpy.ravel_multi_index) and the
+        neighbours of every site are stored once in compressed sparse row
+        form: the neighbours of site i are indices[indptr[i]:indptr[i + 1]].
+        Each bond is also stored once in edges, together with its
+        displacement on the unwrapped lattice. Use get_lattice to share the
+        tables between all users of a shape.
+
+        :param kind: Kind of lattice ('square', 'triangular', 'honeycomb' or
+                     'cubic' (simple cubic)).
+        :param shape: Shape of the lattice as a tuple of ints (one per
+                      dimension). Periodic boundary conditions in each
+                      direction. The honeycomb lattice needs an even number
+                      of rows and columns (else the periodic wrap breaks the
+                      alternation of the bricks).
+        """
+
+        if kind not in kinds:
+            raise ValueError(f'Unknown lattice {kind}.')
+
+        self.kind = kind
+        self.shape = tuple(int(n) for n in shape)
+        self.dimension = kinds[kind]['dimension']
+        self.pc = kinds[kind]['pc']
+        self.pc_bond = kinds[kind]['pc_bond']
+        self.exponents = exponents[self.dimension]
+
+        if len(self.shape) != self.dimension:
+            raise ValueError(f'A {kind} lattice needs {self.dimension} '
+                             f'dimensions, not {self.shape}.')
+        if kind == 'honeycomb' and (self.shape[0] % 2 or self.shape[1] % 2):
+            raise ValueError('A honeycomb lattice needs an even number of '
+                             'rows and columns.')
+
+        self.size = int(np.prod(self.shape))
+        self.edges, self.shifts = self.get_edges()
+        self.indptr, self.indices = self.get_neighbours()
+
+    def get_edges(self):
+        """
+        Returns every bond of the lattice once.
+
+        :return ndarray, ndarray: The first array (bonds x 2) contains the two
+                                  sites of each bond, the second (bonds x
+                                  dimension) the displacement from the first
+                                  to the second site on the unwrapped
+                                  lattice.
+        """
+
+        shape = np.array(self.shape)[:, None]
+        coords = np.indices(self.shape).reshape(self.dimension, -1)
+        parity = coords.sum(axis=0) % 2
+
+        edges, shifts = [], []
+        for offset, only in kinds[self.kind]['offsets']:
+            mask = slice(None) if only is None else parity == only
+            source = coords[:, mask]
+            target = (source + np.array(offset)[:, None]) % shape
+            edges.append(np.stack((
+                np.ravel_multi_index(source, self.shape),
+                np.ravel_multi_index(target, self.shape)), axis=1))
+            shifts.append(np.tile(offset, (len(edges[-1]), 1)))
+
+        return np.concatenate(edges), np.concatenate(shifts)
+
+    def get_neighbours(self):
+        """
+        Returns the neighbour table in compressed sparse row form.
+
+        :return ndarray, ndarray: Index pointer (one entry per site plus one)
+                                  and the neighbours of all sites.
+        """
+
+        # ==> Every bond is a neighbour in both directions
+        source = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+        target = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+        order = np.argsort(source, kind='stable')
+
+        indptr = np.zeros(self.size + 1, dtype=np.int_)
+        np.cumsum(np.bincount(source, minlength=self.size), out=indptr[1:])
+
+        return indptr, target[order]
+
+    def neighbours(self, i):
+        """
+        Returns the neighbours of a site.
+
+        :param i: Flat index of the site.
+
+        :return ndarray: Flat indices of the neighbours.
+        """
+
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+
+@lru_cache(maxsize=16)
+def get_lattice(kind, shape):
+    """
+    Returns the (cached) lattice of a kind and shape.
+
+    :param kind: Kind of lattice (see Lattice).
+    :param shape: Shape of the lattice as a tuple of ints.
+
+    :return Lattice: The lattice.
+    """
+
+    return Lattice(kind, tuple(shape))
+
+
+def get_shape(kind, L):
+    """
+    Returns the shape of the lattice of a kind with linear size L.
+
+    :param kind: Kind of lattice (see Lattice).
+    :param L: Number of sites in each direction.
+
+    :return tuple: Shape of the lattice.
+    """
+
+    return (L,) * kinds[kind]['dimension']
@@ -1,27 +1,6 @@
-import time
-
 import numpy as np
 
 
-def timeit(func):
-    """
-    Simple wrapper to time a function. Prints the execution time after the
-    method finishes.
-    """
-
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-
-        print('Execution Time ({0}): {1:.5f} seconds'.format(
-            func.__name__, end_time - start_time))
-
-        return result
-
-    return wrapper
-
-
 def manhattan_distance(shape, center):
     """
     Returns the distance for each entry in a matrix from the center according
@@ -0,0 +1,138 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from .grid import Grid
+from .generator import default_generator
+
+
+class PackedGrid(Grid):
+
+    def __init__(self, shape, filename=None, mode='w+'):
+        """
+        This class encapsulates the same regular 2D-square grid (lattice) with
+        periodic boundary conditions as ..library.grid.Grid, but stores the
+        percolation state bit packed (8 sites per byte). Optionally the
+        packed state lives in a memory mapped file, which allows to save and
+        reload huge lattices without copying them into memory.
+
+        :param shape: Shape of the grid as a list of two ints. First int is the
+                      number of rows, second number of columns.
+        :param filename: Path of the file backing the grid. If None the grid
+                         is held in memory.
+        :param mode: Mode the file is opened in (see numpy.memmap). Use 'w+'
+                     to create a new file, 'r+' or 'r' to reload one.
+        """
+
+        self._shape = tuple(shape)
+        packed_shape = (self._shape[0], (self._shape[1] + 7) // 8)
+
+        # The percolation state of each site in the grid (bit packed, row
+        # major, most significant bit first)
+        if filename is None:
+            self.packed = np.zeros(packed_shape, dtype=np.uint8)
+        else:
+            self.packed = np.memmap(filename, dtype=np.uint8, mode=mode,
+                                    shape=packed_shape)
+
+    @property
+    def config(self):
+        """
+        Returns the (unpacked) percolation state of each site. Note: this
+        allocates one byte per site, use rows for large grids.
+
+        :return ndarray: 2D boolean array with the state of each site.
+        """
+
+        return self.rows(0, self.N)
+
+    @config.setter
+    def config(self, config):
+        """
+        Sets the percolation state of each site.
+
+        :param config: 2D boolean array with the state of each site.
+
+        :return None:
+        """
+
+        self.packed[:] = np.packbits(config, axis=1)
+
+    @property
+    def size(self):
+        """
+        Returns the number of points on the lattice.
+
+        :return int: Size of the lattice.
+        """
+
+        return self._shape[0] * self._shape[1]
+
+    @property
+    def shape(self):
+        """
+        Returns the shape of the lattice.
+
+        :return int, int: Shape of the square lattice (row, column).
+        """
+
+        return self._shape
+
+    def __getitem__(self, coor):
+        """
+        Returns the state of the lattice point at corr coordinate.
+
+        :param coor: Tuple of two int coordinates x and y.
+
+        :return bool: State of the site.
+        """
+
+        x, y = coor
+        return bool((self.packed[x, y >> 3] >> (7 - (y & 7))) & 1)
+
+    def rows(self, start, stop):
+        """
+        Returns the state of all sites in a block of rows (unpacked).
+
+        :param start: Index of the first row.
+        :param stop: Index after the last row.
+
+        :return ndarray: 2D boolean array with the state of the sites.
+        """
+
+        rows = np.unpackbits(self.packed[start:stop], axis=1, count=self.M)
+
+        return rows.view(np.bool_)
+
+    def randomize(self, p=0.5, generator=None, block=1024):
+        """
+        Randomizes the configuration with a probability p for each site to be
+        occupied. Works through the grid block by block of rows to never hold
+        more than one unpacked block in memory.
+
+        :param p: Probability for each site to be occupied (0 <= p <= 1).
+        :param generator: ..library.generator.ConfigGenerator to draw from. If
+                          None the default generator of the process is used.
+        :param block: Number of rows randomized at once.
+
+        :return None:
+        """
+
+        if generator is None:
+            generator = default_generator()
+
+        rows = np.empty((min(block, self.N), self.M), dtype=np.bool_)
+        for start in range(0, self.N, block):
+            stop = min(start + block, self.N)
+            generator.fill(rows[:stop - start], p)
+            self.packed[start:stop] = np.packbits(rows[:stop - start], axis=1)
+
+    def flush(self):
+        """
+        Writes any changes to the backing file (if there is one).
+
+        :return None:
+        """
+
+        if isinstance(self.packed, np.memmap):
+            self.packed.flush()
@@ -0,0 +1,111 @@
+import json
+import struct
+
+# Third Party Imports
+import numpy as np
+
+
+class ResultStore:
+
+    # Identifies the file format, followed by the length of the header
+    magic = b'PERCSTORE1'
+    # The data starts at a multiple of this (in bytes)
+    alignment = 64
+
+    def __init__(self, filename, params=None, mode='r'):
+        """
+        This class encapsulates a binary result store of a data collection
+        run: a single file with a JSON header (the parameters of the run)
+        followed by one float64 value per lattice size, probability and
+        sample in this (C) order. The values are accessed via numpy.memmap,
+        i.e. only the slices actually used are read from disk.
+
+        :param filename: Path of the file.
+        :param params: Dictionary with the parameters of the run. Has to
+                       contain the lattice sizes ('Ls'), the probabilities
+                       ('ps') and the number of samples ('num'). If given a
+                       new store filled with nan is created (overwriting an
+                       existing file), otherwise an existing one is opened.
+        :param mode: Mode an existing store is opened in ('r' or 'r+').
+        """
+
+        self.filename = filename
+        new = params is not None
+
+        if not new:
+            with open(filename, 'rb') as file:
+                if file.read(len(self.magic)) != self.magic:
+                    raise ValueError(f'{filename} is not a result store.')
+                length, = struct.unpack('<Q', file.read(8))
+                params = json.loads(file.read(length).decode())
+        else:
+            params = dict(params, Ls=[int(L) for L in params['Ls']],
+                          ps=[float(p) for p in params['ps']],
+                          num=int(params['num']))
+            header = json.dumps(params).encode()
+            length = len(header)
+            with open(filename, 'wb') as file:
+                file.write(self.magic + struct.pack('<Q', length))
+                file.write(header)
+            mode = 'r+'
+
+        self.params = params
+        self.Ls = params['Ls']
+        self.ps = np.array(params['ps'])
+        self.num = params['num']
+
+        offset = len(self.magic) + 8 + length
+        offset = -(-offset // self.alignment) * self.alignment
+        shape = (len(self.Ls), len(self.ps), self.num)
+        # np.memmap extends a new file to the required size
+        self.data = np.memmap(filename, dtype='<f8', mode=mode,
+                              offset=offset, shape=shape)
+
+        if new:
+            self.data[:] = np.nan
+
+    def flush(self):
+        """
+        Writes any changes to disk.
+
+        :return None:
+        """
+
+        self.data.flush()
+
+    def to_csv(self, path):
+        """
+        Writes the values into one CSV file per probability (p_{p:.3f}.csv)
+        with one row per sample and one column per lattice size.
+
+        :param path: Path to the directory the files are written to.
+
+        :return None:
+        """
+
+        for j, p in enumerate(self.ps):
+            np.savetxt(path / f'p_{p:.3f}.csv', self.data[:, j].T,
+                       delimiter=',')
+
+    @classmethod
+    def from_csv(cls, path, filename, params):
+        """
+        Converts the CSV files of a run (one per probability, see to_csv)
+        into a new store.
+
+        :param path: Path to the directory with the files.
+        :param filename: Path of the new store.
+        :param params: Dictionary with the parameters of the run (see
+                       __init__).
+
+        :return ResultStore: The new store.
+        """
+
+        store = cls(filename, params)
+        for j, p in enumerate(store.ps):
+            values = np.loadtxt(path / f'p_{p:.3f}.csv', delimiter=',',
+                                ndmin=2)
+            store.data[:, j] = values.T
+        store.flush()
+
+        return store
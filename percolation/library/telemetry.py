@@ -0,0 +1,252 @@
+import sys
+import json
+import time
+
+
+class Telemetry:
+
+    def __init__(self, enabled=False, stream=sys.stderr, interval=1.0):
+        """
+        This class encapsulates the instrumentation of a run: named timers
+        (total seconds and number of calls of each phase, e.g. randomize,
+        label, compact, measure and write), named counters (e.g. sites,
+        samples, labels and unions) and a progress line with the estimated
+        time left. Pool workers record into the recorder of their process
+        (see instrument) and send a snapshot back with every result, which is
+        merged here (see receive).
+
+        When disabled every method returns immediately and timer returns a
+        shared no-op context manager, so instrumented code costs next to
+        nothing.
+
+        :param enabled: Whether to record anything.
+        :param stream: File object the progress is written to.
+        :param interval: Minimum number of seconds between progress updates.
+        """
+
+        self.enabled = enabled
+        self.stream = stream
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all timers and counters and restarts the clock.
+
+        :return None:
+        """
+
+        # Name -> [seconds, calls]
+        self.timers = {}
+        # Name -> value
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.last = self.start
+        # Total number of sites of the run, for the progress (see progress)
+        self.total = 0
+
+    def timer(self, name):
+        """
+        Returns a context manager adding the time spent inside it to the
+        timer name.
+
+        :param name: Name of the timer.
+
+        :return context manager: Timer or a no-op if disabled.
+        """
+
+        if not self.enabled:
+            return _null_timer
+        return _Timer(self, name)
+
+    def count(self, name, value=1):
+        """
+        Adds value to the counter name.
+
+        :param name: Name of the counter.
+        :param value: Increment.
+
+        :return None:
+        """
+
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def snapshot(self):
+        """
+        Returns all timers and counters (e.g. to be sent to another process).
+
+        :return dict: Timers and counters.
+        """
+
+        return {'timers': {name: list(timer)
+                           for name, timer in self.timers.items()},
+                'counters': dict(self.counters)}
+
+    def merge(self, snapshot):
+        """
+        Adds the timers and counters of a snapshot (see snapshot).
+
+        :param snapshot: Dictionary with timers and counters.
+
+        :return None:
+        """
+
+        for name, (seconds, calls) in snapshot['timers'].items():
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += calls
+        for name, value in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def instrument(self, func):
+        """
+        Wraps a function processing units of work in the pool such that the
+        worker records its telemetry and returns it together with the result
+        (see receive).
+
+        :param func: Picklable function.
+
+        :return function: The wrapped (picklable) function, or func itself if
+                          disabled.
+        """
+
+        if not self.enabled:
+            return func
+        return _Instrumented(func)
+
+    def receive(self, result):
+        """
+        Merges the telemetry sent with the result of an instrumented function
+        (see instrument).
+
+        :param result: Result of the (possibly) instrumented function.
+
+        :return object: The result of the original function.
+        """
+
+        if not self.enabled:
+            return result
+
+        result, snapshot = result
+        self.merge(snapshot)
+
+        return result
+
+    def progress(self, force=False):
+        """
+        Writes the progress (sites done of total, throughput and estimated
+        time left) at most every interval seconds.
+
+        :param force: Whether to ignore the interval. Also ends the line.
+
+        :return None:
+        """
+
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+
+        done, elapsed = self.counters.get('sites', 0), now - self.start
+        rate = done / elapsed if elapsed > 0 else 0
+        fraction = done / self.total if self.total else 1
+        eta = (self.total - done) / rate if rate > 0 else float('inf')
+        eta = '--:--:--' if eta == float('inf') else time.strftime(
+            '%H:%M:%S', time.gmtime(eta))
+
+        self.stream.write(f'\r{self.counters.get("samples", 0)} samples '
+                          f'({100 * fraction:5.1f} %), {rate:.3e} sites/s, '
+                          f'ETA {eta}' + ('\n' if force else ''))
+        self.stream.flush()
+
+    def summary(self):
+        """
+        Returns the summary of the run: wall time, timers (with their share of
+        the total time spent in all timers), counters and derived rates.
+
+        :return dict: The summary.
+        """
+
+        elapsed = time.perf_counter() - self.start
+        total = sum(seconds for seconds, _ in self.timers.values())
+        counters = self.counters
+        samples = counters.get('samples', 0)
+
+        rates = {'sites_per_second': counters.get('sites', 0) / elapsed
+                 if elapsed > 0 else None}
+        for name in ('labels', 'unions'):
+            if name in counters:
+                rates[f'{name}_per_sample'] = counters[name] / samples \
+                    if samples else None
+
+        return {'elapsed': elapsed,
+                'timers': {name: {'seconds': seconds, 'calls': calls,
+                                  'fraction': seconds / total if total else 0}
+                           for name, (seconds, calls) in self.timers.items()},
+                'counters': dict(counters), 'rates': rates}
+
+    def write_summary(self, filename):
+        """
+        Writes the summary (see summary) as JSON.
+
+        :param filename: Path of the file.
+
+        :return None:
+        """
+
+        if self.enabled:
+            with open(filename, 'w') as file:
+                json.dump(self.summary(), file, indent=4)
+
+
+class _Timer:
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        timer = self.telemetry.timers.setdefault(self.name, [0.0, 0])
+        timer[0] += time.perf_counter() - self.start
+        timer[1] += 1
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class _Instrumented:
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        # ==> Runs in the worker: record only this call
+        recorder.enabled = True
+        recorder.reset()
+        try:
+            result = self.func(*args, **kwargs)
+        finally:
+            recorder.enabled = False
+
+        return result, recorder.snapshot()
+
+
+_null_timer = _NullTimer()
+
+# Recorder of this process. Disabled unless a function runs instrumented
+# (see Telemetry.instrument), the model code records into it
+recorder = Telemetry()
@@ -0,0 +1,271 @@
+# Third Party Imports
+import numpy as np
+
+
+class UnionFind:
+
+    def __init__(self, capacity=1024, offsets=False):
+        """
+        This class encapsulates an array based union-find (disjoint set)
+        structure. Parents and sizes are stored in growable numpy int arrays
+        and all operations work on whole arrays of labels at once.
+
+        :param capacity: Initial number of labels the arrays can hold before
+                         they have to grow.
+        :param offsets: Whether to keep track of the displacement (row,
+                        column) of each label to its parent on the unwrapped
+                        lattice. Needed to detect clusters wrapping around the
+                        periodic boundaries.
+        """
+
+        # Label 0 is reserved for unoccupied sites and always its own root
+        self.parent = np.zeros(max(capacity, 1), dtype=np.int_)
+        self.size = np.zeros(max(capacity, 1), dtype=np.int_)
+        # Displacement to the parent and wrapping flags (bit 1: wraps in row
+        # direction, bit 2: wraps in column direction) of each label
+        self.offset = None
+        self.wrapping = None
+        if offsets:
+            self.offset = np.zeros((len(self.parent), 2), dtype=np.int_)
+            self.wrapping = np.zeros(len(self.parent), dtype=np.uint8)
+        # Number of labels handed out so far (including the reserved 0)
+        self.num = 1
+
+    def __len__(self):
+        """
+        Returns the number of labels handed out so far (excluding the reserved
+        label 0).
+
+        :return int: Number of labels.
+        """
+
+        return self.num - 1
+
+    def grow(self, capacity):
+        """
+        Makes sure the arrays can hold at least capacity labels. Grows them
+        geometrically to keep the amortized cost of adding labels constant.
+
+        :param capacity: Number of labels the arrays need to be able to hold.
+
+        :return None:
+        """
+
+        if capacity <= len(self.parent):
+            return
+
+        capacity = max(capacity, 2 * len(self.parent))
+        for name in ('parent', 'size', 'offset', 'wrapping'):
+            old = getattr(self, name)
+            if old is None:
+                continue
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.num] = old[:self.num]
+            setattr(self, name, new)
+
+    def add(self, sizes):
+        """
+        Adds new labels, each one its own root.
+
+        :param sizes: Array with the initial size of each new label.
+
+        :return int: The first new label. The new labels are consecutive.
+        """
+
+        sizes = np.asarray(sizes)
+        first = self.num
+        self.grow(first + len(sizes))
+        self.num += len(sizes)
+
+        new = slice(first, self.num)
+        self.parent[new] = np.arange(first, self.num)
+        self.size[new] = sizes
+        if self.offset is not None:
+            self.offset[new] = 0
+            self.wrapping[new] = 0
+
+        return first
+
+    def find(self, labels):
+        """
+        Finds the root label for each label in labels. Compresses the paths of
+        all labels passed in.
+
+        :param labels: Array of labels.
+
+        :return ndarray: Array with the root label for each label.
+        """
+
+        if self.offset is not None:
+            return self.locate(labels)[0]
+
+        roots = self.parent[labels]
+        while True:
+            # Pointer jumping: go up one level for all labels at once until
+            # every label arrived at its root
+            up = self.parent[roots]
+            if np.array_equal(up, roots):
+                break
+            roots = up
+
+        self.parent[labels] = roots
+
+        return roots
+
+    def locate(self, labels):
+        """
+        Finds the root label for each label in labels together with the
+        displacement from the root to the label. Compresses the paths of all
+        labels passed in. Only available if offsets are tracked.
+
+        :param labels: Array of labels.
+
+        :return ndarray, ndarray: Array with the root label for each label and
+                                  array with the displacement (row, column)
+                                  from the root to each label.
+        """
+
+        roots = self.parent[labels]
+        offsets = self.offset[labels]
+        while True:
+            up = self.parent[roots]
+            if np.array_equal(up, roots):
+                break
+            # Roots have no displacement so labels already arrived at their
+            # root are not changed by this
+            offsets += self.offset[roots]
+            roots = up
+
+        self.parent[labels] = roots
+        self.offset[labels] = offsets
+
+        return roots, offsets
+
+    def union(self, l_i, l_j, delta=None):
+        """
+        Unifies the clusters of the labels l_i and l_j pair wise. The smaller
+        root label always becomes the root of the combined cluster.
+
+        :param l_i: Array of labels.
+        :param l_j: Array of labels (same length as l_i).
+        :param delta: Only if offsets are tracked. Array with the displacement
+                      (row, column) from each label in l_i to the label in
+                      l_j on the unwrapped lattice. If the two labels are
+                      already part of the same cluster but the displacement
+                      disagrees the cluster wraps around the lattice.
+
+        :return None:
+        """
+
+        if self.offset is not None:
+            self.union_offsets(l_i, l_j, delta)
+            return
+
+        r_i = self.find(l_i)
+        r_j = self.find(l_j)
+
+        while True:
+            # Only pairs not yet in the same cluster need any work
+            mask = r_i != r_j
+            if not mask.any():
+                break
+
+            low = np.minimum(r_i[mask], r_j[mask])
+            high = np.maximum(r_i[mask], r_j[mask])
+            # Hook every root onto the smallest root it is connected to. All
+            # pointers point to smaller labels so no cycles can arise
+            np.minimum.at(self.parent, high, low)
+
+            r_i = self.find(low)
+            r_j = self.find(high)
+
+    def union_offsets(self, l_i, l_j, delta):
+        """
+        Same as union but keeps track of the displacements and wrapping flags.
+
+        :param l_i: Array of labels.
+        :param l_j: Array of labels (same length as l_i).
+        :param delta: Array with the displacement (row, column) from each label
+                      in l_i to the label in l_j on the unwrapped lattice.
+
+        :return None:
+        """
+
+        r_i, o_i = self.locate(l_i)
+        r_j, o_j = self.locate(l_j)
+        # Displacement from root r_i to root r_j implied by each pair
+        delta = np.asarray(delta) + o_i - o_j
+
+        while len(r_i):
+            same = r_i == r_j
+            # Pairs already in the same cluster but with non zero displacement
+            # close a loop around the torus
+            flags = ((delta[same, 0] != 0) * 1 +
+                     (delta[same, 1] != 0) * 2).astype(np.uint8)
+            np.bitwise_or.at(self.wrapping, r_i[same], flags)
+
+            r_i, r_j, delta = r_i[~same], r_j[~same], delta[~same]
+            # Order each pair such that r_i is the smaller root
+            swap = r_j < r_i
+            r_i, r_j = np.where(swap, r_j, r_i), np.where(swap, r_i, r_j)
+            delta[swap] = -delta[swap]
+
+            # Hook each root onto a smaller root. Only one pair per root may
+            # be used because each root can only store one displacement, the
+            # other pairs are taken care of in the next iteration
+            high, first = np.unique(r_j, return_index=True)
+            self.parent[high] = r_i[first]
+            self.offset[high] = delta[first]
+
+            r_i, o_i = self.locate(r_i)
+            r_j, o_j = self.locate(r_j)
+            delta = delta + o_i - o_j
+
+    def flatten(self):
+        """
+        Points every label directly to its root.
+
+        :return ndarray: Array with the root for every label (index is label).
+        """
+
+        return self.find(np.arange(self.num))
+
+    def compactify(self):
+        """
+        Maps the root labels to consecutive labels starting from 1 (in order of
+        the root labels) and sums up the sizes for each root.
+
+        :return ndarray, ndarray: The first array maps every (provisional)
+                                  label to its final label (0 stays 0). The
+                                  second array contains the size of each final
+                                  cluster (index 0 is final label 1).
+        """
+
+        roots = self.flatten()
+        is_root = roots == np.arange(self.num)
+        is_root[0] = False
+        # Final label for each root label, 0 for the reserved label
+        final = np.cumsum(is_root)
+        lookup = final[roots]
+        sizes = np.bincount(lookup, weights=self.size[:self.num],
+                            minlength=final[-1] + 1)[1:].astype(np.int_)
+
+        return lookup, sizes
+
+    def get_wrapping(self, lookup):
+        """
+        Combines the wrapping flags of all labels for each final cluster. Only
+        available if offsets are tracked.
+
+        :param lookup: Array mapping every label to its final label (see
+                       compactify).
+
+        :return ndarray: Wrapping flags of each final cluster (index 0 is
+                         final label 1). Bit 1 is set if the cluster wraps in
+                         row direction, bit 2 if it wraps in column direction.
+        """
+
+        flags = np.zeros(lookup.max() + 1, dtype=np.uint8)
+        np.bitwise_or.at(flags, lookup, self.wrapping[:self.num])
+
+        return flags[1:]
@@ -0,0 +1,298 @@
+import time
+from functools import lru_cache
+from collections import namedtuple
+
+# Third Party Imports
+import numpy as np
+from scipy import ndimage
+
+# Own Imports
+from .hk import HoshenKopelman
+from .fasthk import FastHoshenKopelman, label_batch as fast_label_batch
+from .latticelabel import label_lattice, label_lattice_batch
+from ..library.grid import Grid
+from ..library.unionfind import UnionFind
+from ..library.lattice import get_lattice
+from ..library.generator import ConfigGenerator
+from ..library.telemetry import recorder
+
+# A labelling backend: label(grid) returns the labels (2D array, 0 for
+# unoccupied sites) and the size of each cluster, label_batch(configs) the
+# sizes of each sample of a 3D stack. Labels are consecutive and ordered by
+# the first site of each cluster (row major) as in
+# ..model.hk.HoshenKopelman. Only backends with auto set take part in the
+# automatic choice (see fastest)
+Backend = namedtuple('Backend', ['label', 'label_batch', 'auto'])
+
+backends = {}
+
+# Backend all others have to agree with (see check_conformance)
+reference = 'hk'
+
+
+def register(name, label, label_batch, auto=True):
+    """
+    Registers a labelling backend.
+
+    :param name: Name of the backend.
+    :param label: Function label(grid) (see Backend).
+    :param label_batch: Function label_batch(configs) (see Backend).
+    :param auto: Whether the backend may be chosen automatically.
+
+    :return None:
+    """
+
+    backends[name] = Backend(label, label_batch, auto)
+    fastest.cache_clear()
+
+
+def label(grid, backend='auto'):
+    """
+    Labels all clusters of a grid.
+
+    :param grid: Grid to be classified. Has to be a subclass of
+                 ..library.grid.
+    :param backend: Name of the backend or 'auto' for the fastest one (for
+                    this shape of grid).
+
+    :return ndarray, list: Label of each site (0 for unoccupied ones) and
+                           size of each cluster (index 0 is label 1).
+    """
+
+    if backend == 'auto':
+        backend = fastest(grid.shape)
+
+    return backends[backend].label(grid)
+
+
+def label_batch(configs, backend='auto'):
+    """
+    Labels a stack of independent configurations.
+
+    :param configs: 3D boolean array (samples x rows x columns), each sample
+                    with periodic boundary conditions.
+    :param backend: Name of the backend or 'auto' for the fastest one (for
+                    this shape of stack).
+
+    :return list: Array with the size of each cluster for each sample.
+    """
+
+    if backend == 'auto':
+        backend = fastest(configs.shape[1:], len(configs))
+
+    return backends[backend].label_batch(configs)
+
+
+@lru_cache(maxsize=None)
+def fastest(shape, num=None, p=0.592746, repeat=3):
+    """
+    Times all automatic backends on random configurations and returns the
+    fastest one. The result is cached for each set of arguments.
+
+    :param shape: Shape of the lattice (row, column).
+    :param num: Number of samples for label_batch. If None label is timed.
+    :param p: Occupation probability of the probes (by default the critical
+              one, where labelling is the most expensive).
+    :param repeat: Number of timings per backend, the best one counts.
+
+    :return str: Name of the fastest backend.
+    """
+
+    generator = ConfigGenerator(0)
+    if num is None:
+        probe = Grid(tuple(shape))
+        probe.randomize(p, generator)
+    else:
+        probe = generator.sample(p, tuple(shape), num)
+
+    times = {}
+    for name, backend in backends.items():
+        if not backend.auto:
+            continue
+        func = backend.label if num is None else backend.label_batch
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(probe)
+            best = min(best, time.perf_counter() - start)
+        times[name] = best
+
+    return min(times, key=times.get)
+
+
+def check_conformance(names=None, Ls=(1, 2, 7, 32), ps=(0, 0.3, 0.592746,
+                                                        0.8, 1), seed=0):
+    """
+    Checks backends against the reference backend on random grids (including
+    empty, full and tiny ones): labels and sizes have to be identical, for
+    single grids as well as for batches.
+
+    :param names: Names of the backends to check. If None all of them.
+    :param Ls: Lattice sizes to check (square lattices, plus an L x 2L one
+               each).
+    :param ps: Occupation probabilities to check.
+    :param seed: Seed of the random configurations.
+
+    :return list: Descriptions of all failed checks.
+    """
+
+    if names is None:
+        names = [name for name in backends if name != reference]
+
+    generator = ConfigGenerator(seed)
+    failed = []
+    for shape in [(L, L) for L in Ls] + [(L, 2 * L) for L in Ls]:
+        for p in ps:
+            configs = generator.sample(p, shape, 3)
+            expected = [backends[reference].label(to_grid(config))
+                        for config in configs]
+
+            for name in names:
+                for (labels, sizes), config in zip(expected, configs):
+                    result = backends[name].label(to_grid(config))
+                    if not (np.array_equal(result[0], labels) and
+                            list(result[1]) == list(sizes)):
+                        failed.append(f'{name} label {shape} p={p}')
+                        break
+
+                batch = backends[name].label_batch(configs)
+                if [list(sizes) for sizes in batch] != \
+                        [list(sizes) for _, sizes in expected]:
+                    failed.append(f'{name} label_batch {shape} p={p}')
+
+    return failed
+
+
+def to_grid(config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+
+    return grid
+
+
+def label_hk(grid):
+    hk = HoshenKopelman(grid)
+    hk.setup()
+    labels, sizes = hk.run()
+
+    return labels, sizes
+
+
+def label_batch_hk(configs):
+    return [np.array(label_hk(to_grid(config))[1], dtype=np.int_)
+            for config in configs]
+
+
+def label_fast(grid):
+    hk = FastHoshenKopelman(grid)
+    hk.setup()
+
+    return hk.run()
+
+
+def label_generic(grid):
+    return label_lattice(grid.rows(0, grid.N),
+                         get_lattice('square', grid.shape))
+
+
+def label_batch_generic(configs):
+    configs = np.asarray(configs, dtype=np.bool_)
+
+    return label_lattice_batch(configs,
+                               get_lattice('square', configs.shape[1:]))
+
+
+def label_ndimage(grid):
+    """
+    Labels a grid via scipy.ndimage.label (open boundaries, in C) followed by
+    the periodic stitch of the boundary labels (see stitch).
+
+    :param grid: Grid to be classified. Has to be a subclass of
+                 ..library.grid.
+
+    :return ndarray, list: Labels and sizes (see label).
+    """
+
+    with recorder.timer('label'):
+        labels, num = ndimage.label(grid.rows(0, grid.N))
+
+    with recorder.timer('compact'):
+        clusters = stitch(labels, num)
+        lookup, sizes = clusters.compactify()
+        labels = lookup[labels]
+
+    recorder.count('labels', num)
+    recorder.count('unions', num - len(sizes))
+
+    return labels, sizes.tolist()
+
+
+def label_batch_ndimage(configs):
+    """
+    Labels a stack of configurations via one scipy.ndimage.label call, with a
+    structuring element connecting sites within each sample only, followed
+    by the periodic stitch of each sample (see stitch).
+
+    :param configs: 3D boolean array (samples x rows x columns).
+
+    :return list: Sizes of each sample (see label_batch).
+    """
+
+    configs = np.asarray(configs, dtype=np.bool_)
+    if len(configs) == 0:
+        return []
+
+    with recorder.timer('label'):
+        structure = np.zeros((3, 3, 3), dtype=np.bool_)
+        structure[1] = ndimage.generate_binary_structure(2, 1)
+        labels, num = ndimage.label(configs, structure)
+
+    with recorder.timer('compact'):
+        clusters = stitch(labels, num)
+        # Labels are in raster order, i.e. grouped by sample. The sample of
+        # each root is the first one whose largest label is not below it
+        roots = clusters.flatten()
+        is_root = roots == np.arange(len(roots))
+        is_root[0] = False
+        last = np.maximum.accumulate(
+            labels.reshape(len(labels), -1).max(axis=1))
+        sample = np.searchsorted(last, np.flatnonzero(is_root))
+        counts = np.bincount(sample, minlength=len(labels))
+
+        _, sizes = clusters.compactify()
+
+    recorder.count('labels', num)
+    recorder.count('unions', num - len(sizes))
+
+    return np.split(sizes, np.cumsum(counts)[:-1])
+
+
+def stitch(labels, num):
+    """
+    Unifies the clusters of open boundary labels across the periodic
+    boundaries (last with first row and last with first column of each
+    sample). Only labels touching a boundary take part in any union.
+
+    :param labels: Array with the labels of one (2D) or many (3D, samples
+                   first) lattices, 1 to num for occupied sites.
+    :param num: Number of labels.
+
+    :return ..library.unionfind.UnionFind: Union-find table of the labels.
+    """
+
+    clusters = UnionFind(capacity=num + 1)
+    clusters.add(np.bincount(labels.ravel(), minlength=num + 1)[1:])
+
+    for a, b in ((labels[..., -1, :], labels[..., 0, :]),
+                 (labels[..., :, -1], labels[..., :, 0])):
+        both = (a != 0) & (b != 0)
+        clusters.union(a[both], b[both])
+
+    return clusters
+
+
+register('hk', label_hk, label_batch_hk, auto=False)
+register('fast', label_fast, fast_label_batch)
+register('ndimage', label_ndimage, label_batch_ndimage)
+# ==> The generic lattice labeller, slower than the specialised ones
+register('lattice', label_generic, label_batch_generic, auto=False)
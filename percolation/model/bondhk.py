@@ -0,0 +1,110 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from ..library.unionfind import UnionFind
+from ..library.telemetry import recorder
+
+
+def label_bonds(grid):
+    """
+    Labels the clusters of bond percolation on a grid. Sites joined by
+    horizontal bonds within a row form runs, which get provisional labels
+    and are merged in bulk along the open vertical bonds (as
+    ..model.fasthk.FastHoshenKopelman does for sites). Labels are
+    consecutive and ordered by the first site of each cluster (row major).
+
+    :param grid: ..library.bondgrid.BondGrid
+
+    :return ndarray, list: The first array contains the label of each site.
+                           The second list contains the size of each cluster
+                           (index 0 is label 1). Every site belongs to a
+                           cluster, isolated sites have size 1.
+    """
+
+    with recorder.timer('label'):
+        clusters, runs, _ = merge_bonds(grid.bonds[None])
+
+    with recorder.timer('compact'):
+        lookup, sizes = clusters.compactify()
+        labels = lookup[runs[0]]
+
+    recorder.count('labels', len(clusters))
+    recorder.count('unions', len(clusters) - len(sizes))
+
+    return labels, sizes.tolist()
+
+
+def label_bonds_batch(bonds):
+    """
+    Labels a whole stack of independent bond configurations in one go (one
+    union-find table for all samples, as ..model.fasthk.label_batch).
+
+    :param bonds: 4D boolean array (samples x 2 x rows x columns) with the
+                  horizontal ([:, 0]) and vertical ([:, 1]) bonds of each
+                  sample (see ..library.bondgrid.BondGrid).
+
+    :return list: List with one array per sample containing the size of each
+                  cluster (ordered as in label_bonds).
+    """
+
+    bonds = np.asarray(bonds, dtype=np.bool_)
+    num = len(bonds)
+    if num == 0:
+        return []
+
+    with recorder.timer('label'):
+        clusters, _, runs_per_sample = merge_bonds(bonds)
+
+    with recorder.timer('compact'):
+        # Final labels are ordered by their root, i.e. grouped by sample.
+        # Count the clusters of each sample via the sample of each root run
+        roots = clusters.flatten()
+        is_root = roots == np.arange(len(roots))
+        is_root[0] = False
+        last = np.cumsum(runs_per_sample)
+        sample = np.searchsorted(last, np.flatnonzero(is_root))
+        counts = np.bincount(sample, minlength=num)
+
+        _, sizes = clusters.compactify()
+
+    recorder.count('labels', len(clusters))
+    recorder.count('unions', len(clusters) - len(sizes))
+
+    return np.split(sizes, np.cumsum(counts)[:-1])
+
+
+def merge_bonds(bonds):
+    """
+    Gives every run of sites joined by horizontal bonds (no periodic wrap)
+    a provisional label and unifies the runs along all open vertical bonds
+    and the open horizontal bonds across the periodic right/left columns.
+
+    :param bonds: 4D boolean array (samples x 2 x rows x columns).
+
+    :return ..library.unionfind.UnionFind, ndarray, ndarray: The union-find
+            table, the provisional label of each site (samples x rows x
+            columns) and the number of runs of each sample.
+    """
+
+    horizontal, vertical = bonds[:, 0], bonds[:, 1]
+    num = len(bonds)
+
+    # A run starts in the first column and after every closed bond
+    starts = np.ones(horizontal.shape, dtype=np.bool_)
+    starts[..., 1:] = ~horizontal[..., :-1]
+    runs = np.cumsum(starts, dtype=np.int_).reshape(starts.shape)
+    runs_per_sample = starts.reshape(num, -1).sum(axis=1)
+
+    num_runs = int(runs_per_sample.sum())
+    clusters = UnionFind(capacity=num_runs + 1)
+    clusters.add(np.bincount(runs.ravel(), minlength=num_runs + 1)[1:])
+
+    # np.roll only acts within each sample (periodic bottom/top rows)
+    below = np.roll(runs, -1, axis=1)
+    clusters.union(runs[vertical], below[vertical])
+
+    wrap = horizontal[..., -1]
+    clusters.union(runs[..., -1][wrap], runs[..., 0][wrap])
+
+    return clusters, runs, runs_per_sample
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class ClusterStatistics:
+
+    def __init__(self, clusters, shape=None):
+        """
+        This class encapsulates the statistics of the cluster sizes of one or
+        many samples. Everything is computed from a single histogram of the
+        cluster sizes per sample (built with one np.bincount for all samples),
+        the input is never modified.
+
+        :param clusters: Either a list of cluster sizes (one sample), a list
+                         of such lists/arrays (many samples) or a 2D array
+                         with one sample per row padded with zeros.
+        :param shape: Tuple with the shape of the lattice (row first). Only
+                      needed for the quantities per lattice site (get_p_inf
+                      and get_n_s).
+        """
+
+        self.shape = shape
+
+        # Many samples if the first entry is a sample itself
+        self.single = len(clusters) == 0 or np.ndim(clusters[0]) == 0
+        if self.single:
+            clusters = [clusters]
+
+        sizes = [np.asarray(sample, dtype=np.int_).ravel()
+                 for sample in clusters]
+        sample = np.repeat(np.arange(len(sizes)), [len(s) for s in sizes])
+        sizes = np.concatenate(sizes) if sizes else np.zeros(0, np.int_)
+
+        # Histogram of the sizes of each sample (row). Column s is the number
+        # of clusters with size s. Size 0 (padding) is ignored
+        width = sizes.max() + 1 if sizes.size else 1
+        self.num = len(clusters)
+        self.histogram = np.bincount(sample * width + sizes,
+                                     minlength=self.num * width).reshape(
+                                         self.num, width)
+        self.histogram[:, 0] = 0
+        self.s = np.arange(width)
+
+        self.num_clusters = self.histogram.sum(axis=1)
+        # Size of the largest (i.e. infinite) cluster, 0 if there is none
+        self.largest = np.where(self.num_clusters > 0, width - 1 - np.argmax(
+            self.histogram[:, ::-1] > 0, axis=1), 0)
+
+        # Histogram without (one) largest cluster, i.e. finite clusters only
+        self.finite = self.histogram.copy()
+        self.finite[np.arange(self.num), self.largest] -= \
+            self.num_clusters > 0
+        self.finite[:, 0] = 0
+
+    def _result(self, values):
+        """
+        Returns a scalar for a single sample and the array otherwise.
+
+        :param values: Array with one value per sample.
+
+        :return float or ndarray: The value(s).
+        """
+
+        return values[0] if self.single else values
+
+    def get_moment(self, k, finite=True):
+        """
+        Returns the k-th moment of the cluster size distribution (not
+        normalized), i.e. sum_s s^k n_s.
+
+        :param k: Order of the moment.
+        :param finite: Whether to leave out the largest (infinite) cluster.
+
+        :return float or ndarray: Moment for each sample.
+        """
+
+        histogram = self.finite if finite else self.histogram
+        # ==> In floats, the integer powers (and their sum) overflow already
+        #     for the second moment of large lattices
+        s = self.s.astype(np.float64)
+
+        return self._result(histogram @ s**k)
+
+    def get_susceptibility(self):
+        """
+        Returns the susceptibility for site percolation (see
+        ..model.measurment.get_susceptibility).
+
+        :return float or ndarray: Susceptibility for each sample, nan if there
+                                  is no finite cluster.
+        """
+
+        m1 = self.finite @ self.s
+        m2 = self.finite @ self.s**2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            S = np.where(self.num_clusters > 1, m2 / m1, np.nan)
+
+        return self._result(S)
+
+    def get_p_inf(self):
+        """
+        Returns the probability for a lattice site to be part of the infinite
+        cluster.
+
+        :return float or ndarray: P_inf for each sample.
+        """
+
+        return self._result(self.largest / np.prod(self.shape))
+
+    def get_n_s(self, finite=False):
+        """
+        Returns the cluster number n_s, i.e. the number of clusters of size s
+        per lattice site, averaged over all samples.
+
+        :param finite: Whether to leave out the largest (infinite) cluster.
+
+        :return ndarray: n_s for each size s (index is s).
+        """
+
+        histogram = self.finite if finite else self.histogram
+
+        return histogram.mean(axis=0) / np.prod(self.shape)
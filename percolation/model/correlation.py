@@ -57,3 +57,110 @@ def extract_correlation_length(connectivity):
     out = minimize(residual_correlation, params, args=(connectivity, r))
 
     return out
+
+
+def fit_correlation_lengths(connectivity, weights=None, iterations=10):
+    """
+     Estimates the correlation length and the pre factor of many correlation
+     functions at once (see extract_correlation_length, which is kept for
+     diagnostics of single curves). A weighted linear least squares fit of
+         log(connectivity) = log(A) - r/corr
+     gives a first estimate for all curves in closed form, which is then
+     refined by Gauss-Newton iterations on the (unweighted) residual
+     model - data, the objective of extract_correlation_length.
+
+     :param connectivity: Array with the values of the correlation functions
+                          at r=1 to r=connectivity.shape[-1] along the last
+                          axis. All other axes are independent curves (e.g.
+                          (L, p, sample)). Nan values are ignored.
+     :param weights: Weights of the log-linear fit with the same shape. If
+                     None the squared connectivity is used, which turns the
+                     (relative) error of the logarithm into the absolute
+                     error of the data.
+     :param iterations: Number of Gauss-Newton iterations. With 0 the
+                        log-linear estimate is returned.
+
+     :return ndarray, ndarray: Correlation length and pre factor of each
+                               curve, nan if there are less than two usable
+                               values or the curve does not decay.
+     """
+
+    g = np.asarray(connectivity, dtype=np.float64)
+    r = np.arange(1, g.shape[-1] + 1, dtype=np.float64)
+
+    # Only positive values have a logarithm
+    valid = np.isfinite(g) & (g > 0)
+    if weights is None:
+        weights = g**2
+    w = np.where(valid, weights, 0)
+    log_g = np.log(np.where(valid, g, 1))
+
+    S0, S1, S2 = [np.sum(w * r**k, axis=-1) for k in (0, 1, 2)]
+    T0, T1 = [np.sum(w * r**k * log_g, axis=-1) for k in (0, 1)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = -(S0 * T1 - S1 * T0) / (S0 * S2 - S1**2)
+        a = (T0 + k * S1) / S0
+
+    # Gauss-Newton for the model exp(a - k r) in the parameters a = log(A)
+    # and k = 1/corr, which keeps A positive and is better conditioned
+    finite = np.isfinite(g)
+    data = np.where(finite, g, 0)
+    cost = _cost(a, k, r, data, finite)
+
+    for _ in range(iterations):
+        with np.errstate(over='ignore', invalid='ignore'):
+            model = np.where(finite, np.exp(a[..., None] - k[..., None] * r),
+                             0)
+        residual = model - data
+        # Jacobian columns: d/da = model, d/dk = -r model
+        J_aa = np.sum(model**2, axis=-1)
+        J_ak = -np.sum(r * model**2, axis=-1)
+        J_kk = np.sum(r**2 * model**2, axis=-1)
+        g_a = np.sum(model * residual, axis=-1)
+        g_k = -np.sum(r * model * residual, axis=-1)
+
+        with np.errstate(invalid='ignore', divide='ignore',
+                         over='ignore'):
+            det = J_aa * J_kk - J_ak**2
+            d_a = -(J_kk * g_a - J_ak * g_k) / det
+            d_k = -(J_aa * g_k - J_ak * g_a) / det
+
+            # Halve the step until the cost does not increase
+            step = np.ones_like(a)
+            for _ in range(10):
+                new_cost = _cost(a + step * d_a, k + step * d_k, r, data,
+                                 finite)
+                worse = ~(new_cost <= cost)
+                if not np.any(worse & np.isfinite(d_a) & np.isfinite(d_k)):
+                    break
+                step = np.where(worse, step / 2, step)
+
+            accept = (new_cost <= cost) & np.isfinite(d_a) & np.isfinite(d_k)
+            a = np.where(accept, a + step * d_a, a)
+            k = np.where(accept, k + step * d_k, k)
+            cost = np.where(accept, new_cost, cost)
+
+    # ==> Only decaying curves have a (positive) correlation length
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.where(k > 0, 1 / k, np.nan)
+
+    return corr, np.where(k > 0, np.exp(a), np.nan)
+
+
+def _cost(a, k, r, data, finite):
+    """
+     Returns the sum of squared residuals of the model exp(a - k r).
+
+     :param a: Logarithm of the pre factor of each curve.
+     :param k: Inverse correlation length of each curve.
+     :param r: Distances.
+     :param data: Values of the correlation functions (0 where not finite).
+     :param finite: Whether each value is finite.
+
+     :return ndarray: Cost of each curve.
+     """
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        model = np.where(finite, np.exp(a[..., None] - k[..., None] * r), 0)
+
+    return np.sum((model - data)**2, axis=-1)
@@ -0,0 +1,316 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from ..library.unionfind import UnionFind
+from ..library.telemetry import recorder
+
+
+class FastHoshenKopelman:
+
+    # Number of rows fetched from the grid at once
+    block = 256
+
+    def __init__(self, grid, unwrap=False):
+        """
+        This class encapsulates a vectorized variant of the Hoshen-Kopelman
+        algorithm. Instead of classifying every site individually it labels
+        whole blocks of rows at once: each horizontal run of occupied sites
+        gets a provisional label and runs touching in neighbouring rows are
+        merged in bulk via an array based union-find. Returns the same labels
+        and sizes as ..model.hk.HoshenKopelman.
+
+        :param grid: Grid to be classified. Has to be a subclass of
+                     ..library.grid.
+        :param unwrap: Whether to keep track of the displacement of every site
+                       to the root of its cluster on the unwrapped lattice.
+                       Needed for the wrapping flags and the displacements
+                       (see compactify_cluster).
+        """
+
+        self.grid = grid
+        self.unwrap = unwrap
+
+    def setup(self):
+        """
+        Sets the class up for a run. Can be called after changing the grid
+        again such that you do not need multiple instances of this class.
+
+        :return None:
+        """
+
+        # labels is a 2D array with the shape of the grid. Contains the
+        # (provisional) cluster label for each lattice site or 0 if the site
+        # is not occupied
+        self.labels = np.zeros(self.grid.shape, dtype=np.int_)
+        # Parent and size table of all provisional labels
+        self.clusters = UnionFind(capacity=self.grid.size // 4 + 1,
+                                  offsets=self.unwrap)
+        # Column distance of each site to the first site of its run (i.e. to
+        # its provisional label). Only needed when unwrapping
+        self.columns = (np.zeros(self.grid.shape, dtype=np.int_)
+                        if self.unwrap else None)
+
+    def run(self, sizes_only=False):
+        """
+        Starts the algorithm, classifies all lattice sites and returns the
+        labels as well as sizes for each cluster.
+
+        :param sizes_only: If True the relabelling of the lattice sites is
+                           skipped and None is returned instead of the labels.
+
+        :return ndarray, list: The first array contains the labels for each
+                               lattice site (or 0 for unoccupied ones).
+                               The second list contains the size for each
+                               label.
+        """
+
+        with recorder.timer('label'):
+            # Fetch and label the rows block wise (bulk unpacking for packed
+            # grids)
+            for start in range(0, self.grid.N, self.block):
+                stop = min(start + self.block, self.grid.N)
+                self.labels[start:stop] = self.label_rows(
+                    self.grid.rows(start, stop), start)
+
+                # Merge all runs touching vertically inside the block and with
+                # the last row of the previous block
+                self.merge((slice(max(start - 1, 0), stop - 1),),
+                           (slice(max(start - 1, 0) + 1, stop),), (1, 0))
+
+            self.stitch()
+
+        with recorder.timer('compact'):
+            sizes = self.compactify_cluster(sizes_only)
+        recorder.count('labels', len(self.clusters))
+        recorder.count('unions', len(self.clusters) - len(sizes))
+
+        if sizes_only:
+            return None, sizes
+
+        return self.labels, sizes
+
+    def label_rows(self, rows, start):
+        """
+        Gives every horizontal run of occupied sites in a block of rows a new
+        provisional label.
+
+        :param rows: 2D boolean array with the occupation of the rows.
+        :param start: Index of the first row of the block.
+
+        :return ndarray: Array with the provisional label for each site in the
+                         rows (or 0 for unoccupied ones).
+        """
+
+        # No periodic wrap for the runs here, see stitch
+        run, starts = find_runs(rows)
+
+        if self.unwrap:
+            column = np.arange(rows.shape[1])
+            self.columns[start:start + len(rows)] = column - \
+                np.maximum.accumulate(np.where(starts, column, 0), axis=1)
+
+        # Sizes of the runs are the number of occupied sites per run index
+        sizes = np.bincount(run.ravel())[1:]
+        first = self.clusters.add(sizes)
+
+        return np.where(rows, run + (first - 1), 0)
+
+    def stitch(self):
+        """
+        Unifies the clusters across the periodic boundaries, i.e. the right
+        with the left column and the bottom with the top row.
+
+        :return None:
+        """
+
+        self.merge((slice(None), -1), (slice(None), 0), (0, 1))
+        self.merge((-1,), (0,), (1, 0))
+
+    def merge(self, a, b, step):
+        """
+        Unifies the clusters of neighbouring sites.
+
+        :param a: Index (tuple) of the first sites into the labels.
+        :param b: Index (tuple) of the second sites into the labels. Each
+                  second site is the neighbour of the corresponding first
+                  site in direction step.
+        :param step: Displacement (row, column) from the first to the second
+                     sites (on the unwrapped lattice).
+
+        :return None:
+        """
+
+        l_i, l_j = self.labels[a], self.labels[b]
+        # Only occupied sites have a non zero label
+        both = (l_i != 0) & (l_j != 0)
+
+        if not self.unwrap:
+            self.clusters.union(l_i[both], l_j[both])
+            return
+
+        # Displacement between the first sites of the two runs
+        delta = np.zeros((np.count_nonzero(both), 2), dtype=np.int_)
+        delta[:] = step
+        delta[:, 1] += self.columns[a][both] - self.columns[b][both]
+        self.clusters.union(l_i[both], l_j[both], delta)
+
+    def compactify_cluster(self, sizes_only=False):
+        """
+        Relabels all sites with the final label of their cluster. Final labels
+        are consecutive and ordered by the first site of each cluster (row
+        major).
+
+        If unwrapping, also sets wrapping (the wrapping flags of each cluster,
+        see ..library.unionfind.UnionFind.get_wrapping) and, unless
+        sizes_only, displacements (3D array with the displacement (row,
+        column) of each site to the root of its cluster on the unwrapped
+        lattice, 0 for unoccupied sites).
+
+        :param sizes_only: If True the labels are left untouched (i.e.
+                           provisional).
+
+        :return list: Size of each cluster (index 0 is label 1).
+        """
+
+        lookup, sizes = self.clusters.compactify()
+
+        if self.unwrap:
+            self.wrapping = self.clusters.get_wrapping(lookup)
+            if not sizes_only:
+                _, self.displacements = self.clusters.locate(self.labels)
+                self.displacements[..., 1] += self.columns
+
+        if not sizes_only:
+            self.labels = lookup[self.labels]
+
+        return sizes.tolist()
+
+
+def find_runs(rows):
+    """
+    Numbers the horizontal runs of occupied sites consecutively (row major,
+    starting at 1). Runs do not wrap around the periodic boundary.
+
+    :param rows: Boolean array with the occupation of each site. Rows are
+                 along the last axis.
+
+    :return ndarray, ndarray: The first array contains the run number for each
+                              site (or 0 for unoccupied ones), the second
+                              marks the first site of each run.
+    """
+
+    # A run starts wherever an occupied site has no occupied left neighbour
+    starts = rows.copy()
+    starts[..., 1:] &= ~rows[..., :-1]
+    run = np.cumsum(starts).reshape(rows.shape)
+
+    return np.where(rows, run, 0), starts
+
+
+def label_batch(configs, wrapping=False):
+    """
+    Labels a whole stack of independent configurations in one go. All samples
+    share one flat label array and one union-find table (the labels of each
+    sample are offset by the labels of the samples before it), so the Python
+    overhead is paid once per stack instead of once per sample.
+
+    :param configs: 3D boolean array (samples x rows x columns) with the
+                    occupation of each site. Each sample has periodic boundary
+                    conditions in both directions.
+    :param wrapping: Whether to keep track of the displacements between the
+                     runs (as FastHoshenKopelman with unwrap) and also return
+                     the wrapping flags of each cluster.
+
+    :return list: List with one array per sample containing the size of each
+                  cluster (ordered as in FastHoshenKopelman). If wrapping, a
+                  second such list with the wrapping flags of each cluster
+                  (see ..library.unionfind.UnionFind.get_wrapping).
+    """
+
+    configs = np.asarray(configs, dtype=np.bool_)
+    num = len(configs)
+    if num == 0:
+        return ([], []) if wrapping else []
+
+    with recorder.timer('label'):
+        clusters, runs_per_sample = merge_batch(configs, wrapping)
+
+    with recorder.timer('compact'):
+        # Final labels are ordered by their root, i.e. grouped by sample.
+        # Count the clusters of each sample via the sample of each root run
+        roots = clusters.flatten()
+        is_root = roots == np.arange(len(roots))
+        is_root[0] = False
+        first_run = np.cumsum(runs_per_sample) - runs_per_sample + 1
+        sample = np.searchsorted(first_run, np.flatnonzero(is_root),
+                                 side='right')
+        counts = np.bincount(sample - 1, minlength=num)
+
+        lookup, sizes = clusters.compactify()
+
+    recorder.count('labels', len(clusters))
+    recorder.count('unions', len(clusters) - len(sizes))
+
+    split = np.cumsum(counts)[:-1]
+    if wrapping:
+        return (np.split(sizes, split),
+                np.split(clusters.get_wrapping(lookup), split))
+
+    return np.split(sizes, split)
+
+
+def merge_batch(configs, unwrap=False):
+    """
+    Gives every horizontal run of occupied sites of a stack of
+    configurations a provisional label and unifies all touching runs (see
+    label_batch).
+
+    :param configs: 3D boolean array (samples x rows x columns).
+    :param unwrap: Whether the union-find table keeps track of the
+                   displacements between the runs (and thereby of the
+                   wrapping flags).
+
+    :return ..library.unionfind.UnionFind, ndarray: The union-find table of
+            all runs and the number of runs of each sample.
+    """
+
+    num = len(configs)
+
+    # Every horizontal run of occupied sites in every row of every sample
+    # gets its own provisional label (no periodic wrap here, see below)
+    labels, starts = find_runs(configs)
+    runs_per_sample = starts.reshape(num, -1).sum(axis=1)
+
+    num_runs = runs_per_sample.sum()
+    clusters = UnionFind(capacity=num_runs + 1, offsets=unwrap)
+    clusters.add(np.bincount(labels.ravel(), minlength=num_runs + 1)[1:])
+
+    if unwrap:
+        column = np.arange(configs.shape[2])
+        columns = column - \
+            np.maximum.accumulate(np.where(starts, column, 0), axis=2)
+
+    # Merge runs touching vertically (including the periodic bottom/top
+    # rows) and across the periodic right/left columns. np.roll only acts
+    # within each sample so no clusters leak into other samples
+    below = np.roll(labels, -1, axis=1)
+    for l_i, l_j, step in ((labels, below, (1, 0)),
+                           (labels[:, :, -1], labels[:, :, 0], (0, 1))):
+        both = (l_i != 0) & (l_j != 0)
+        if not unwrap:
+            clusters.union(l_i[both], l_j[both])
+            continue
+
+        # Displacement between the first sites of the two runs (as in
+        # FastHoshenKopelman.merge)
+        if step == (1, 0):
+            c_i, c_j = columns, np.roll(columns, -1, axis=1)
+        else:
+            c_i, c_j = columns[:, :, -1], columns[:, :, 0]
+        delta = np.zeros((np.count_nonzero(both), 2), dtype=np.int_)
+        delta[:] = step
+        delta[:, 1] += c_i[both] - c_j[both]
+        clusters.union(l_i[both], l_j[both], delta)
+
+    return clusters, runs_per_sample
@@ -5,7 +5,7 @@ from scipy.interpolate import interp1d
 from lmfit import minimize, Parameters, fit_report
 
 
-def fss(S, Ls, ps, vary_exponents=False):
+def fss(S, Ls, ps, vary_exponents=False, init=None):
     """
     Estimates the critical exponents gamma and nu as well as the critical
     threshold pc via finite size scaling.
@@ -18,16 +18,22 @@ def fss(S, Ls, ps, vary_exponents=False):
     :param ps: List of floats denoting the probabilities for the columns of S.
     :param vary_exponents: Boolean whether to vary and find optimal critical
                            exponents or fixate them at the "true" value.
+    :param init: Dictionary with initial values for 'pc', 'gamma' and/or
+                 'nu' (e.g. a previous estimate to warm start from). Missing
+                 ones start at the "true" value.
     :return MinimizerResult: Minimizing result from lmfit with the estimated
                              critical exponents and probability threshold.
     """
 
+    init = dict({'pc': 0.5927, 'gamma': 43 / 18, 'nu': 4 / 3},
+                **(init or {}))
+
     params = Parameters()
-    params.add('pc', value=0.5927)
-    params.add('gamma', value=43 / 18, vary=vary_exponents)
-    params.add('nu', value=4 / 3, vary=vary_exponents)
+    params.add('pc', value=init['pc'])
+    params.add('gamma', value=init['gamma'], vary=vary_exponents)
+    params.add('nu', value=init['nu'], vary=vary_exponents)
 
-    out = minimize(residual, params, args=(S, Ls, ps))
+    out = minimize(Residual(S, Ls, ps), params)
 
     return out
 
@@ -47,6 +53,9 @@ def residual(params, S, Ls, ps):
 
      :return list: Array with the sum of the pair wise absolute differences
                    between all data series.
+
+     This is the reference implementation, fss uses Residual which gives the
+     same result bit for bit but is faster.
      """
 
     pc = params['pc'].value
@@ -78,6 +87,180 @@ def residual(params, S, Ls, ps):
     return np.nansum(residual, axis=0)
 
 
+class Residual:
+
+    def __init__(self, S, Ls, ps):
+        """
+        This class encapsulates the residual of the finite size scaling (see
+        residual) for fixed data. Everything independent of the parameters
+        is prepared once and the scaled susceptibilities are kept as long as
+        the exponents stay the same (they are fixed unless vary_exponents).
+        Each evaluation then works on the whole (L x p) matrix at once: the
+        ps are scaled by broadcasting, each row is interpolated onto the
+        common grid by numpy.interp (which scipy.interpolate.interp1d
+        delegates to) and the pairwise differences are taken by indexing
+        all pairs at once. The result is bit for bit the same as residual.
+
+        :param S: A matrix with len(Ls) rows and len(ps) columns (see
+                  residual).
+        :param Ls: List of integers denoting the system sizes.
+        :param ps: List of floats denoting the probabilities.
+        """
+
+        self.S = np.asarray(S, dtype=np.float64)
+        # ==> The scale factors need the same power as scale_p and
+        #     scale_chi, which for numpy integers is numpy's (vectorized it
+        #     rounds the same) and else the one of the given numbers
+        self.Ls = list(Ls)
+        self.array = None
+        if all(isinstance(L, np.integer) for L in self.Ls):
+            self.array = np.array(self.Ls)
+        self.ps = np.asarray(ps, dtype=np.float64)
+
+        # interp1d sorts the data series by x, for positive (finite) scale
+        # factors this is the order of the ps
+        self.order = np.argsort(self.ps, kind='mergesort')
+        self.sorted_ps = self.ps[self.order]
+        self.bounds = (float(self.sorted_ps[0]), float(self.sorted_ps[-1]))
+        self.ends = (float(self.ps[0]), float(self.ps[-1]))
+
+        # All pairs of data series in the order of itertools.combinations
+        self.i, self.j = np.triu_indices(len(self.Ls), 1)
+        self.steps = np.arange(len(self.ps), dtype=np.float64)
+
+        # Scaled data for the last exponents (see scale)
+        self.exponents = None
+
+    def __call__(self, params):
+        pc = params['pc'].value
+        nu = params['nu'].value
+        gamma = params['gamma'].value
+
+        if (nu, gamma) != self.exponents:
+            self.scale(nu, gamma)
+
+        # ==> All scaled ps are finite if the largest ones are, else
+        #     (overflow or nan) the general way is taken
+        low, high = self.bounds
+        f_min, f_max = self.range
+        if not (abs(low - pc) * f_max < np.inf and
+                abs(high - pc) * f_max < np.inf):
+            return self.general(pc, nu, gamma)
+
+        # ==> The largest scaled first p and the smallest scaled last p,
+        #     for a fixed p the scaled value is monotonic in the factor
+        first, last = self.ends[0] - pc, self.ends[1] - pc
+        x_new = self.linspace(first * (f_max if first >= 0 else f_min),
+                              last * (f_min if last >= 0 else f_max))
+        x = (self.sorted_ps - pc) * self.factors
+
+        return self.differences(x_new, x, self.y)
+
+    def scale(self, nu, gamma):
+        """
+        Prepares the scale factors of the ps and the scaled (sorted)
+        susceptibilities for the given exponents.
+
+        :param nu: Critical exponent.
+        :param gamma: Critical exponent.
+        """
+
+        factors = self.power(1 / nu)
+        y = self.S / self.power(gamma / nu)[:, None]
+
+        self.factors = factors[:, None]
+        self.range = (float(np.min(factors)), float(np.max(factors)))
+        self.y = y[:, self.order]
+        self.exponents = (nu, gamma)
+
+    def general(self, pc, nu, gamma):
+        """
+        Evaluates the residual for any parameters (e.g. ones for which the
+        scaled ps overflow), sorting each row like interp1d.
+
+        :param pc: Critical threshold.
+        :param nu: Critical exponent.
+        :param gamma: Critical exponent.
+
+        :return ndarray: The residual (see residual).
+        """
+
+        x = (self.ps - pc) * self.power(1 / nu)[:, None]
+        y = self.S / self.power(gamma / nu)[:, None]
+
+        # ==> fmax/fmin ignore nan just like nanmax/nanmin
+        x_new = self.linspace(np.fmax.reduce(x[:, 0]),
+                              np.fmin.reduce(x[:, -1]))
+
+        order = np.argsort(x, axis=1, kind='mergesort')
+        x = np.take_along_axis(x, order, axis=1)
+        y = np.take_along_axis(y, order, axis=1)
+
+        return self.differences(x_new, x, y)
+
+    def differences(self, x_new, x, y):
+        """
+        Interpolates each data series onto the common grid and sums the
+        absolute differences of all pairs (a pair with nan counts as 0) in
+        the same order as residual.
+
+        :param x_new: Common grid.
+        :param x: Matrix with the (ascending) scaled ps of each row.
+        :param y: Matrix with the corresponding scaled susceptibilities.
+
+        :return ndarray: The residual (see residual).
+        """
+
+        interp, nan = np.interp, np.nan
+        y_new = np.array([interp(x_new, x[k], y[k], nan, nan)
+                          for k in range(len(y))])
+
+        differences = y_new[self.i]
+        differences -= y_new[self.j]
+        np.abs(differences, out=differences)
+        np.fmax(differences, 0, out=differences)
+
+        return differences.sum(axis=0)
+
+    def power(self, exponent):
+        """
+        Returns L**exponent for all system sizes, rounded the same as in
+        scale_p and scale_chi.
+
+        :param exponent: Exponent.
+
+        :return ndarray: The powers of the system sizes.
+        """
+
+        if self.array is not None:
+            return np.power(self.array, exponent)
+
+        return np.array([L**exponent for L in self.Ls], dtype=np.float64)
+
+    def linspace(self, start, stop):
+        """
+        Returns np.linspace(start, stop, len(ps)) without its overhead
+        (same arithmetic).
+
+        :param start: First value.
+        :param stop: Last value.
+
+        :return ndarray: Evenly spaced values.
+        """
+
+        n = len(self.steps)
+        start, stop = float(start), float(stop)
+        step = (stop - start) / (n - 1) if n > 1 else 0
+        if step == 0 or not abs(step) < np.inf:
+            return np.linspace(start, stop, n, endpoint=True)
+
+        values = self.steps * step
+        values += start
+        values[-1] = stop
+
+        return values
+
+
 def scale_p(p, L, pc, nu):
     """
      Scales the probability p according to finite size scaling.
@@ -106,3 +289,67 @@ def scale_chi(chi, L, nu, gamma):
      """
 
     return chi / L**(gamma / nu)
+
+
+def refine_ps(S, Ls, ps, num, nu=4 / 3, gamma=43 / 18, width=2,
+              pc=0.5927):
+    """
+    Proposes new probabilities to sample for a better finite size scaling.
+    A provisional pc is fitted to the data, candidates are the midpoints
+    between neighbouring probabilities inside the scaling window
+    |p - pc| < width * L^(-1/nu) of at least one system size L. They are
+    ranked by how fast the scaled susceptibilities of each L change within
+    its own window and how often the scaled curves for different L cross
+    within the windows of both. Non positive or undefined (nan)
+    susceptibilities are left out.
+
+    :param S: A matrix with len(Ls) rows and len(ps) columns. Each entry is the
+              (mean) susceptibility for the system with the corresponding
+              size L and occupation probability p.
+    :param Ls: List of integers denoting the system sizes the rows of S
+               correspond to.
+    :param ps: List of floats (ascending) denoting the probabilities for the
+               columns of S.
+    :param num: Maximum number of new probabilities.
+    :param nu: Critical exponent used for the scaling.
+    :param gamma: Critical exponent used for the scaling.
+    :param width: Half width of the scaling window in units of L^(-1/nu).
+    :param pc: Initial value of the fit of pc (e.g. the known threshold of
+               the lattice).
+
+    :return float, ndarray: The provisional pc and the new probabilities
+                            (ascending).
+    """
+
+    ps = np.asarray(ps, dtype=np.float64)
+    Ls = np.asarray(Ls)
+    pc = fss(S, Ls, ps, init={'pc': pc, 'gamma': gamma,
+                              'nu': nu}).params['pc'].value
+
+    # ==> Only positive susceptibilities have a logarithm, the others are
+    #     left out like missing ones
+    S = np.asarray(S, dtype=np.float64)
+    S = np.where(np.isfinite(S) & (S > 0), S, np.nan)
+    y = np.log(scale_chi(S, Ls[:, None], nu, gamma))
+
+    # Intervals inside the scaling window of each L
+    midpoints = (ps[1:] + ps[:-1]) / 2
+    inside = np.abs(midpoints - pc) < width * Ls[:, None]**(-1 / nu)
+
+    # Change of each (scaled) curve within each interval, relative to the
+    # total change of the curve within its window
+    change = np.where(inside, np.abs(np.diff(y, axis=1)), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = change / np.nansum(change, axis=1, keepdims=True)
+    score = np.nansum(change, axis=0)
+
+    # Curves of different L crossing within the interval (inside the
+    # windows of both)
+    for i, j in combinations(range(len(Ls)), 2):
+        sign = np.sign(y[i] - y[j])
+        score += (sign[1:] * sign[:-1] < 0) & inside[i] & inside[j]
+
+    candidates = np.flatnonzero(inside.any(axis=0))
+    best = candidates[np.argsort(-score[candidates], kind='stable')][:num]
+
+    return pc, np.sort(midpoints[best])
@@ -0,0 +1,153 @@
+import numpy as np
+
+from .fasthk import FastHoshenKopelman
+
+
+def get_geometry(grid):
+    """
+    Labels the grid and returns the geometry of each cluster.
+
+    :param grid: Grid to be classified. Has to be a subclass of
+                 ..library.grid.
+
+    :return dict: Dictionary with the labels ('labels'), the size ('sizes'),
+                  the wrapping flags ('wrapping'), the squared radius of
+                  gyration ('rg2'), the bounding box ('bounding_box') and the
+                  perimeter ('perimeter') of each cluster (see the respective
+                  functions) as well as the correlation length squared
+                  ('xi2').
+    """
+
+    hk = FastHoshenKopelman(grid, unwrap=True)
+    hk.setup()
+    labels, sizes = hk.run()
+    positions = get_unwrapped_positions(labels, hk.displacements)
+    sizes = np.array(sizes, dtype=np.int_)
+    rg2 = get_radius_of_gyration(labels, positions)
+
+    return {'labels': labels, 'sizes': sizes, 'wrapping': hk.wrapping,
+            'rg2': rg2,
+            'bounding_box': get_bounding_box(labels, positions),
+            'perimeter': get_perimeter(labels),
+            'xi2': get_correlation_length(sizes, rg2)}
+
+
+def get_unwrapped_positions(labels, displacements):
+    """
+    Returns the position of each occupied site on the unwrapped lattice, i.e.
+    with the sites of a cluster not torn apart by the periodic boundaries.
+
+    :param labels: A labelled cluster configuration (0 if not occupied).
+    :param displacements: 3D array with the displacement (row, column) of each
+                          site to the root of its cluster on the unwrapped
+                          lattice (see ..model.fasthk.FastHoshenKopelman).
+
+    :return ndarray: 2D array with the unwrapped (row, column) of each
+                     occupied site (row major order).
+    """
+
+    N, M = labels.shape
+    x, y = np.nonzero(labels)
+    sites = np.stack((x, y), axis=1)
+    displacements = displacements[x, y]
+
+    # The root of the cluster sits at the site position minus its
+    # displacement (modulo the lattice). Going from there by the displacement
+    # gives the unwrapped position
+    return (sites - displacements) % (N, M) + displacements
+
+
+def get_radius_of_gyration(labels, positions):
+    """
+    Returns the squared radius of gyration of each cluster:
+        R^2 = 1/s sum_i (r_i - r_mean)^2
+    For clusters wrapping around the lattice it is not well defined.
+
+    :param labels: A labelled cluster configuration (0 if not occupied).
+    :param positions: Unwrapped position of each occupied site (see
+                      get_unwrapped_positions).
+
+    :return ndarray: Squared radius of gyration for each cluster (index 0 is
+                     label 1).
+    """
+
+    cluster = labels[labels != 0]
+    num = labels.max()
+    sizes = np.bincount(cluster, minlength=num + 1)
+    sizes[0] = 1
+
+    rg2 = 0
+    for r in positions.T:
+        mean = np.bincount(cluster, weights=r, minlength=num + 1) / sizes
+        rg2 = rg2 + np.bincount(cluster, weights=(r - mean[cluster])**2,
+                                minlength=num + 1)
+
+    return (rg2 / sizes)[1:]
+
+
+def get_bounding_box(labels, positions):
+    """
+    Returns the bounding box of each cluster on the unwrapped lattice.
+
+    :param labels: A labelled cluster configuration (0 if not occupied).
+    :param positions: Unwrapped position of each occupied site (see
+                      get_unwrapped_positions).
+
+    :return ndarray: 2D array with (min row, min column, max row, max column)
+                     for each cluster (index 0 is label 1).
+    """
+
+    cluster = labels[labels != 0]
+    num = labels.max()
+
+    lower = np.full((num + 1, 2), np.iinfo(np.int_).max, dtype=np.int_)
+    upper = np.full((num + 1, 2), np.iinfo(np.int_).min, dtype=np.int_)
+    np.minimum.at(lower, cluster, positions)
+    np.maximum.at(upper, cluster, positions)
+
+    return np.concatenate((lower, upper), axis=1)[1:]
+
+
+def get_perimeter(labels):
+    """
+    Returns the perimeter of each cluster, i.e. the number of bonds between a
+    site of the cluster and an unoccupied nearest neighbour (periodic
+    boundary conditions).
+
+    :param labels: A labelled cluster configuration (0 if not occupied).
+
+    :return ndarray: Perimeter of each cluster (index 0 is label 1).
+    """
+
+    num = labels.max()
+    perimeter = np.zeros(num + 1, dtype=np.int_)
+
+    for shift, axis in ((1, 0), (-1, 0), (1, 1), (-1, 1)):
+        empty = np.roll(labels, shift, axis=axis) == 0
+        perimeter += np.bincount(labels[empty], minlength=num + 1)
+
+    return perimeter[1:]
+
+
+def get_correlation_length(sizes, rg2):
+    """
+    Returns the squared (second moment) correlation length
+        xi^2 = sum_s 2 R_s^2 s^2 n_s / sum_s s^2 n_s
+    with R_s^2 the mean squared radius of gyration of clusters of size s. The
+    largest, i.e. infinite, cluster is not considered.
+
+    :param sizes: Size of each cluster.
+    :param rg2: Squared radius of gyration of each cluster.
+
+    :return float: Squared correlation length. If there is no finite cluster
+                   nan is returned.
+    """
+
+    if len(sizes) <= 1:
+        return np.nan
+
+    finite = np.ones(len(sizes), dtype=np.bool_)
+    finite[np.argmax(sizes)] = False
+    s2 = np.asarray(sizes, dtype=np.float64)[finite]**2
+
+    return np.sum(2 * rg2[finite] * s2) / np.sum(s2)
@@ -3,21 +3,26 @@ import numpy as np
 
 # Own Imports
 from ..library.oneindexedlist import OneIndexedList
-from ..library.misc import timeit
+from ..library.telemetry import recorder
 
 
 class HoshenKopelman:
 
-    def __init__(self, grid):
+    def __init__(self, grid, unwrap=False):
         """
         This class encapsulates the cluster finding and labelling via the
         Hoshen-Kopelman algorithm.
 
         :param grid: Grid to be classified. Has to be a subclass of
                      ..library.grid.
+        :param unwrap: Whether to keep track of the displacement of every site
+                       to the root of its cluster on the unwrapped lattice.
+                       Detects the clusters wrapping around the torus in the
+                       same pass (see compactify_cluster).
         """
 
         self.grid = grid
+        self.unwrap = unwrap
 
     def setup(self):
         """
@@ -35,22 +40,45 @@ class HoshenKopelman:
         # size of each cluster or the reference to its root cluster
         self.sizes = OneIndexedList()
 
-    def run(self):
+        if self.unwrap:
+            # Displacement (row, column) from each site to the root of its
+            # label at the time the site was classified, on the unwrapped
+            # lattice
+            self.dx = [0] * self.grid.size
+            self.dy = [0] * self.grid.size
+            # Displacement from each label to its parent label (0 for roots)
+            # and the wrapping flags of each root (bit 1: wraps in row
+            # direction, bit 2: wraps in column direction)
+            self.offsets = OneIndexedList()
+            self.flags = OneIndexedList()
+
+    def run(self, sizes_only=False):
         """
         Starts the algorithm, classifies all lattice sites and returns the
         labels as well as sizes for each cluster.
 
+        :param sizes_only: If True the (costly) relabelling of the lattice
+                           sites is skipped and None is returned instead of
+                           the labels. Use if only the sizes are of interest.
+
         :return list, list: The first list contains the labels for each
                             lattice site (or 0 for unoccupied ones).
                             The second list contains the size for each label.
         """
 
+        classify = self.classify_unwrapped if self.unwrap else self.classify
+
         # Go through all lattice sites individually, starting from the top
         # left (row major).
-        for i in range(self.grid.size):
-            self.classify(i)
+        with recorder.timer('label'):
+            for i in range(self.grid.size):
+                classify(i)
 
-        self.compactify_cluster()
+        with recorder.timer('compact'):
+            self.compactify_cluster(sizes_only)
+
+        if sizes_only:
+            return None, self.sizes
 
         return self.labels.reshape(self.grid.shape), self.sizes
 
@@ -144,6 +172,125 @@ class HoshenKopelman:
                     roots = np.sort((bottom_root, self_root))
                     self.union(*roots)
 
+    def classify_unwrapped(self, i):
+        """
+        Classifies (i.e. labels) i-th site like classify, but also records
+        its displacement to the root of its cluster and the displacement
+        between merged clusters (see link).
+
+        :param i: Flatted index of the site which is to be classified.
+
+        :return None:
+        """
+
+        x, y = np.unravel_index(i, self.grid.shape)
+
+        if not self.grid[x, y]:
+            # ==> lattice site is not occupied --> do nothing
+            return
+
+        # Occupied top and left neighbours (not across the periodic
+        # boundary, those are not classified yet) together with the
+        # displacement from the site to the neighbour
+        neighbours = []
+        if not self.grid.is_top(x, y):
+            top = self.grid.get_top_neighbour(x, y)
+            if self.grid[top]:
+                neighbours.append((top, -1, 0))
+        if not self.grid.is_left(x, y):
+            left = self.grid.get_left_neighbour(x, y)
+            if self.grid[left]:
+                neighbours.append((left, 0, -1))
+
+        if neighbours:
+            # ==> the site joins the cluster of the neighbour with the
+            # smallest root label. Its displacement to the root is the one of
+            # the neighbour plus the step to the neighbour
+            (root, ox, oy), ddx, ddy = min(
+                ((self.locate(*site), ddx, ddy)
+                 for site, ddx, ddy in neighbours), key=lambda n: n[0][0])
+            self.labels[i] = root
+            self.dx[i], self.dy[i] = ox + ddx, oy + ddy
+            self.sizes[root] += 1
+
+            # Unify with (or check for wrapping against) each neighbour
+            for site, ddx, ddy in neighbours:
+                self.link(x, y, site, ddx, ddy)
+        else:
+            # ==> neither neighbour is occupied --> new cluster
+            self.sizes.append(1)
+            self.offsets.append((0, 0))
+            self.flags.append(0)
+            self.labels[i] = len(self.sizes)
+            self.dx[i], self.dy[i] = 0, 0
+
+        # Neighbours across the periodic boundaries are one step to the right
+        # or below on the unwrapped lattice
+        if self.grid.is_right(x, y):
+            right = self.grid.get_right_neighbour(x, y)
+            if self.grid[right]:
+                self.link(x, y, right, 0, 1)
+
+        if self.grid.is_bottom(x, y):
+            bottom = self.grid.get_bottom_neighbour(x, y)
+            if self.grid[bottom]:
+                self.link(x, y, bottom, 1, 0)
+
+    def locate(self, x, y):
+        """
+        Finds the root label of the cluster the lattice site at (x,y) is part
+        of and the displacement from the site to the root on the unwrapped
+        lattice.
+
+        :param x: Row index of the site.
+        :param y: Column index of the site.
+
+        :return int, int, int: Root label and displacement (row, column).
+        """
+
+        i = np.ravel_multi_index((x, y), self.grid.shape)
+        l = self.labels[i]
+        ox, oy = self.dx[i], self.dy[i]
+
+        while self.sizes[l] < 0:
+            ox += self.offsets[l][0]
+            oy += self.offsets[l][1]
+            l = -self.sizes[l]
+
+        return l, ox, oy
+
+    def link(self, x, y, site, ddx, ddy):
+        """
+        Connects the (classified) site at (x,y) with an occupied neighbour.
+        Unifies their clusters, or, if they are already the same cluster but
+        the bond implies a non zero displacement of the root to itself, flags
+        the cluster as wrapping.
+
+        :param x: Row index of the site.
+        :param y: Column index of the site.
+        :param site: Tuple with the coordinates of the neighbour.
+        :param ddx: Row displacement from the site to the neighbour.
+        :param ddy: Column displacement from the site to the neighbour.
+
+        :return None:
+        """
+
+        r_i, ox_i, oy_i = self.locate(x, y)
+        r_j, ox_j, oy_j = self.locate(*site)
+        # Displacement from root r_i to root r_j implied by this bond
+        wx, wy = ddx + ox_j - ox_i, ddy + oy_j - oy_i
+
+        if r_i == r_j:
+            self.flags[r_i] |= (1 if wx else 0) | (2 if wy else 0)
+            return
+
+        # The smaller label stays the root (as in classify)
+        if r_j < r_i:
+            r_i, r_j, wx, wy = r_j, r_i, -wx, -wy
+        self.offsets[r_j] = (-wx, -wy)
+        self.flags[r_i] |= self.flags[r_j]
+        self.union(r_i, r_j)
+
     def find(self, x, y):
         """
         Finds the label of the root cluster the lattice site at (x,y)
@@ -195,34 +342,49 @@ class HoshenKopelman:
         # to the root cluster
         self.sizes[l_j] = -l_i
 
-    def compactify_cluster(self):
+    def compactify_cluster(self, sizes_only=False):
         """
         'Cleans' the labels and sizes arrays. Both still contain non root
         clusters. Combines all clusters with their root clusters and relabels
         them if necessary. Sets sizes array to a regular list!
 
-        :return None:
-        """
+        If unwrapping, also sets wrapping: the wrapping flags of each cluster
+        (bit 1 is set if the cluster wraps in row direction, bit 2 if it
+        wraps in column direction).
 
-        # Firstly, change all labels to their root labels
-        # Go through all clusters. l is its improper label, size its size
-        for l, size in zip(range(1, len(self.sizes) + 1), self.sizes):
-            if size < 0:
-                # ==> this cluster is not a root cluster
-                root = self.find_by_label(l)
-                # Rename all occurrences of this cluster label to the root
-                # cluster label
-                self.labels[self.labels == l] = root
+        :param sizes_only: If True only the sizes array is cleaned and the
+                           labels are left untouched (i.e. provisional).
 
-        # Secondly, relabel clusters to remove gaps in the cluster numbering
-        # aux holds the proper (desired) cluster labelling (i.e. no gaps)
-        aux = 1
-        for l, size in zip(range(1, len(self.sizes) + 1), self.sizes):
-            if size < 0:
-                continue
+        :return None:
+        """
 
-            self.labels[self.labels == l] = aux
-            aux += 1
+        table = np.array(self.sizes, dtype=np.int_)
+        is_root = table > 0
+        if self.unwrap:
+            self.wrapping = np.array(self.flags, dtype=np.uint8)[is_root]
+        # Every union turned one root into a non root label
+        recorder.count('labels', len(table))
+        recorder.count('unions', len(table) - np.count_nonzero(is_root))
+
+        if not sizes_only:
+            # Firstly, resolve the parent of every label to its root label.
+            # Index 0 is the label of unoccupied sites and its own root.
+            # Non root clusters store the negative label of their parent
+            parent = np.concatenate(([0], np.where(is_root, np.arange(
+                1, len(table) + 1), -table)))
+            while True:
+                # Pointer jumping: go up one level for all labels at once
+                # until every label arrived at its root
+                up = parent[parent]
+                if np.array_equal(up, parent):
+                    break
+                parent = up
+
+            # Secondly, build the lookup from provisional to proper (desired)
+            # label (i.e. no gaps, in order of the root labels) and relabel
+            # all sites in one go
+            final = np.cumsum(np.concatenate(([False], is_root)))
+            self.labels = final[parent][self.labels]
 
         # Clean sizes array by only keeping non negative entries (i.e. roots)
-        self.sizes = [l for l in self.sizes if l > 0]
+        self.sizes = table[is_root].tolist()
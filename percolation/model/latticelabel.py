@@ -0,0 +1,112 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from ..library.unionfind import UnionFind
+from ..library.telemetry import recorder
+
+
+def label_lattice(config, lattice):
+    """
+    Labels the clusters of a configuration on any lattice (see
+    ..library.lattice.Lattice). Labels are consecutive and ordered by the
+    first site of each cluster (row major), as for
+    ..model.hk.HoshenKopelman on the square lattice.
+
+    :param config: Boolean array with the shape of the lattice and the
+                   occupation of each site.
+    :param lattice: ..library.lattice.Lattice
+
+    :return ndarray, list: The first array contains the label of each site
+                           (or 0 for unoccupied ones). The second list
+                           contains the size of each cluster (index 0 is
+                           label 1).
+    """
+
+    config = np.asarray(config, dtype=np.bool_).reshape(1, lattice.size)
+
+    with recorder.timer('label'):
+        clusters, labels = merge_lattice(config, lattice)
+
+    with recorder.timer('compact'):
+        lookup, sizes = clusters.compactify()
+        labels = lookup[labels]
+
+    recorder.count('labels', len(clusters))
+    recorder.count('unions', len(clusters) - len(sizes))
+
+    return labels.reshape(lattice.shape), sizes.tolist()
+
+
+def label_lattice_batch(configs, lattice):
+    """
+    Labels a whole stack of independent configurations on any lattice in one
+    go (one union-find table for all samples, as
+    ..model.fasthk.label_batch).
+
+    :param configs: Boolean array with the samples along the first axis
+                    followed by the shape of the lattice.
+    :param lattice: ..library.lattice.Lattice
+
+    :return list: List with one array per sample containing the size of each
+                  cluster (ordered as in label_lattice).
+    """
+
+    configs = np.asarray(configs, dtype=np.bool_)
+    num = len(configs)
+    if num == 0:
+        return []
+    configs = configs.reshape(num, lattice.size)
+
+    with recorder.timer('label'):
+        clusters, _ = merge_lattice(configs, lattice)
+
+    with recorder.timer('compact'):
+        # Labels are handed out sample by sample, the sample of each root is
+        # the first one whose last label is not below it
+        roots = clusters.flatten()
+        is_root = roots == np.arange(len(roots))
+        is_root[0] = False
+        last = np.cumsum(configs.sum(axis=1))
+        sample = np.searchsorted(last, np.flatnonzero(is_root))
+        counts = np.bincount(sample, minlength=num)
+
+        _, sizes = clusters.compactify()
+
+    recorder.count('labels', len(clusters))
+    recorder.count('unions', len(clusters) - len(sizes))
+
+    return np.split(sizes, np.cumsum(counts)[:-1])
+
+
+def merge_lattice(configs, lattice):
+    """
+    Gives every occupied site its own provisional label (in order, sample by
+    sample) and unifies the labels of all bonds with both sites occupied,
+    for all bonds of all samples at once. The bonds are taken from the
+    neighbour table of the lattice.
+
+    :param configs: 2D boolean array (samples x sites).
+    :param lattice: ..library.lattice.Lattice
+
+    :return ..library.unionfind.UnionFind, ndarray: The union-find table and
+            the provisional label of each site (0 for unoccupied ones).
+    """
+
+    labels = np.cumsum(configs, dtype=np.int_).reshape(configs.shape)
+    labels *= configs
+    num = int(labels.max(initial=0))
+
+    clusters = UnionFind(capacity=num + 1)
+    clusters.add(np.ones(num, dtype=np.int_))
+
+    # Every bond once: each site with its neighbours of a larger index
+    source = np.repeat(np.arange(lattice.size), np.diff(lattice.indptr))
+    target = lattice.indices
+    forward = source < target
+    source, target = source[forward], target[forward]
+
+    both = configs[:, source] & configs[:, target]
+    clusters.union(labels[:, source][both], labels[:, target][both])
+
+    return clusters, labels
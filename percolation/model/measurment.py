@@ -1,36 +1,26 @@
+from functools import lru_cache
+
 import numpy as np
 
+from .clusterstats import ClusterStatistics
 from ..library.misc import manhattan_distance
 
 
 def get_susceptibility(clusters):
     """
-    Returns the susceptibility for site percolation from cluster sizes.
+    Returns the susceptibility for site or bond percolation (e.g. from
+    ..model.bondhk.label_bonds) from cluster sizes.
 
-    :param list: List cluster sizes.
+    :param list: List cluster sizes. Is not modified. Can also be a list of
+                 such lists (or a zero padded 2D array) for many samples.
 
     :return float: Susceptibility - average size of a finite cluster. All
                    clusters except the largest one are considered 'finite'.
-                   If the list is empty nan is returned.
+                   If the list is empty nan is returned. For many samples an
+                   array with the susceptibility of each sample.
     """
 
-    # If there is no or only one cluster then there is no finite cluster
-    if len(clusters) <= 1:
-        return np.nan
-
-    # Remove largest, i.e. infinite, cluster
-    clusters.remove(max(clusters))
-
-    sizes = np.array(list(set(clusters)))
-    n_s = []
-
-    for size in sizes:
-        n_s.append(clusters.count(size))
-
-    temp = sizes * n_s
-    S = np.sum(sizes * temp) / np.sum(temp)
-
-    return S
+    return ClusterStatistics(clusters).get_susceptibility()
 
 
 def get_p_inf(clusters, shape):
@@ -38,17 +28,16 @@ def get_p_inf(clusters, shape):
     Returns the probability for a lattice site to be part of the infinite
     cluster.
 
-    :param clusters: List cluster sizes.
+    :param clusters: List cluster sizes. Can also be a list of such lists (or
+                     a zero padded 2D array) for many samples.
     :param shape: Tuple with the shape of the lattice (row first).
 
     :return float: Probability for any site to be part of the infinite cluster.
+                   For many samples an array with the probability of each
+                   sample.
     """
 
-    if len(clusters) == 0:
-        return 0
-
-    else:
-        return max(clusters) / (shape[0] * shape[1])
+    return ClusterStatistics(clusters, shape).get_p_inf()
 
 
 def get_connectivity(config, inf_cluster):
@@ -70,10 +59,10 @@ def get_connectivity(config, inf_cluster):
     max_r = int(np.floor(N / 2) + np.floor(M / 2))
     # Count of how many sites at distance r are in the same cluster. The first
     # two entries are 1 because they don't need to be calculated
-    count = np.array([1] + [1] + [0] * (max_r - 1), dtype=np.float_)
+    count = np.array([1] + [1] + [0] * (max_r - 1), dtype=np.float64)
     # Count of how many occupied sites at distance exist regardless of cluster.
     # First two entries are 1 because they don't need to be calculated
-    norm = np.array([1] + [1] + [0] * (max_r - 1), dtype=np.float_)
+    norm = np.array([1] + [1] + [0] * (max_r - 1), dtype=np.float64)
 
     # Go through the entire lattice
     for x in range(N):
@@ -110,3 +99,153 @@ def get_connectivity(config, inf_cluster):
     mask = norm != 0
     count[mask] = count[mask] / norm[mask]
     return count
+
+
+def get_connectivity_fft(config, inf_cluster, max_pairs=2**22):
+    """
+    Returns connectivity (two point correlation function) in dependence of the
+    distance. Same as get_connectivity, but the pairs of sites are counted
+    via periodic autocorrelations (FFT) instead of looping over all sites.
+
+    :param config: A labelled cluster configuration, i.e. a regular 2D grid
+                   with each site labelled 0 if not occupied and otherwise
+                   the label of the cluster it belongs to.
+    :param inf_cluster: Label of the infinite cluster. Its sites are not used
+                        as origins.
+    :param max_pairs: Maximum number of site pairs (or sites times clusters
+                      for the FFT) held in memory at once.
+
+    :return list: A list with the connectivity in dependence of r. Starts with
+                  0 distance and goes up to the highest possible distance.
+    """
+
+    N, M = config.shape
+    max_r = int(np.floor(N / 2) + np.floor(M / 2))
+    shells = distance_shells(N, M)
+
+    occupied = config != 0
+    origins = occupied & (config != inf_cluster)
+
+    # Count of how many occupied sites exist at each displacement from every
+    # origin regardless of cluster (cross correlation)
+    pairs = np.fft.irfft2(np.conj(np.fft.rfft2(origins)) *
+                          np.fft.rfft2(occupied), s=(N, M))
+    norm = np.bincount(shells.ravel(), weights=np.rint(pairs).ravel(),
+                       minlength=max_r + 1)
+
+    # Count of how many sites at distance r are in the same cluster. Large
+    # clusters via their autocorrelation, small ones by going through all
+    # their pairs of sites (cheaper than an FFT)
+    sizes = np.bincount(config[origins], minlength=config.max() + 1)
+    large = sizes**2 > N * M
+    large[0] = False
+    count = (_count_pairs_fft(config, np.flatnonzero(large), shells, max_r,
+                              max_pairs) +
+             _count_pairs_direct(config, origins & ~large[config], max_r,
+                                 max_pairs))
+
+    # The first two entries are 1 by definition (see get_connectivity)
+    count[:2] = 1
+    norm[:2] = 1
+
+    mask = norm != 0
+    count[mask] = count[mask] / norm[mask]
+    return count
+
+
+@lru_cache(maxsize=None)
+def distance_shells(N, M):
+    """
+    Returns the distance of each displacement on a periodic lattice according
+    to the Manhatten (taxicab) metric. Cached, do not modify the result.
+
+    :param N: Number of rows.
+    :param M: Number of columns.
+
+    :return ndarray: 2D ndarray with shape (N, M). Entry (x, y) is the distance
+                     of the displacement by x rows and y columns.
+    """
+
+    return manhattan_distance((N, M), (0, 0))
+
+
+def _count_pairs_fft(config, clusters, shells, max_r, max_pairs):
+    """
+    Counts the pairs of sites of the same cluster at each distance via the
+    autocorrelation of each cluster.
+
+    :param config: A labelled cluster configuration.
+    :param clusters: Labels of the clusters to count.
+    :param shells: Distance of each displacement (see distance_shells).
+    :param max_r: Highest possible distance.
+    :param max_pairs: Maximum number of sites times clusters transformed at
+                      once.
+
+    :return ndarray: Number of pairs for each distance.
+    """
+
+    N, M = config.shape
+    batch = max(1, max_pairs // config.size)
+    power = 0
+
+    # Sum of the power spectra of all clusters
+    for start in range(0, len(clusters), batch):
+        labels = clusters[start:start + batch, None, None]
+        spectra = np.fft.rfft2(config[None] == labels)
+        power = power + np.sum(np.abs(spectra)**2, axis=0)
+
+    if not len(clusters):
+        return np.zeros(max_r + 1, dtype=np.float64)
+
+    pairs = np.fft.irfft2(power, s=(N, M))
+    return np.bincount(shells.ravel(), weights=np.rint(pairs).ravel(),
+                       minlength=max_r + 1)
+
+
+def _count_pairs_direct(config, mask, max_r, max_pairs):
+    """
+    Counts the pairs of sites of the same cluster at each distance by going
+    through all pairs of sites.
+
+    :param config: A labelled cluster configuration.
+    :param mask: Boolean array marking the sites whose clusters are counted.
+    :param max_r: Highest possible distance.
+    :param max_pairs: Maximum number of site pairs held at once.
+
+    :return ndarray: Number of pairs for each distance.
+    """
+
+    N, M = config.shape
+    count = np.zeros(max_r + 1, dtype=np.float64)
+
+    # Sort the sites by cluster, each cluster is then a contiguous segment
+    x, y = np.nonzero(mask)
+    order = np.argsort(config[x, y], kind='stable')
+    x, y = x[order], y[order]
+    sizes = np.bincount(config[x, y])
+    sizes = sizes[sizes > 0]
+    # Size and start of the segment of the cluster of each site
+    size = np.repeat(sizes, sizes)
+    segment = np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    # Go through the sites in chunks such that their pairs fit into memory
+    pairs = np.cumsum(size)
+    start = 0
+    while start < len(x):
+        stop = max(np.searchsorted(pairs, pairs[start] - size[start] +
+                                   max_pairs, side='right'), start + 1)
+
+        # Pair every site with every site of its cluster
+        i = np.repeat(np.arange(start, stop), size[start:stop])
+        j = (np.arange(len(i)) - np.repeat(np.cumsum(size[start:stop]) -
+                                           size[start:stop], size[start:stop])
+             + segment[i])
+
+        dx = np.abs(x[i] - x[j])
+        dy = np.abs(y[i] - y[j])
+        r = np.minimum(dx, N - dx) + np.minimum(dy, M - dy)
+        count += np.bincount(r, minlength=max_r + 1)
+
+        start = stop
+
+    return count
@@ -0,0 +1,243 @@
+# Third Party Imports
+import numpy as np
+from scipy.stats import binom
+
+# Own Imports
+from ..library.generator import default_generator
+
+
+class NewmanZiff:
+
+    def __init__(self, grid):
+        """
+        This class encapsulates the Newman-Ziff algorithm. Sites are occupied
+        one by one in random order and the clusters are updated incrementally
+        via a weighted union-find. After every added site the observables are
+        recorded, which yields them for every number of occupied sites n from
+        a single realization (microcanonical). Convolving them with the
+        binomial distribution gives the usual (canonical) curves for any p.
+
+        :param grid: Grid the sites are added to. Has to be a subclass of
+                     ..library.grid. Only its shape (and thereby its periodic
+                     boundary conditions) is used.
+        """
+
+        self.grid = grid
+
+        index = np.arange(grid.size).reshape(grid.shape)
+        # Neighbours of each site (top, left, bottom, right) together with
+        # the displacement (row, column) from the site to the neighbour
+        self.neighbours = [(np.roll(index, 1, axis=0).ravel().tolist(), -1, 0),
+                           (np.roll(index, 1, axis=1).ravel().tolist(), 0, -1),
+                           (np.roll(index, -1, axis=0).ravel().tolist(), 1, 0),
+                           (np.roll(index, -1, axis=1).ravel().tolist(), 0, 1)]
+
+    def setup(self):
+        """
+        Sets the class up for a run, i.e. empties the lattice.
+
+        :return None:
+        """
+
+        size = self.grid.size
+        # Parent of each site, -1 if the site is not occupied. A root is its
+        # own parent
+        self.parent = [-1] * size
+        # Size of the cluster for each root site
+        self.sizes = [0] * size
+        # Displacement (row, column) from each site to its parent in the
+        # unwrapped lattice. Used to detect clusters wrapping the torus
+        self.dx = [0] * size
+        self.dy = [0] * size
+
+        # Observables as a function of the number of occupied sites n (index)
+        self.largest = np.zeros(size + 1, dtype=np.int_)
+        self.sum_squares = np.zeros(size + 1, dtype=np.int_)
+        self.num_clusters = np.zeros(size + 1, dtype=np.int_)
+        self.wrapping = np.zeros(size + 1, dtype=np.uint8)
+
+    def run(self, generator=None):
+        """
+        Adds all sites in random order and records the observables after each
+        addition.
+
+        :param generator: ..library.generator.ConfigGenerator to draw the order
+                          of the sites from. If None the default generator of
+                          the process is used.
+
+        :return None:
+        """
+
+        if generator is None:
+            generator = default_generator()
+
+        parent, sizes = self.parent, self.sizes
+        dx, dy = self.dx, self.dy
+        largest = sum_squares = num_clusters = wrapping = 0
+        # Local lists are considerably faster to write to in this loop
+        out_largest = [0]
+        out_sum_squares = [0]
+        out_num_clusters = [0]
+        out_wrapping = [0]
+
+        for i in generator.rng.permutation(self.grid.size).tolist():
+            # Occupy site i as a new cluster of size 1
+            parent[i] = i
+            sizes[i] = 1
+            largest = max(largest, 1)
+            sum_squares += 1
+            num_clusters += 1
+
+            for neighbours, ddx, ddy in self.neighbours:
+                j = neighbours[i]
+                if parent[j] < 0:
+                    # ==> neighbour not occupied --> nothing to merge
+                    continue
+
+                r_i, ox_i, oy_i = self.find(i)
+                r_j, ox_j, oy_j = self.find(j)
+                # Displacement between the two roots implied by this bond
+                wx = ox_i + ddx - ox_j
+                wy = oy_i + ddy - oy_j
+
+                if r_i == r_j:
+                    # ==> already the same cluster. If the bond implies a
+                    # non zero displacement of the root to itself the cluster
+                    # wraps around the torus
+                    wrapping |= (1 if wx else 0) | (2 if wy else 0)
+                    continue
+
+                # Weighted union: attach the smaller cluster to the larger
+                if sizes[r_i] < sizes[r_j]:
+                    r_i, r_j, wx, wy = r_j, r_i, -wx, -wy
+
+                parent[r_j] = r_i
+                dx[r_j], dy[r_j] = wx, wy
+                sum_squares += 2 * sizes[r_i] * sizes[r_j]
+                sizes[r_i] += sizes[r_j]
+                largest = max(largest, sizes[r_i])
+                num_clusters -= 1
+
+            out_largest.append(largest)
+            out_sum_squares.append(sum_squares)
+            out_num_clusters.append(num_clusters)
+            out_wrapping.append(wrapping)
+
+        self.largest[:] = out_largest
+        self.sum_squares[:] = out_sum_squares
+        self.num_clusters[:] = out_num_clusters
+        self.wrapping[:] = out_wrapping
+
+    def find(self, i):
+        """
+        Finds the root of the cluster site i is part of and its displacement
+        to it. Compresses the path.
+
+        :param i: Flattened index of the site.
+
+        :return int, int, int: The root and the displacement (row, column)
+                               from the root to site i.
+        """
+
+        parent, dx, dy = self.parent, self.dx, self.dy
+
+        path = []
+        while parent[i] != i:
+            path.append(i)
+            i = parent[i]
+
+        # Going backwards from the root accumulate the displacements and point
+        # every site of the path directly to the root
+        ox = oy = 0
+        for k in reversed(path):
+            ox += dx[k]
+            oy += dy[k]
+            dx[k], dy[k] = ox, oy
+            parent[k] = i
+
+        return i, ox, oy
+
+    def get_susceptibility(self, ps):
+        """
+        Returns the susceptibility (see ..model.measurment.get_susceptibility)
+        for each probability.
+
+        :param ps: List of probabilities.
+
+        :return ndarray: Susceptibility for each probability.
+        """
+
+        n = np.arange(self.grid.size + 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            S = ((self.sum_squares - self.largest**2) /
+                 (n - self.largest)).astype(np.float64)
+        # There is no finite cluster if there are less than two clusters
+        S[self.num_clusters <= 1] = np.nan
+
+        return canonical(S, ps)
+
+    def get_p_inf(self, ps):
+        """
+        Returns the probability for a lattice site to be part of the infinite
+        cluster for each probability.
+
+        :param ps: List of probabilities.
+
+        :return ndarray: P_inf for each probability.
+        """
+
+        return canonical(self.largest / self.grid.size, ps)
+
+    def get_wrapping(self, ps, kind='either'):
+        """
+        Returns the probability that a cluster wraps around the lattice for
+        each probability.
+
+        :param ps: List of probabilities.
+        :param kind: 'x' (top to bottom, i.e. in row direction), 'y' (left to
+                     right, i.e. in column direction), 'either' or 'both'.
+
+        :return ndarray: Wrapping probability for each probability.
+        """
+
+        x = (self.wrapping & 1) != 0
+        y = (self.wrapping & 2) != 0
+        R = {'x': x, 'y': y, 'either': x | y, 'both': x & y}[kind]
+
+        return canonical(R.astype(np.float64), ps)
+
+
+def canonical(Q, ps):
+    """
+    Convolves a microcanonical observable with the binomial distribution to
+    get the canonical observable:
+        Q(p) = sum_n B(N, n, p) Q_n
+
+    :param Q: Observable for each number of occupied sites n = 0, ..., N. Nan
+              entries (undefined observable) are left out and the remaining
+              weights renormalized.
+    :param ps: List of probabilities.
+
+    :return ndarray: Canonical observable for each probability.
+    """
+
+    Q = np.asarray(Q, dtype=np.float64)
+    N = len(Q) - 1
+    defined = ~np.isnan(Q)
+    Q = np.where(defined, Q, 0)
+
+    out = []
+    for p in ps:
+        # The binomial weights are negligible further than a few standard
+        # deviations from the mean --> only sum over this window
+        mean, std = N * p, np.sqrt(N * p * (1 - p))
+        start = int(max(0, np.floor(mean - 12 * std - 1)))
+        stop = int(min(N, np.ceil(mean + 12 * std + 1))) + 1
+        window = slice(start, stop)
+
+        weights = binom.pmf(np.arange(start, stop), N, p)
+        norm = np.sum(weights[defined[window]])
+        out.append(np.dot(weights, Q[window]) / norm
+                   if norm > 1e-12 else np.nan)
+
+    return np.array(out)
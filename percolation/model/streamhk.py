@@ -0,0 +1,223 @@
+# Third Party Imports
+import numpy as np
+
+# Own Imports
+from .fasthk import find_runs
+from ..library.unionfind import UnionFind
+from ..library.generator import default_generator
+
+
+class StreamingHoshenKopelman:
+
+    def __init__(self, shape, block=256):
+        """
+        This class encapsulates a streaming variant of the Hoshen-Kopelman
+        algorithm for lattices too large to be held in memory. The lattice is
+        generated and labelled block by block (of rows) and only the current
+        block, the last row of the previous block and the first row of the
+        lattice (for the periodic top/bottom merge) are kept. Clusters not
+        touching either of the two rows are finished right away and folded
+        into a histogram of the cluster sizes, so the memory needed is
+        O(columns) plus the number of live clusters (plus the largest size
+        for the histogram).
+
+        :param shape: Shape of the lattice as a list of two ints. First int is
+                      the number of rows, second number of columns. Periodic
+                      boundary conditions in each direction.
+        :param block: Number of rows generated and labelled at once.
+        """
+
+        self.shape = tuple(shape)
+        self.block = block
+
+    def run(self, p, generator=None):
+        """
+        Generates a random configuration with occupation probability p and
+        classifies all its lattice sites.
+
+        :param p: Probability for each site to be occupied (0 <= p <= 1).
+        :param generator: ..library.generator.ConfigGenerator to draw from. If
+                          None the default generator of the process is used.
+
+        :return ndarray, ndarray: The first array is the histogram of the
+                                  cluster sizes: entry s is the number of
+                                  clusters with size s. The second contains
+                                  the number of clusters with each of the
+                                  four wrapping flags (index): bit 1 is set
+                                  if the cluster wraps in row direction, bit
+                                  2 if it wraps in column direction.
+        """
+
+        if generator is None:
+            generator = default_generator()
+
+        N, M = self.shape
+        # Only the labels of a block are kept, so one buffer can be reused
+        rows = np.empty((min(self.block, N), M), dtype=np.bool_)
+        blocks = (generator.fill(rows[:min(self.block, N - start)], p)
+                  for start in range(0, N, self.block))
+
+        return self.label(blocks)
+
+    def label_grid(self, grid):
+        """
+        Classifies all lattice sites of an existing grid, fetching it block by
+        block of rows (e.g. from a memory mapped ..library.packedgrid).
+
+        :param grid: Grid to be classified. Has to be a subclass of
+                     ..library.grid and have the shape of this instance.
+
+        :return ndarray, ndarray: Histogram of the cluster sizes and number of
+                                  clusters per wrapping flags (see run).
+        """
+
+        N = self.shape[0]
+        blocks = (grid.rows(start, min(start + self.block, N))
+                  for start in range(0, N, self.block))
+
+        return self.label(blocks)
+
+    def label(self, blocks):
+        """
+        Classifies all lattice sites, block by block of rows.
+
+        :param blocks: Iterable of 2D boolean arrays with the occupation of
+                       consecutive blocks of rows covering the lattice.
+
+        :return ndarray, ndarray: Histogram of the cluster sizes and number of
+                                  clusters per wrapping flags (see run).
+        """
+
+        self.clusters = UnionFind(capacity=self.shape[1] + 1, offsets=True)
+        # Histogram of the sizes of the finished clusters (grows with the
+        # largest one) and number of finished clusters per wrapping flags
+        self.histogram = np.zeros(1, dtype=np.int_)
+        self.wrapping = np.zeros(4, dtype=np.int_)
+        # Labels of the first row of the lattice and of the last row of the
+        # previous block together with the displacement (row, column) of
+        # each site from its label
+        self.first = self.previous = None
+
+        for rows in blocks:
+            self.classify(rows, self.first is None)
+            self.collect(final=False)
+
+        # Periodic top/bottom merge
+        labels, offsets = self.previous
+        first_labels, first_offsets = self.first
+        both = (labels != 0) & (first_labels != 0)
+        self.clusters.union(labels[both], first_labels[both],
+                            offsets[both] + (1, 0) - first_offsets[both])
+        self.collect(final=True)
+
+        return self.histogram, self.wrapping
+
+    def classify(self, rows, is_first):
+        """
+        Labels a block of rows and merges it with the previous block.
+
+        :param rows: 2D boolean array with the occupation of the rows.
+        :param is_first: Whether the block contains the first row of the
+                         lattice.
+
+        :return None:
+        """
+
+        M = rows.shape[1]
+        run, starts = find_runs(rows)
+        first = self.clusters.add(np.bincount(run.ravel())[1:])
+        labels = np.where(rows, run + (first - 1), 0)
+
+        # Each run is represented by its first site. Displacement of every
+        # site to the first site of its run (always in the same row)
+        column = np.arange(M)
+        offsets = np.zeros(rows.shape + (2,), dtype=np.int_)
+        offsets[..., 1] = column - np.maximum.accumulate(
+            np.where(starts, column, 0), axis=1)
+
+        l_i, l_j, delta = [], [], []
+
+        # Vertical neighbours inside the block
+        both = rows[:-1] & rows[1:]
+        l_i.append(labels[:-1][both])
+        l_j.append(labels[1:][both])
+        delta.append(offsets[:-1][both] + (1, 0) - offsets[1:][both])
+
+        # Periodic right/left merge in every row
+        both = rows[:, -1] & rows[:, 0]
+        l_i.append(labels[:, -1][both])
+        l_j.append(labels[:, 0][both])
+        delta.append(offsets[:, -1][both] + (0, 1) - offsets[:, 0][both])
+
+        # Merge with the last row of the previous block
+        if self.previous is not None:
+            prev_labels, prev_offsets = self.previous
+            both = (prev_labels != 0) & rows[0]
+            l_i.append(prev_labels[both])
+            l_j.append(labels[0][both])
+            delta.append(prev_offsets[both] + (1, 0) - offsets[0][both])
+
+        self.clusters.union(np.concatenate(l_i), np.concatenate(l_j),
+                            np.concatenate(delta))
+
+        if is_first:
+            self.first = labels[0], offsets[0]
+        self.previous = labels[-1], offsets[-1]
+
+    def collect(self, final):
+        """
+        Folds the sizes and wrapping flags of all finished clusters into the
+        histogram and the wrapping counts and rebuilds the union-find table
+        with only the live clusters (i.e. the ones touching the first row or
+        the last row of the current block).
+
+        :param final: If True all clusters are finished.
+
+        :return None:
+        """
+
+        clusters = self.clusters
+        labels = np.arange(clusters.num)
+        roots, _ = clusters.locate(labels)
+
+        sizes = np.bincount(roots, weights=clusters.size[:clusters.num],
+                            minlength=clusters.num).astype(np.int_)
+        wrapping = np.zeros(clusters.num, dtype=np.uint8)
+        np.bitwise_or.at(wrapping, roots, clusters.wrapping[:clusters.num])
+
+        is_root = roots == labels
+        is_root[0] = False
+        live = np.zeros(clusters.num, dtype=np.bool_)
+        if not final:
+            for row_labels, _ in (self.first, self.previous):
+                live[roots[row_labels]] = True
+            live[0] = False
+
+        finished = is_root & ~live
+        counts = np.bincount(sizes[finished])
+        if len(counts) > len(self.histogram):
+            self.histogram = np.concatenate((self.histogram, np.zeros(
+                len(counts) - len(self.histogram), dtype=np.int_)))
+        self.histogram[:len(counts)] += counts
+        self.wrapping += np.bincount(wrapping[finished], minlength=4)
+
+        if final:
+            return
+
+        # New table with one label per live cluster (renumbered from 1)
+        live = np.flatnonzero(live)
+        self.clusters = UnionFind(capacity=len(live) + 1, offsets=True)
+        self.clusters.add(sizes[live])
+        self.clusters.wrapping[1:len(live) + 1] = wrapping[live]
+
+        lookup = np.zeros(clusters.num, dtype=np.int_)
+        lookup[live] = np.arange(1, len(live) + 1)
+
+        def relabel(row_labels, row_offsets):
+            # Point the sites directly to the new label of their root and
+            # make the displacement relative to the root
+            row_roots, root_offsets = clusters.locate(row_labels)
+            return lookup[row_roots], row_offsets + root_offsets
+
+        self.first = relabel(*self.first)
+        self.previous = relabel(*self.previous)
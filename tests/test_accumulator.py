@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.accumulator import Accumulator
+
+
+def moments(values):
+    # Central moments of each quantity with numpy, ignoring nan
+    count = np.sum(~np.isnan(values), axis=0)
+    mean = np.nanmean(values, axis=0)
+    m = [np.nansum((values - mean)**k, axis=0) for k in (2, 3, 4)]
+
+    return count, mean, m[0] / (count - 1), np.sqrt(count) * m[1] / \
+        m[0]**1.5, count * m[2] / m[0]**2 - 3
+
+
+class TestAccumulator(unittest.TestCase):
+
+    def test_against_numpy(self):
+        # ==> Batches of different sizes (including empty ones) give the
+        #     moments of all samples at once
+        rng = np.random.default_rng(0)
+        values = rng.gamma(2, 3, (500, 3, 4)) + 100
+        values[rng.random(values.shape) < 0.1] = np.nan
+
+        accumulator = Accumulator((3, 4))
+        bounds = [0, 1, 1, 7, 60, 61, 300, 500]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            accumulator.add(values[start:stop])
+
+        count, mean, variance, skewness, kurtosis = moments(values)
+        np.testing.assert_array_equal(accumulator.drawn, 500)
+        np.testing.assert_array_equal(accumulator.count, count)
+        np.testing.assert_allclose(accumulator.mean, mean, rtol=1e-12)
+        np.testing.assert_allclose(accumulator.get_variance(), variance,
+                                   rtol=1e-10)
+        np.testing.assert_allclose(accumulator.get_std_error(),
+                                   np.sqrt(variance / count), rtol=1e-10)
+        np.testing.assert_allclose(accumulator.get_skewness(), skewness,
+                                   rtol=1e-8)
+        np.testing.assert_allclose(accumulator.get_kurtosis(), kurtosis,
+                                   rtol=1e-8)
+
+    def test_index(self):
+        # ==> Samples of single quantities (e.g. one L and p) added apart
+        rng = np.random.default_rng(1)
+        values = rng.normal(size=(50, 2, 3))
+
+        accumulator = Accumulator((2, 3))
+        for i in range(2):
+            accumulator.add(values[:20, i], (i,))
+            for j in range(3):
+                accumulator.add(values[20:, i, j], (i, j))
+
+        count, mean, variance, _, _ = moments(values)
+        np.testing.assert_array_equal(accumulator.count, count)
+        np.testing.assert_allclose(accumulator.mean, mean, rtol=1e-12)
+        np.testing.assert_allclose(accumulator.get_variance(), variance,
+                                   rtol=1e-12)
+
+    def test_converged(self):
+        accumulator = Accumulator((3,))
+        values = np.array([[1, 0, np.nan], [1.1, 0, np.nan],
+                           [0.9, 0, 1.0]])
+        accumulator.add(values)
+
+        # ==> Error 0.058 of mean 1, constant 0 has no error and a single
+        #     valid sample is not trusted
+        np.testing.assert_array_equal(accumulator.converged(0.1),
+                                      [True, True, False])
+        np.testing.assert_array_equal(accumulator.converged(0.01),
+                                      [False, True, False])
+        np.testing.assert_array_equal(
+            accumulator.converged(0.1, min_count=1, min_fraction=0),
+            [True, True, False])
+
+    def test_to_dict(self):
+        accumulator = Accumulator((2,))
+        accumulator.add(np.array([[1.0, np.nan]]))
+        estimates = accumulator.to_dict()
+
+        self.assertEqual(estimates['drawn'], [1, 1])
+        self.assertEqual(estimates['count'], [1, 0])
+        self.assertEqual(estimates['mean'], [1.0, None])
+        self.assertEqual(estimates['variance'], [None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+from percolation.model import backends
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_conformance(self):
+        # ==> check_conformance covers label and label_batch of a backend
+        for name in backends.backends:
+            if name == backends.reference:
+                continue
+            with self.subTest(backend=name):
+                self.assertEqual(backends.check_conformance([name]), [])
+
+    def test_reference_batch(self):
+        self.assertEqual(
+            backends.check_conformance([backends.reference]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
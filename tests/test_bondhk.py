@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.bondgrid import BondGrid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.bondhk import label_bonds, label_bonds_batch
+
+
+def label_reference(grid):
+    # Depth first search along the open bonds (periodic), clusters numbered
+    # by their first site
+    N, M = grid.shape
+    labels = np.zeros(grid.shape, dtype=np.int_)
+    sizes = []
+    for x in range(N):
+        for y in range(M):
+            if labels[x, y]:
+                continue
+            sizes.append(0)
+            labels[x, y] = len(sizes)
+            queue = [(x, y)]
+            while queue:
+                i, j = queue.pop()
+                sizes[-1] += 1
+                neighbours = []
+                if grid.horizontal[i, j]:
+                    neighbours.append((i, (j + 1) % M))
+                if grid.horizontal[i, j - 1]:
+                    neighbours.append((i, (j - 1) % M))
+                if grid.vertical[i, j]:
+                    neighbours.append(((i + 1) % N, j))
+                if grid.vertical[i - 1, j]:
+                    neighbours.append(((i - 1) % N, j))
+                for site in neighbours:
+                    if not labels[site]:
+                        labels[site] = len(sizes)
+                        queue.append(site)
+
+    return labels, sizes
+
+
+class TestLabelBonds(unittest.TestCase):
+
+    def test_example(self):
+        # ==> A horizontal bond across the periodic columns and a vertical
+        #     one across the periodic rows
+        grid = BondGrid((3, 3))
+        grid.horizontal[0, 0] = grid.horizontal[1, 2] = True
+        grid.vertical[2, 0] = grid.vertical[1, 1] = True
+        labels, sizes = label_bonds(grid)
+
+        np.testing.assert_array_equal(labels, [[1, 1, 2],
+                                               [3, 4, 3],
+                                               [1, 4, 5]])
+        self.assertEqual(sizes, [3, 1, 2, 2, 1])
+
+    def test_random(self):
+        generator = ConfigGenerator(0)
+        for shape in ((1, 1), (2, 3), (8, 8), (7, 12)):
+            grid = BondGrid(shape)
+            for p in (0, 0.3, 0.5, 0.7, 1):
+                grids = []
+                for _ in range(3):
+                    grid.randomize(p, generator)
+                    labels, sizes = label_reference(grid)
+                    result = label_bonds(grid)
+                    np.testing.assert_array_equal(result[0], labels)
+                    self.assertEqual(result[1], sizes)
+                    grids.append((grid.bonds.copy(), sizes))
+
+                # ==> Labelling the samples at once gives the same sizes
+                result = label_bonds_batch([bonds for bonds, _ in grids])
+                self.assertEqual([sizes.tolist() for sizes in result],
+                                 [sizes for _, sizes in grids])
+
+    def test_closed_and_open(self):
+        grid = BondGrid((4, 5))
+        self.assertEqual(label_bonds(grid)[1], [1] * 20)
+        grid.bonds[:] = True
+        self.assertEqual(label_bonds(grid)[1], [20])
+        self.assertEqual(label_bonds_batch(np.zeros((0, 2, 4, 5))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from percolation.library.bootstraping import (bootstrap, bootstrap_mean,
+                                              mean, binder_cumulant)
+
+
+class TestBootstrap(unittest.TestCase):
+
+    def setUp(self):
+        self.samples = np.random.default_rng(0).gamma(2, 3, (2, 3, 200))
+
+    def test_weights(self):
+        # ==> Every replicate draws each series n times with replacement
+        def statistic(samples, weights):
+            counts = weights * samples.shape[-1]
+            np.testing.assert_allclose(counts, np.rint(counts), atol=1e-9)
+            np.testing.assert_allclose(weights.sum(axis=-1), 1)
+            return weights.sum(axis=-1)
+
+        result = bootstrap(self.samples, statistic, 50, 0)
+        self.assertEqual(result.shape, (50, 2, 3))
+
+    def test_chunks(self):
+        # ==> The replicates neither depend on the chunking nor on series
+        #     added after a series
+        expected = bootstrap(self.samples, num=100, seed=1)
+        result = bootstrap(self.samples, num=100, seed=1,
+                           max_memory=24 * 6 * 200 * 7)
+        np.testing.assert_array_equal(result, expected)
+
+        more = np.concatenate((self.samples.reshape(6, 200),
+                               self.samples[0]), axis=0)
+        result = bootstrap(more, num=100, seed=1)
+        np.testing.assert_array_equal(result[:, :6],
+                                      expected.reshape(100, 6))
+
+    def test_mean(self):
+        # ==> Spread of the replicates is the standard error of the mean
+        replicates = bootstrap(self.samples, num=2000, seed=2)
+        np.testing.assert_allclose(replicates.mean(axis=0),
+                                   self.samples.mean(axis=-1), rtol=0.01)
+        np.testing.assert_allclose(
+            replicates.std(axis=0),
+            self.samples.std(axis=-1) / np.sqrt(200), rtol=0.1)
+
+    def test_weighted_mean(self):
+        samples = np.array([1, 2, np.nan, 4])
+        weights = np.array([0.5, 0, 0.25, 0.25])
+        self.assertEqual(mean(samples, weights), (0.5 + 1) / 0.75)
+        self.assertTrue(np.isnan(mean(samples, weights, skipna=False)))
+        # ==> A nan sample that is never drawn does not matter
+        weights = np.array([0.5, 0.25, 0, 0.25])
+        self.assertEqual(mean(samples, weights, skipna=False), 2)
+
+    def test_binder_cumulant(self):
+        samples = np.array([1.0, -1.0, 1.0, -1.0])
+        self.assertAlmostEqual(binder_cumulant(samples, np.full(4, 0.25)),
+                               2 / 3)
+
+    def test_bootstrap_mean(self):
+        sample = self.samples[0, 0]
+        average, lower, higher, std = bootstrap_mean(sample, 1000, 3)
+        self.assertAlmostEqual(average, sample.mean(), delta=3 * std)
+        self.assertLess(lower, sample.mean())
+        self.assertGreater(higher, sample.mean())
+
+        # ==> A replicate drawing a nan sample is nan
+        sample = np.append(sample, np.nan)
+        self.assertTrue(np.isnan(bootstrap_mean(sample, 100, 3)[0]))
+
+    def test_memory_warning(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            result = bootstrap(self.samples, num=3, seed=4, max_memory=100)
+        self.assertEqual(result.shape, (3, 2, 3))
+        self.assertTrue(any(issubclass(warning.category, RuntimeWarning)
+                            for warning in caught))
+
+
+if __name__ == '__main__':
+    unittest.main()
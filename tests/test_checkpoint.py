@@ -0,0 +1,69 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from percolation.data_collection.scheduler import Unit
+from percolation.data_collection.checkpoint import Checkpoint
+
+PARAMS = {'method': 'hk', 'Ls': [16, 32], 'ps': [0.5, 0.6], 'seed': 7}
+
+
+def get_unit(i, j, start, stop):
+    return Unit(i=i, j=j, L=PARAMS['Ls'][i], p=PARAMS['ps'][j], start=start,
+                stop=stop, seed={'entropy': 7, 'spawn_key': [i, j]})
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_crash(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            checkpoint = Checkpoint(path)
+            params, chunks = checkpoint.start(PARAMS, lambda: {16: 5, 32: 2})
+            units = [get_unit(0, 0, 0, 5), get_unit(1, 1, 0, 2)]
+            for k, unit in enumerate(units):
+                checkpoint.add(unit, np.full(unit.stop - unit.start, k))
+
+            # ==> Crash while writing the next journal line
+            with open(path / 'journal.jsonl', 'a') as file:
+                file.write('{"unit": {"i": 1, "j"')
+
+            checkpoint = Checkpoint(path)
+            resumed = checkpoint.start(dict(PARAMS, seed=None), None)
+            loaded = list(checkpoint.load())
+
+        self.assertEqual(resumed, (PARAMS, {16: 5, 32: 2}))
+        self.assertEqual([Checkpoint.key(unit) for unit, _ in loaded],
+                         [Checkpoint.key(unit) for unit in units])
+        for k, (_, values) in enumerate(loaded):
+            np.testing.assert_array_equal(values, k)
+
+    def test_prune(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            checkpoint = Checkpoint(path)
+            checkpoint.start(PARAMS, lambda: {16: 5, 32: 2})
+            units = [get_unit(0, 0, 0, 5), get_unit(0, 0, 5, 8)]
+            for unit in units:
+                checkpoint.add(unit, np.zeros(unit.stop - unit.start))
+
+            checkpoint.prune({Checkpoint.key(units[0])})
+            done = Checkpoint(path).done()
+            shards = sorted(file.name for file in
+                            (path / 'shards').iterdir())
+
+        self.assertEqual(done, {Checkpoint.key(units[0])})
+        self.assertEqual(shards, ['L16_p0_0-5.npy'])
+
+    def test_mismatch(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            Checkpoint(path).start(PARAMS, lambda: {16: 5, 32: 2})
+            with self.assertRaises(ValueError):
+                Checkpoint(path).start(dict(PARAMS, method='nz'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from percolation.model.clusterstats import ClusterStatistics
+
+
+def get_susceptibility(clusters):
+    # Definition: mean size of a finite cluster (all but one largest)
+    clusters = sorted(clusters)[:-1]
+    if not clusters:
+        return np.nan
+
+    return sum(s**2 for s in clusters) / sum(clusters)
+
+
+class TestClusterStatistics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.samples = [rng.integers(1, 30, rng.integers(0, 12)).tolist()
+                        for _ in range(20)] + [[7], [], [5, 5]]
+
+    def test_single_and_many(self):
+        stats = ClusterStatistics(self.samples, (10, 10))
+        for k, sample in enumerate(self.samples):
+            single = ClusterStatistics(sample, (10, 10))
+            np.testing.assert_equal(single.get_susceptibility(),
+                                    stats.get_susceptibility()[k])
+            self.assertEqual(single.get_p_inf(), stats.get_p_inf()[k])
+
+    def test_against_definition(self):
+        stats = ClusterStatistics(self.samples, (10, 10))
+        expected = [get_susceptibility(sample) for sample in self.samples]
+        np.testing.assert_allclose(stats.get_susceptibility(), expected,
+                                   rtol=1e-12)
+        np.testing.assert_array_equal(
+            stats.get_p_inf(),
+            [max(sample, default=0) / 100 for sample in self.samples])
+
+    def test_moments(self):
+        # ==> Against numpy, with and without the largest cluster
+        stats = ClusterStatistics(self.samples)
+        for k in (0, 1, 2, 3, 4):
+            expected = [np.sum(np.array(sample, dtype=np.float64)**k)
+                        for sample in self.samples]
+            np.testing.assert_allclose(stats.get_moment(k, finite=False),
+                                       expected, rtol=1e-12)
+            expected = [np.sum(np.sort(sample)[:-1].astype(np.float64)**k)
+                        for sample in self.samples]
+            np.testing.assert_allclose(stats.get_moment(k), expected,
+                                       rtol=1e-12)
+            # ==> Floats for every order, integers would overflow
+            self.assertEqual(stats.get_moment(k).dtype, np.float64)
+
+    def test_n_s(self):
+        stats = ClusterStatistics([[1, 1, 3], [2, 3]], (2, 5))
+        np.testing.assert_allclose(stats.get_n_s(), [0, 0.1, 0.05, 0.1])
+        np.testing.assert_allclose(stats.get_n_s(finite=True),
+                                   [0, 0.1, 0.05, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
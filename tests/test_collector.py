@@ -0,0 +1,81 @@
+import json
+import unittest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from percolation.library.store import ResultStore
+from percolation.data_collection.susceptibility import SusceptDataCollector
+
+INPUT = """[main]
+num_processors = {processors}
+lattice-sizes = 16,32
+probabilities = 0.5,0.7,3
+num_iterations = 200
+method = {method}
+seed = 7
+"""
+
+
+class TestCollector(unittest.TestCase):
+
+    def run_collector(self, path, method, processors):
+        path = Path(path)
+        (path / 'input.ini').write_text(
+            INPUT.format(method=method, processors=processors))
+        SusceptDataCollector(path).run()
+
+        return [np.array(ResultStore(path / name).data)
+                for name in ('results.bin', 'p_inf.bin')]
+
+    def test_replay(self):
+        # ==> Different numbers of processors give different units of work,
+        #     the samples have to be the same anyway
+        for method in ('hk', 'nz'):
+            with tempfile.TemporaryDirectory() as first, \
+                    tempfile.TemporaryDirectory() as second:
+                expected = self.run_collector(first, method, 1)
+                result = self.run_collector(second, method, 2)
+            for a, b in zip(expected, result):
+                np.testing.assert_array_equal(a, b)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as first, \
+                tempfile.TemporaryDirectory() as second:
+            expected = self.run_collector(first, 'hk', 2)
+            self.run_collector(second, 'hk', 2)
+
+            # ==> Simulate a crash: only the first units made it into the
+            #     journal, the last line is cut off and the results are lost
+            path = Path(second)
+            lines = (path / 'journal.jsonl').read_text().splitlines()
+            kept = len(lines) // 2
+            (path / 'journal.jsonl').write_text(
+                '\n'.join(lines[:kept]) + '\n' + lines[kept][:20])
+            for name in ('results.bin', 'p_inf.bin'):
+                (path / name).unlink()
+
+            result = self.run_collector(second, 'hk', 2)
+            # ==> The kept units were compacted into the manifest, only the
+            #     others were simulated again
+            manifest = json.loads((path / 'manifest.json').read_text())
+            journal = (path / 'journal.jsonl').read_text().splitlines()
+
+        for a, b in zip(expected, result):
+            np.testing.assert_array_equal(a, b)
+        self.assertEqual(len(manifest['done']), kept)
+        self.assertEqual(len(journal), len(lines) - kept)
+
+    def test_honeycomb_sizes(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            (path / 'input.ini').write_text(
+                INPUT.format(method='hk', processors=1).replace(
+                    '16,32', '16,33') + 'lattice = honeycomb\n')
+            with self.assertRaises(ValueError):
+                SusceptDataCollector(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.fasthk import FastHoshenKopelman
+from percolation.model.measurment import (get_connectivity,
+                                          get_connectivity_fft)
+
+
+def label(config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+    hk = FastHoshenKopelman(grid)
+    hk.setup()
+    labels, sizes = hk.run()
+
+    return labels, int(np.argmax(sizes)) + 1 if len(sizes) else 0
+
+
+class TestConnectivity(unittest.TestCase):
+
+    def test_against_loop(self):
+        generator = ConfigGenerator(0)
+        for shape in ((6, 6), (16, 16), (9, 14)):
+            for p in (0.3, 0.592746, 0.8):
+                labels, largest = label(generator.sample(p, shape))
+                expected = get_connectivity(labels, largest)
+                # ==> Small max_pairs split the counting into many chunks
+                for max_pairs in (2**22, 64):
+                    np.testing.assert_allclose(
+                        get_connectivity_fft(labels, largest, max_pairs),
+                        expected, rtol=1e-12, atol=0)
+
+    def test_single_cluster(self):
+        # ==> A full lattice is one (infinite) cluster, no origins are left
+        labels = np.ones((8, 8), dtype=np.int_)
+        np.testing.assert_array_equal(get_connectivity_fft(labels, 1),
+                                      get_connectivity(labels, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
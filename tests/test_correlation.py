@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+from percolation.model.correlation import (extract_correlation_length,
+                                           fit_correlation_lengths)
+
+
+def get_curves(corr, A, length=20):
+    r = np.arange(1, length + 1)
+
+    return A[..., None] * np.exp(-r / corr[..., None])
+
+
+class TestFitCorrelationLengths(unittest.TestCase):
+
+    def test_exact(self):
+        # ==> Noise free curves of any shape, already the log-linear fit
+        #     is exact
+        corr = np.array([[0.5, 2, 7.5], [3, 10, 1]])
+        A = np.array([[1, 0.2, 3], [0.7, 1, 0.05]])
+        g = get_curves(corr, A)
+        for iterations in (0, 10):
+            result = fit_correlation_lengths(g, iterations=iterations)
+            np.testing.assert_allclose(result[0], corr, rtol=1e-8)
+            np.testing.assert_allclose(result[1], A, rtol=1e-8)
+
+    def test_lmfit(self):
+        # ==> Noisy curves (including non positive values) give the least
+        #     squares fit of extract_correlation_length
+        rng = np.random.default_rng(0)
+        corr = rng.uniform(1, 8, 10)
+        A = rng.uniform(0.2, 1, 10)
+        g = get_curves(corr, A) + rng.normal(0, 0.01, (10, 20))
+
+        result = fit_correlation_lengths(g, iterations=20)
+        for k in range(10):
+            params = extract_correlation_length(g[k]).params
+            self.assertAlmostEqual(result[0][k], params['corr'].value,
+                                   delta=1e-4 * params['corr'].value)
+            self.assertAlmostEqual(result[1][k], params['A'].value,
+                                   delta=1e-4 * params['A'].value)
+
+    def test_invalid(self):
+        g = get_curves(np.array([2.0, 2.0, 2.0, 2.0]),
+                       np.array([1.0, 1.0, 1.0, 1.0]), 10)
+        # ==> Nan values are ignored, a single usable value and growing or
+        #     constant curves have no correlation length
+        g[0, [2, 5]] = np.nan
+        g[1, 1:] = np.nan
+        g[2] = g[2, ::-1]
+        g[3] = 0.5
+        corr, A = fit_correlation_lengths(g)
+
+        self.assertAlmostEqual(corr[0], 2)
+        self.assertAlmostEqual(A[0], 1)
+        self.assertTrue(np.all(np.isnan(corr[1:])))
+        self.assertTrue(np.all(np.isnan(A[1:])))
+
+
+if __name__ == '__main__':
+    unittest.main()
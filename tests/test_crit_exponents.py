@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from percolation.library.store import ResultStore
+from percolation.data_processing.crit_exponents import (
+    CritExponentEstimator, fit)
+
+INPUT = """[main]
+num_processors = 1
+lattice-sizes = 16,32,64
+probabilities = 0.55,0.65,11
+num_iterations = 4
+"""
+
+
+def write_store(path):
+    (path / 'input.ini').write_text(INPUT)
+
+    return ResultStore(path / 'results.bin',
+                       {'Ls': [16, 32, 64],
+                        'ps': np.linspace(0.55, 0.65, 11), 'num': 4})
+
+
+class TestCritExponentEstimator(unittest.TestCase):
+
+    def test_skip_undrawn(self):
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            store = write_store(path)
+            # ==> Sample 2 is never drawn, sample 3 only partly
+            for k in (0, 1, 3):
+                store.data[..., k] = rng.gamma(2, 5, (3, 11))
+            store.data[0, :, 3] = np.nan
+            store.flush()
+
+            estimator = CritExponentEstimator(path)
+            result = estimator.estimate(block=3)
+            expected = [fit(np.asarray(estimator.S[k]), estimator.args['Ls'],
+                            estimator.args['ps'],
+                            init=estimator.args['init'])[0]
+                        for k in (0, 1, 3)]
+            del estimator, store
+
+        np.testing.assert_array_equal(result, expected)
+
+    def test_jackknife(self):
+        rng = np.random.default_rng(1)
+        Ls = np.array([16, 32, 64])
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            store = write_store(path)
+            store.data[:] = rng.gamma(20, 1, (3, 11, 4)) * \
+                Ls[:, None, None]**(43 / 48)
+            store.data[2, 5, 1] = np.nan
+            store.flush()
+
+            estimator = CritExponentEstimator(path)
+            result = estimator.estimate_resampled('jackknife', block=1,
+                                                  vary_exponents=False)
+            S = np.moveaxis(np.array(store.data), 2, 0)
+            init = estimator.args['init']
+            del estimator, store
+
+        # ==> Fits to the mean over all samples and leaving out one each
+        ps = np.linspace(0.55, 0.65, 11)
+        pooled = fit(np.nanmean(S, axis=0), Ls, ps, init=init)
+        params = np.array([fit(np.nanmean(np.delete(S, k, axis=0), axis=0),
+                               Ls, ps,
+                               init=dict(zip(('pc', 'gamma', 'nu'), pooled)))
+                           for k in range(4)])
+        error = np.sqrt(3 / 4 * np.sum((params - params.mean(axis=0))**2,
+                                       axis=0))
+
+        pc, lower, upper, std = result['pc']
+        self.assertAlmostEqual(pc, pooled[0], places=8)
+        self.assertAlmostEqual(std, error[0], places=8)
+        self.assertGreater(std, 0)
+        self.assertAlmostEqual(upper - pc, 1.959964 * std, places=6)
+        self.assertAlmostEqual(pc - lower, 1.959964 * std, places=6)
+        # ==> Fixed exponents have no error
+        self.assertEqual(result['nu'][3], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.hk import HoshenKopelman
+from percolation.model.fasthk import FastHoshenKopelman
+
+
+def label(engine, config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+    hk = engine(grid, unwrap=True)
+    hk.setup()
+    labels, sizes = hk.run()
+
+    return labels, list(sizes), [int(flags) for flags in hk.wrapping]
+
+
+class TestFastHoshenKopelman(unittest.TestCase):
+
+    def assert_same(self, config):
+        expected = label(HoshenKopelman, config)
+        result = label(FastHoshenKopelman, config)
+
+        np.testing.assert_array_equal(result[0], expected[0])
+        self.assertEqual(result[1], expected[1])
+        self.assertEqual(result[2], expected[2])
+
+    def test_random(self):
+        generator = ConfigGenerator(0)
+        for shape in ((2, 2), (7, 7), (16, 16), (9, 20)):
+            for p in (0.3, 0.592746, 0.8):
+                for config in generator.sample(p, shape, 3):
+                    self.assert_same(config)
+
+    def test_empty_and_full(self):
+        for shape in ((1, 1), (5, 5), (4, 9)):
+            self.assert_same(np.zeros(shape, dtype=np.bool_))
+            self.assert_same(np.ones(shape, dtype=np.bool_))
+
+    def test_single_row_and_column(self):
+        generator = ConfigGenerator(1)
+        for shape in ((1, 1), (1, 12), (12, 1)):
+            for p in (0.3, 0.7, 1):
+                for config in generator.sample(p, shape, 3):
+                    self.assert_same(config)
+
+    def test_block_boundary(self):
+        # ==> More rows than FastHoshenKopelman.block fetches at once
+        generator = ConfigGenerator(2)
+        N = FastHoshenKopelman.block + 44
+        for shape in ((N, 3), (N, 6)):
+            for p in (0.5, 0.75):
+                for config in generator.sample(p, shape, 2):
+                    self.assert_same(config)
+        self.assert_same(np.ones((N, 2), dtype=np.bool_))
+
+
+if __name__ == '__main__':
+    unittest.main()
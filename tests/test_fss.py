@@ -0,0 +1,113 @@
+import unittest
+
+import numpy as np
+from lmfit import minimize, Parameters
+
+from percolation.model.fss import fss, residual, Residual, refine_ps
+
+
+def get_params(pc=0.5927, gamma=43 / 18, nu=4 / 3):
+    params = Parameters()
+    params.add('pc', value=pc)
+    params.add('gamma', value=gamma)
+    params.add('nu', value=nu)
+
+    return params
+
+
+def get_data(num_L, num_p, seed=0):
+    rng = np.random.default_rng(seed)
+    Ls = 16 * 2**np.arange(num_L)
+    ps = np.linspace(0.55, 0.65, num_p)
+    S = rng.gamma(2, 5, (num_L, num_p)) * Ls[:, None]**(43 / 32)
+
+    return S, Ls, ps
+
+
+class TestResidual(unittest.TestCase):
+
+    def assert_same(self, S, Ls, ps, params):
+        prepared = Residual(S, Ls, ps)
+        for values in params:
+            expected = residual(get_params(*values), S, Ls, ps)
+            result = prepared(get_params(*values))
+            np.testing.assert_array_equal(result, expected)
+
+    def test_reference(self):
+        # ==> Several pc for each pair of exponents (as in a fit) and the
+        #     system sizes as numpy and as Python integers
+        params = [(pc, gamma, nu) for gamma, nu in ((43 / 18, 4 / 3),
+                                                    (2.2, 1.2))
+                  for pc in (0.5927, 0.57, 0.61, 0.64)]
+        for num_L, num_p in ((2, 10), (4, 30), (6, 40), (8, 50), (20, 100)):
+            S, Ls, ps = get_data(num_L, num_p, num_L)
+            self.assert_same(S, Ls, ps, params)
+            self.assert_same(S, Ls.tolist(), ps, params)
+
+    def test_missing_and_unsorted(self):
+        S, Ls, ps = get_data(6, 40)
+        S[0, :5] = np.nan
+        S[3, 20:] = np.nan
+        params = [(0.5927,), (0.6,), (0.58, 2.2, 1.2)]
+        self.assert_same(S, Ls, ps, params)
+
+        order = np.random.default_rng(1).permutation(len(ps))
+        self.assert_same(S[:, order], Ls, ps[order], params)
+
+    def test_overflow(self):
+        # ==> The scaled ps overflow, the ones at pc become nan
+        S, Ls, ps = get_data(4, 30)
+        with np.errstate(over='ignore', invalid='ignore'):
+            self.assert_same(S, Ls, ps, [(ps[7], 43 / 18, 1e-3)])
+
+    def test_fit(self):
+        S, Ls, ps = get_data(4, 30)
+        params = get_params()
+        params['gamma'].vary = params['nu'].vary = False
+        expected = minimize(residual, params, args=(S, Ls, ps))
+        result = fss(S, Ls, ps)
+
+        self.assertEqual(result.params['pc'].value,
+                         expected.params['pc'].value)
+        self.assertEqual(result.nfev, expected.nfev)
+
+
+class TestRefinePs(unittest.TestCase):
+
+    def setUp(self):
+        # ==> Perfect data collapse around pc = 0.6
+        self.Ls = np.array([16, 32, 64, 128])
+        self.ps = np.linspace(0.5, 0.7, 21)
+        x = (self.ps - 0.6) * self.Ls[:, None]**(3 / 4)
+        self.S = self.Ls[:, None]**(43 / 24) * np.exp(-x**2)
+
+    def test_candidates(self):
+        pc, ps = refine_ps(self.S, self.Ls, self.ps, 5, width=0.5)
+        midpoints = (self.ps[1:] + self.ps[:-1]) / 2
+
+        self.assertAlmostEqual(pc, 0.6, places=6)
+        self.assertEqual(len(ps), 5)
+        self.assertTrue(np.all(np.diff(ps) > 0))
+        self.assertTrue(np.all(np.isin(ps, midpoints)))
+        # ==> Inside the (widest) scaling window of the smallest L
+        self.assertTrue(np.all(np.abs(ps - pc) < 0.5 * 16**(-3 / 4)))
+
+    def test_crossing(self):
+        # ==> The scaled curves of two L cross between 0.61 and 0.62 only
+        Ls = np.array([16, 32])
+        ps = np.linspace(0.55, 0.65, 11)
+        y = np.array([np.ones(11), 1 + 0.01 * (ps - 0.613)])
+        S = np.exp(y) * Ls[:, None]**(43 / 24)
+
+        _, new = refine_ps(S, Ls, ps, 1)
+        np.testing.assert_allclose(new, [0.615])
+
+    def test_invalid(self):
+        # ==> Missing and non positive susceptibilities are left out
+        S = self.S.copy()
+        S[0, 3], S[1, 4], S[2, 5] = np.nan, 0, -1
+        pc, ps = refine_ps(S, self.Ls, self.ps, 5)
+
+        self.assertAlmostEqual(pc, 0.6, places=3)
+        self.assertEqual(len(ps), 5)
+        self.assertTrue(np.all(np.isfinite(ps)))
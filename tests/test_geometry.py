@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.geometry import get_geometry, get_correlation_length
+
+
+def get_grid(config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+
+    return grid
+
+
+def get_features(geometry):
+    """
+    Returns the size, squared radius of gyration, extent of the bounding box
+    and perimeter of every cluster not wrapping around the lattice, sorted.
+    """
+
+    box = geometry['bounding_box']
+    extent = box[:, 2:] - box[:, :2]
+    features = [(int(s), round(float(rg2), 9), int(a), int(b), int(perimeter))
+                for s, rg2, (a, b), perimeter, flags in zip(
+                    geometry['sizes'], geometry['rg2'], extent,
+                    geometry['perimeter'], geometry['wrapping'])
+                if not flags]
+
+    return sorted(features)
+
+
+class TestGeometry(unittest.TestCase):
+
+    def test_across_boundary(self):
+        # ==> A bar of three sites across the periodic boundary and a single
+        #     site
+        config = np.zeros((5, 5), dtype=np.bool_)
+        config[2, [4, 0, 1]] = True
+        config[0, 2] = True
+        geometry = get_geometry(get_grid(config))
+
+        np.testing.assert_array_equal(geometry['sizes'], [1, 3])
+        np.testing.assert_allclose(geometry['rg2'], [0, 2 / 3])
+        np.testing.assert_array_equal(geometry['bounding_box'],
+                                      [[0, 2, 0, 2], [2, -1, 2, 1]])
+        np.testing.assert_array_equal(geometry['perimeter'], [4, 8])
+        self.assertEqual(geometry['xi2'], 0)
+
+    def test_translation(self):
+        # ==> Shifting the lattice periodically does not change the clusters
+        generator = ConfigGenerator(0)
+        for shape in ((16, 16), (9, 20)):
+            for p in (0.3, 0.55):
+                config = generator.sample(p, shape)
+                expected = get_features(get_geometry(get_grid(config)))
+                for shift in ((3, 0), (0, 5), (7, 11)):
+                    shifted = np.roll(config, shift, axis=(0, 1))
+                    result = get_features(get_geometry(get_grid(shifted)))
+                    self.assertEqual(result, expected)
+
+    def test_perimeter(self):
+        config = ConfigGenerator(1).sample(0.5, (12, 7))
+        geometry = get_geometry(get_grid(config))
+        labels = geometry['labels']
+
+        N, M = labels.shape
+        expected = np.zeros(labels.max(), dtype=np.int_)
+        for x in range(N):
+            for y in range(M):
+                if not labels[x, y]:
+                    continue
+                for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                    if not labels[(x + dx) % N, (y + dy) % M]:
+                        expected[labels[x, y] - 1] += 1
+
+        np.testing.assert_array_equal(geometry['perimeter'], expected)
+
+    def test_correlation_length(self):
+        # ==> The largest cluster is left out
+        self.assertAlmostEqual(get_correlation_length(
+            np.array([1, 5, 2]), np.array([0, 1, 0.25])), 2 * 0.25 * 4 / 5)
+        self.assertTrue(np.isnan(get_correlation_length(np.array([4]),
+                                                        np.array([1.0]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
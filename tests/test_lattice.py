@@ -0,0 +1,120 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.lattice import Lattice, get_lattice, kinds
+from percolation.model.hk import HoshenKopelman
+from percolation.model.latticelabel import label_lattice, label_lattice_batch
+
+SHAPES = {'square': (6, 8), 'triangular': (5, 7), 'honeycomb': (6, 8),
+          'cubic': (3, 4, 5)}
+
+
+def label_reference(config, lattice):
+    # Depth first search over the neighbour table, clusters numbered by
+    # their first site
+    occupied = np.asarray(config, dtype=np.bool_).ravel()
+    labels = np.zeros(lattice.size, dtype=np.int_)
+    sizes = []
+    for i in np.flatnonzero(occupied):
+        if labels[i]:
+            continue
+        sizes.append(0)
+        labels[i] = len(sizes)
+        queue = [i]
+        while queue:
+            site = queue.pop()
+            sizes[-1] += 1
+            for other in lattice.neighbours(site):
+                if occupied[other] and not labels[other]:
+                    labels[other] = len(sizes)
+                    queue.append(other)
+
+    return labels.reshape(lattice.shape), sizes
+
+
+class TestLattice(unittest.TestCase):
+
+    def test_neighbours(self):
+        # ==> Coordination number of each kind, symmetric neighbours and
+        #     every bond once
+        coordination = {'square': 4, 'triangular': 6, 'honeycomb': 3,
+                        'cubic': 6}
+        for kind, shape in SHAPES.items():
+            lattice = Lattice(kind, shape)
+            counts = np.diff(lattice.indptr)
+            np.testing.assert_array_equal(counts, coordination[kind])
+            self.assertEqual(len(lattice.edges),
+                             lattice.size * coordination[kind] // 2)
+            for i in range(lattice.size):
+                for j in lattice.neighbours(i):
+                    self.assertIn(i, lattice.neighbours(j))
+
+    def test_shifts(self):
+        # ==> Unwrapped displacement of each bond matches its sites
+        lattice = Lattice('triangular', (5, 7))
+        source = np.array(np.unravel_index(lattice.edges[:, 0], (5, 7)))
+        target = np.array(np.unravel_index(lattice.edges[:, 1], (5, 7)))
+        np.testing.assert_array_equal(
+            (source + lattice.shifts.T) % np.array([[5], [7]]), target)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Lattice('kagome', (4, 4))
+        with self.assertRaises(ValueError):
+            Lattice('cubic', (4, 4))
+        with self.assertRaises(ValueError):
+            Lattice('honeycomb', (5, 4))
+
+    def test_cache(self):
+        self.assertIs(get_lattice('square', (4, 4)),
+                      get_lattice('square', (4, 4)))
+        self.assertEqual(set(SHAPES), set(kinds))
+
+
+class TestLabelLattice(unittest.TestCase):
+
+    def test_reference(self):
+        rng = np.random.default_rng(0)
+        for kind, shape in SHAPES.items():
+            lattice = get_lattice(kind, shape)
+            configs = rng.random((6, *shape)) < kinds[kind]['pc']
+            configs[0] = False
+            configs[1] = True
+            expected = [label_reference(config, lattice)
+                        for config in configs]
+
+            for config, (labels, sizes) in zip(configs, expected):
+                result = label_lattice(config, lattice)
+                np.testing.assert_array_equal(result[0], labels)
+                self.assertEqual(result[1], sizes)
+
+            result = label_lattice_batch(configs, lattice)
+            self.assertEqual([sizes.tolist() for sizes in result],
+                             [sizes for _, sizes in expected])
+
+    def test_square(self):
+        # ==> Same labels as the Hoshen-Kopelman algorithm
+        rng = np.random.default_rng(1)
+        lattice = get_lattice('square', (9, 12))
+        for _ in range(5):
+            config = rng.random((9, 12)) < 0.6
+            grid = Grid(config.shape)
+            grid.config[:] = config
+            hk = HoshenKopelman(grid)
+            hk.setup()
+            labels, sizes = hk.run()
+
+            result = label_lattice(config, lattice)
+            np.testing.assert_array_equal(result[0], labels)
+            self.assertEqual(result[1], list(sizes))
+
+    def test_empty_batch(self):
+        lattice = get_lattice('square', (4, 4))
+        self.assertEqual(label_lattice_batch(np.zeros((0, 4, 4)), lattice),
+                         [])
+
+
+if __name__ == '__main__':
+    unittest.main()
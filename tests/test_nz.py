@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.hk import HoshenKopelman
+from percolation.model.nz import NewmanZiff, canonical
+from percolation.model.measurment import get_susceptibility
+
+
+def label(config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+    hk = HoshenKopelman(grid, unwrap=True)
+    hk.setup()
+    _, sizes = hk.run()
+
+    return np.array(sizes, dtype=np.int_), np.bitwise_or.reduce(
+        np.array(hk.wrapping, dtype=np.uint8))
+
+
+class TestNewmanZiff(unittest.TestCase):
+
+    def test_against_hk(self):
+        # ==> After n added sites the lattice holds the first n sites of the
+        #     order, labelled from scratch by Hoshen-Kopelman
+        for seed, shape in enumerate(((5, 5), (8, 8), (6, 10))):
+            nz = NewmanZiff(Grid(shape))
+            nz.setup()
+            nz.run(ConfigGenerator(seed))
+            order = ConfigGenerator(seed).rng.permutation(nz.grid.size)
+
+            for n in range(nz.grid.size + 1):
+                config = np.zeros(nz.grid.size, dtype=np.bool_)
+                config[order[:n]] = True
+                sizes, wrapping = label(config.reshape(shape))
+
+                self.assertEqual(nz.largest[n], sizes.max(initial=0))
+                self.assertEqual(nz.sum_squares[n], np.sum(sizes**2))
+                self.assertEqual(nz.num_clusters[n], len(sizes))
+                self.assertEqual(nz.wrapping[n], wrapping)
+
+    def test_canonical(self):
+        # ==> A constant observable stays constant, a linear one in n gives
+        #     the mean N p
+        N = 100
+        ps = np.array([0.1, 0.5, 0.9])
+        np.testing.assert_allclose(canonical(np.full(N + 1, 3.0), ps), 3)
+        np.testing.assert_allclose(canonical(np.arange(N + 1), ps), N * ps)
+
+    def test_susceptibility(self):
+        # ==> At p = 1 / 0 there is only one / no cluster
+        nz = NewmanZiff(Grid((8, 8)))
+        nz.setup()
+        nz.run(ConfigGenerator(3))
+        self.assertTrue(np.all(np.isnan(nz.get_susceptibility([0, 1]))))
+        np.testing.assert_array_equal(nz.get_p_inf([0, 1]), [0, 1])
+
+        # ==> Microcanonical value after n sites is the one of the clusters
+        order = ConfigGenerator(3).rng.permutation(64)
+        config = np.zeros(64, dtype=np.bool_)
+        config[order[:30]] = True
+        sizes, _ = label(config.reshape(8, 8))
+        S = (nz.sum_squares[30] - nz.largest[30]**2) / (30 - nz.largest[30])
+        self.assertAlmostEqual(S, get_susceptibility(sizes.tolist()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from percolation.library.store import ResultStore
+
+PARAMS = {'Ls': [16, 32, 64], 'ps': np.linspace(0.5, 0.7, 5), 'num': 4,
+          'method': 'hk'}
+
+
+class TestResultStore(unittest.TestCase):
+
+    def test_round_trip(self):
+        values = np.random.default_rng(0).random((3, 5, 4))
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            store = ResultStore(path / 'results.bin', PARAMS)
+            # ==> A new store is empty (nan)
+            self.assertTrue(np.all(np.isnan(store.data)))
+            store.data[:, :, :3] = values[:, :, :3]
+            store.flush()
+            del store
+
+            store = ResultStore(path / 'results.bin', mode='r+')
+            store.data[:, :, 3] = values[:, :, 3]
+            store.flush()
+            del store
+
+            store = ResultStore(path / 'results.bin')
+            data = np.array(store.data)
+            params = store.params
+            del store
+
+        np.testing.assert_array_equal(data, values)
+        self.assertEqual(params, dict(PARAMS, ps=PARAMS['ps'].tolist()))
+
+    def test_csv(self):
+        values = np.random.default_rng(1).random((3, 5, 4))
+        values[1, 2, 3] = np.nan
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            store = ResultStore(path / 'results.bin', PARAMS)
+            store.data[:] = values
+            store.to_csv(path)
+            names = sorted(file.name for file in path.glob('*.csv'))
+            first = np.loadtxt(path / 'p_0.500.csv', delimiter=',')
+            data = np.array(ResultStore.from_csv(path, path / 'copy.bin',
+                                                 PARAMS).data)
+            del store
+
+        self.assertEqual(names, ['p_0.500.csv', 'p_0.550.csv', 'p_0.600.csv',
+                                 'p_0.650.csv', 'p_0.700.csv'])
+        # ==> One row per sample, one column per L
+        np.testing.assert_array_equal(first, values[:, 0].T)
+        np.testing.assert_array_equal(data, values)
+
+    def test_not_a_store(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path) / 'results.bin'
+            path.write_bytes(b'L,p,S\n')
+            with self.assertRaises(ValueError):
+                ResultStore(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
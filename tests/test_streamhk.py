@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.model.hk import HoshenKopelman
+from percolation.model.streamhk import StreamingHoshenKopelman
+
+
+def get_grid(config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+
+    return grid
+
+
+def label(config):
+    hk = HoshenKopelman(get_grid(config), unwrap=True)
+    hk.setup()
+    _, sizes = hk.run()
+
+    return (np.bincount(np.array(sizes, dtype=np.int_), minlength=1),
+            np.bincount(np.array(hk.wrapping, dtype=np.int_), minlength=4))
+
+
+class TestStreamingHoshenKopelman(unittest.TestCase):
+
+    def assert_same(self, config, block):
+        expected = label(config)
+        result = StreamingHoshenKopelman(config.shape, block).label_grid(
+            get_grid(config))
+
+        # ==> The histograms may differ in trailing zeros
+        np.testing.assert_array_equal(np.trim_zeros(result[0], 'b'),
+                                      np.trim_zeros(expected[0], 'b'))
+        np.testing.assert_array_equal(result[1], expected[1])
+
+    def test_random(self):
+        generator = ConfigGenerator(0)
+        for shape in ((1, 1), (2, 2), (7, 7), (16, 16), (9, 20), (20, 3)):
+            for p in (0.3, 0.592746, 0.8):
+                for config in generator.sample(p, shape, 2):
+                    for block in (1, 3, 256):
+                        self.assert_same(config, block)
+
+    def test_empty_and_full(self):
+        for shape in ((1, 1), (5, 5), (4, 9)):
+            for block in (1, 2, 256):
+                self.assert_same(np.zeros(shape, dtype=np.bool_), block)
+                self.assert_same(np.ones(shape, dtype=np.bool_), block)
+
+    def test_run(self):
+        # ==> Generating block by block draws the same sites as at once
+        shape = (23, 17)
+        config = np.empty(shape, dtype=np.bool_)
+        ConfigGenerator(5).fill(config, 0.6)
+        histogram, wrapping = label(config)
+        result = StreamingHoshenKopelman(shape, 4).run(0.6, ConfigGenerator(5))
+
+        np.testing.assert_array_equal(np.trim_zeros(result[0], 'b'),
+                                      np.trim_zeros(histogram, 'b'))
+        np.testing.assert_array_equal(result[1], wrapping)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from percolation.library.grid import Grid
+from percolation.library.generator import ConfigGenerator
+from percolation.library.store import ResultStore
+from percolation.model.hk import HoshenKopelman
+from percolation.model.fasthk import FastHoshenKopelman, label_batch
+from percolation.model.nz import NewmanZiff, canonical
+from percolation.data_collection.susceptibility import (SusceptDataCollector,
+                                                        wrapping_kinds)
+
+INPUT = """[main]
+num_processors = 1
+lattice-sizes = 8,12
+probabilities = 0.2,0.9,3
+num_iterations = 20
+method = {method}
+seed = 3
+wrapping = true
+"""
+
+
+def get_config(shape, sites):
+    config = np.zeros(shape, dtype=np.bool_)
+    config[tuple(np.transpose(sites))] = True
+
+    return config
+
+
+def get_wrapping(engine, config):
+    grid = Grid(config.shape)
+    grid.config[:] = config
+    hk = engine(grid, unwrap=True)
+    hk.setup()
+    hk.run()
+
+    return [int(flags) for flags in hk.wrapping]
+
+
+class TestWrappingFlags(unittest.TestCase):
+
+    def assert_flags(self, config, expected):
+        for engine in (HoshenKopelman, FastHoshenKopelman):
+            self.assertEqual(get_wrapping(engine, config), expected)
+        _, flags = label_batch(config[None], wrapping=True)
+        self.assertEqual(flags[0].tolist(), expected)
+
+    def test_lines(self):
+        # ==> A full column wraps top to bottom (x, bit 1), a full row left
+        #     to right (y, bit 2)
+        column = get_config((6, 5), [(x, 2) for x in range(6)])
+        self.assert_flags(column, [1])
+        row = get_config((6, 5), [(3, y) for y in range(5)])
+        self.assert_flags(row, [2])
+        self.assert_flags(column | row, [3])
+
+    def test_not_wrapping(self):
+        # ==> Touching opposite edges (and joined across the boundary) is
+        #     not enough, the cluster has to close around the torus
+        self.assert_flags(get_config((6, 5), [(3, y) for y in range(4)]),
+                          [0])
+        config = get_config((6, 6), [(0, 0), (0, 5), (5, 0), (1, 0),
+                                     (5, 5)])
+        self.assert_flags(config, [0])
+
+    def test_diagonal(self):
+        # ==> A staircase closing around the torus winds once in each
+        #     direction, on a wider lattice it does not close (next to a
+        #     separate column)
+        L = 7
+        sites = [(i, i) for i in range(L)] + [(i, (i + 1) % L)
+                                              for i in range(L)]
+        self.assert_flags(get_config((L, L), sites), [3])
+
+        config = get_config((L, L + 4), [(i, i) for i in range(L)] +
+                            [(i, i + 1) for i in range(L)] +
+                            [(x, L + 2) for x in range(L)])
+        self.assert_flags(config, [0, 1])
+
+    def test_batch(self):
+        # ==> Flags of many samples at once, as of each one on its own
+        configs = ConfigGenerator(0).sample(0.6, (10, 10), 20)
+        _, flags = label_batch(configs, wrapping=True)
+        for config, result in zip(configs, flags):
+            self.assertEqual(result.tolist(),
+                             get_wrapping(FastHoshenKopelman, config))
+
+
+class TestWrappingProbability(unittest.TestCase):
+
+    def test_newman_ziff(self):
+        nz = NewmanZiff(Grid((8, 8)))
+        nz.setup()
+        nz.run(ConfigGenerator(1))
+        ps = [0, 0.3, 0.6, 1]
+
+        x = (nz.wrapping & 1) != 0
+        y = (nz.wrapping & 2) != 0
+        for kind, R in zip(wrapping_kinds, (x, y, x | y, x & y)):
+            result = nz.get_wrapping(ps, kind)
+            np.testing.assert_allclose(result, canonical(R, ps))
+            self.assertEqual(result[0], 0)
+            self.assertEqual(result[-1], 1)
+        # ==> Wrapping in both directions implies wrapping in each
+        self.assertTrue(np.all(nz.get_wrapping(ps, 'both') <=
+                               nz.get_wrapping(ps, 'x')))
+
+    def test_collector(self):
+        for method in ('hk', 'nz'):
+            with tempfile.TemporaryDirectory() as path:
+                path = Path(path)
+                (path / 'input.ini').write_text(INPUT.format(method=method))
+                SusceptDataCollector(path).run()
+                R = {kind: np.array(ResultStore(path / f'r_{kind}.bin').data)
+                     for kind in wrapping_kinds}
+
+            self.assertEqual(R['either'].shape, (2, 3, 20))
+            np.testing.assert_allclose(R['x'] + R['y'] - R['both'],
+                                       R['either'], atol=1e-12)
+            self.assertTrue(np.all(R['both'] <= np.minimum(R['x'], R['y'])))
+            # ==> Far below pc nothing wraps, far above nearly always
+            self.assertLess(R['either'][:, 0].max(), 1e-5)
+            self.assertGreater(R['both'][:, 2].mean(), 0.9)
+            if method == 'hk':
+                self.assertTrue(np.all(np.isin(R['either'], (0, 1))))
+
+    def test_honeycomb(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = Path(path)
+            (path / 'input.ini').write_text(INPUT.format(method='hk') +
+                                            'lattice = honeycomb\n')
+            with self.assertRaises(ValueError):
+                SusceptDataCollector(path)
+
+
+if __name__ == '__main__':
+    unittest.main()